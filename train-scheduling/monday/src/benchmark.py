@@ -0,0 +1,52 @@
+import importlib
+import multiprocessing
+import resource
+
+from instance import Instance
+
+COLUMNS = [
+    ("variables", "vars", "d"),
+    ("constraints", "constraints", "d"),
+    ("build_time", "build (s)", ".2f"),
+    ("solve_time", "solve (s)", ".2f"),
+    ("peak_rss_mb", "RSS (MB)", ".0f"),
+    ("objective", "drivers", ".0f"),
+    ("bound", "bound", ".0f"),
+    ("status", "status", ""),
+]
+
+
+def _measure(module, path, kwargs):
+    solve = importlib.import_module(module).solve_with_ortools_improved
+    stats = {}
+    try:
+        solve(Instance.load(path), log=False, stats=stats, **kwargs)
+    except Exception as e:
+        print(e)
+    stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+def measure(module, path, **kwargs):
+    """Build and solve `module`'s CP model on `path` in a fresh process.
+
+    Returns the `stats` filled by the solver plus the peak resident memory of
+    that process, so runs do not share allocations.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (module, path, kwargs))
+
+
+def print_table(labels, rows):
+    """`rows` are (label values, stats) pairs; missing stats print as '-'."""
+    widths = [max(len(label), 10) for label in labels]
+    headers = [f"{label:<{width}}" for label, width in zip(labels, widths)]
+    headers += [f"{header:>{max(len(header), 8)}}" for _, header, _ in COLUMNS]
+    print("\n" + "  ".join(headers))
+    for values, stats in rows:
+        cells = [f"{value:<{width}}" for value, width in zip(values, widths)]
+        for key, header, spec in COLUMNS:
+            cell = format(stats[key], spec) if stats.get(key) is not None else "-"
+            cells.append(f"{cell:>{max(len(header), 8)}}")
+        print("  ".join(cells))
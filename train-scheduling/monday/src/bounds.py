@@ -0,0 +1,89 @@
+import math
+
+from solve_greedy import FITS, fit_duties
+from train_assignment import peak_overlap
+
+WINDOW_CLIQUES = 300  # maximal cliques above which window_bound, O(cliques^2) matchings, is skipped
+
+
+def _compatible(instance, rules, t1, t2):
+    """Whether trips t1 < t2 (rows) can belong to the same duty."""
+    if instance.arrival[t1] > instance.departure[t2]:
+        return False
+    rows = [t1, t2]
+    return rules.shift(instance.departure[rows].tolist(), instance.arrival[rows].tolist(),
+                       instance.driving_time[rows].tolist()) is not None
+
+
+def _max_matching(left, right, compatible):
+    match = {}
+
+    def augment(a, seen):
+        for b in right:
+            if b not in seen and compatible(a, b):
+                seen.add(b)
+                if b not in match or augment(match[b], seen):
+                    match[b] = a
+                    return True
+        return False
+
+    return sum(augment(a, set()) for a in left)
+
+
+def window_bound(instance, rules, max_cliques=WINDOW_CLIQUES):
+    """Lower bound from pairs of maximal cliques, or None above `max_cliques` cliques.
+
+    The trips of a clique A run at one instant and need |A| drivers. For a
+    later clique B, a driver can cover one trip of each only if the two fit in
+    one shift, so at least |A| + |B| - (maximum matching of compatible pairs)
+    drivers are needed. With A == B this is the peak overlap. Every pair
+    is matched, so the time grows with the square of the cliques (seconds
+    from about 500); pass max_cliques=None to always compute it.
+    """
+    cliques = [clique.tolist() for clique in instance.maximal_cliques()]
+    if max_cliques is not None and len(cliques) > max_cliques:
+        return None
+    cache = {}
+
+    def compatible(t1, t2):
+        if (t1, t2) not in cache:
+            cache[t1, t2] = _compatible(instance, rules, t1, t2)
+        return cache[t1, t2]
+
+    best = max((len(clique) for clique in cliques), default=min(instance.n_trips, 1))
+    for i, first in enumerate(cliques):
+        for second in cliques[i + 1:]:
+            if len(first) + len(second) <= best or not set(first).isdisjoint(second):
+                continue  # cannot improve, or the cliques share trips
+            best = max(best, len(first) + len(second) - _max_matching(first, second, compatible))
+    return best
+
+
+def lower_bounds(instance, rules):
+    """Lower bounds on the number of drivers, by name; "windows" is left out on large timetables."""
+    bounds = {
+        "peak": peak_overlap(instance.departure, instance.arrival)[0],
+        "driving": math.ceil(int(instance.driving_time.sum()) / rules.driving_time),
+        "working": math.ceil(int(instance.duration.sum()) / rules.trip_time),
+    }
+    windows = window_bound(instance, rules)
+    if windows is not None:
+        bounds["windows"] = windows
+    return bounds
+
+
+def greedy_duties(instance, rules):
+    """Fewest duties of solve_greedy.fit_duties over its fits (best and first).
+
+    Returns a list of duties, each a list of rows sorted by departure.
+    """
+    return min((fit_duties(instance, rules, fit) for fit in FITS), key=len)
+
+
+def driver_bounds(instance, rules):
+    """(lower, upper) bounds on the number of drivers, printed with their sources."""
+    lower = lower_bounds(instance, rules)
+    upper = len(greedy_duties(instance, rules))
+    details = ", ".join(f"{name} {value}" for name, value in lower.items())
+    print(f"Driver bounds: {max(lower.values())} <= drivers <= {upper} ({details}, greedy {upper})")
+    return max(lower.values()), upper
@@ -1,11 +1,99 @@
-import pandas as pd
+import argparse
 import json
 
+import numpy as np
+import pandas as pd
+
+from instance import DATA_PATH, Instance
+
 VERBOSE = True
 WORKING_TIME = 9 * 60
 DRIVING_TIME = 7 * 60
-
-with open("solution.json", "r") as f:
+INVENTORY_LIMIT = 10 ** 6  # inventory.csv rows (departure times x drivers and trains) written at most
+
+
+def previous_valid(code, valid):
+    """Position (in trip order) of the latest earlier valid trip of the same resource, or -1.
+
+    Trips are in the order the event loop visits them; `code` is the resource
+    of each trip. Returns also the positions of the trips grouped by resource
+    and the group start of each, which `used_before` reuses.
+    """
+    n = len(code)
+    order = np.lexsort((np.arange(n), code))
+    grouped = code[order]
+    first = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+    group_start = np.repeat(first, np.diff(np.r_[first, n]))
+    latest = np.maximum.accumulate(np.where(valid[order], np.arange(n), -1))
+    before = np.r_[-1, latest[:-1]]
+    before[before < group_start] = -1
+    previous = np.full(n, -1)
+    previous[order] = np.where(before >= 0, order[np.maximum(before, 0)], -1)
+    return previous, order, group_start
+
+
+def busy(previous, departure, arrival):
+    """Whether the resource is still on its previous valid trip when each trip departs.
+
+    It is freed at the first departure time at or after that trip's arrival,
+    so a trip departing together with the previous one always finds it busy.
+    """
+    has = previous >= 0
+    last = np.maximum(previous, 0)
+    return has & ((departure[last] == departure) | (arrival[last] > departure))
+
+
+def used_before(order, group_start, cost, valid):
+    """Driving time of the earlier valid trips of the same driver, per trip."""
+    spent = np.where(valid[order], cost[order], 0)
+    cumulative = np.cumsum(spent) - spent
+    used = np.empty(len(order), dtype=np.int64)
+    used[order] = cumulative - cumulative[group_start]
+    return used
+
+
+def inventory(kind, names, code, valid, departure, arrival, destination, cost, times):
+    """State of every resource just before each departure time, as the event loop records it.
+
+    The latest valid trip departing earlier gives the location, the status
+    (driving until the first departure time at or after its arrival) and,
+    for drivers, the driving time left.
+    """
+    rows = np.flatnonzero(valid)
+    rows = rows[np.lexsort((rows, code[rows]))]
+    width = int(times.max()) + 1
+    keys = code[rows] * width + departure[rows]
+    entity = np.repeat(np.arange(len(names)), len(times))
+    time = np.tile(times, len(names))
+    latest = np.searchsorted(keys, entity * width + time) - 1
+    has = latest >= 0
+    has[has] = code[rows[latest[has]]] == entity[has]
+    trip = rows[np.maximum(latest, 0)]
+    records = {
+        "type": kind,
+        "entity": np.asarray(names, dtype=object)[entity],
+        "time": time,
+        "location": np.where(has, destination[trip], "Cork").astype(object),
+        "status": np.where(has & (arrival[trip] > time), "driving", "free").astype(object),
+    }
+    if kind == "driver":
+        spent = np.cumsum(cost[rows])
+        first = np.searchsorted(code[rows], entity)  # first valid trip of the driver
+        before = np.where(first > 0, spent[np.maximum(first - 1, 0)], 0)
+        records["driving_time"] = np.where(has, DRIVING_TIME - (spent[np.maximum(latest, 0)] - before),
+                                           DRIVING_TIME).astype(float)
+    else:
+        records["driving_time"] = np.nan
+    return pd.DataFrame(records)
+
+
+parser = argparse.ArgumentParser(description="Check solution.json against the timetable and the duty rules")
+parser.add_argument("--solution", default="solution.json")
+parser.add_argument("--data", default=DATA_PATH)
+parser.add_argument("--no-inventory", action="store_true", help="do not write inventory.csv")
+args = parser.parse_args()
+
+with open(args.solution, "r") as f:
     data = json.load(f)
 
 plan = pd.DataFrame(data).sort_values("departure")
@@ -13,110 +101,76 @@ nr_plan = set(plan['nr'])
 
 assert plan['nr'].nunique() == len(nr_plan), "Duplicate trips in solution"
 
-with open("data/monfri.json", "r") as f:
-    trips = json.load(f)["trips"]
-nr_gt = set([x['nr'] for x in trips])
+instance = Instance.load(args.data)
+nr_gt = set(instance.nr.tolist())
 
 assert len(nr_gt - nr_plan) == 0, f"Missing trips in solution: {nr_gt - nr_plan}"
 assert len(nr_plan - nr_gt) == 0, f"Unexpected trips in solution: {nr_plan - nr_gt}"
 
-# Build cost table
-cost_table = pd.DataFrame(trips).set_index("nr").to_dict()["drivingTime"]
-
 # Init drivers
 driver_names = plan.driver.unique()
-drivers = pd.DataFrame([
-    {
-        "name": name,
-        "location": "Cork",
-        "driving_time": DRIVING_TIME,
-        "work_start": plan[plan.driver == name].departure.min(),
-        "work_end": plan[plan.driver == name].departure.min() + WORKING_TIME,
-        "status": "free",
-        "busy_until": 0  # Thời điểm driver bận xong
-    }
-    for name in driver_names
-]).set_index("name")
+drivers = pd.DataFrame({"work_start": plan.groupby("driver").departure.min().reindex(driver_names)})
+drivers["work_end"] = drivers.work_start + WORKING_TIME
 
 # Init trains
 train_ids = plan.train.unique()
-trains = pd.DataFrame([
-    {"id": tid, "location": "Cork", "status": "free", "busy_until": 0}
-    for tid in train_ids
-]).set_index("id")
 
 print('Used Resources:')
 print(f"Drivers: {driver_names.shape[0]}")
 print(f"Trains: {train_ids.shape[0]}")
 
-log = []
-inventory_records = []
-
-# Lặp theo sự kiện thời gian: departure
-for t in sorted(plan.departure.unique()):
-    # Cập nhật trạng thái driver/train: check busy_until
-    for d, row in drivers.iterrows():
-        if row.status == "driving" and t >= row.busy_until:
-            drivers.at[d, "status"] = "free"
-    for tr, row in trains.iterrows():
-        if row.status == "driving" and t >= row.busy_until:
-            trains.at[tr, "status"] = "free"
-
-    # Ghi inventory trước khi thực hiện trip
-    for d, row in drivers.iterrows():
-        inventory_records.append({
-            "time": t, "entity": d, "type": "driver",
-            "location": row.location, "status": row.status, "driving_time": row.driving_time
-        })
-    for tr, row in trains.iterrows():
-        inventory_records.append({
-            "time": t, "entity": tr, "type": "train",
-            "location": row.location, "status": row.status
-        })
-
-    # Xử lý các trip scheduled tại thời điểm này
-    for _, trip in plan[plan.departure == t].iterrows():
-        driver = drivers.loc[trip.driver]
-        train = trains.loc[trip.train]
-
-        valid = True
-        reason = []
-
-        # Constraint 1: driver/trains đang bận
-        if driver.status == "driving":
-            valid = False
-            reason.append("Driver is already on a trip")
-        if train.status == "driving":
-            valid = False
-            reason.append("Train is already on a trip")
-
-        # Constraint 3: driving time
-        trip_cost = cost_table[trip["nr"]]
-        if driver.driving_time < trip_cost:
-            valid = False
-            reason.append("Driver has insufficient driving time left")
-
-        # Constraint 4: working hours
-        if not (driver.work_start <= trip.departure <= trip.arrival <= driver.work_end):
-            valid = False
-            reason.append(f"Driver outside work hours {driver.work_start}-{driver.work_end} (Trip: {trip.departure}-{trip.arrival})")
-
-        if valid:
-            # Update states
-            drivers.at[trip.driver, "location"] = trip["destination"]
-            drivers.at[trip.driver, "driving_time"] -= trip_cost
-            drivers.at[trip.driver, "status"] = "driving"
-            drivers.at[trip.driver, "busy_until"] = trip.arrival
-
-            trains.at[trip.train, "location"] = trip["destination"]
-            trains.at[trip.train, "status"] = "driving"
-            trains.at[trip.train, "busy_until"] = trip.arrival
-
-            log.append((trip.departure, trip.driver, trip.train, trip["destination"], driver.driving_time, trip_cost, "SUCCESS"))
-        else:
-            log.append((trip.departure, trip.driver, trip.train, trip["destination"], driver.driving_time, trip_cost, "; ".join(reason)))
-
-log_df = pd.DataFrame(log, columns=["time", "driver", "train", "destination", "driving_time_left", "cost_driving_time", "result"])
+# Trip columns in the order the event loop visits them: by departure
+nr = plan['nr'].to_numpy()
+departure = plan['departure'].to_numpy()
+arrival = plan['arrival'].to_numpy()
+destination = plan['destination'].to_numpy()
+driver = plan['driver'].to_numpy()
+train = plan['train'].to_numpy()
+cost = instance.driving_time[[instance.row[n] for n in nr.tolist()]]
+driver_code = drivers.index.get_indexer(driver)
+train_code = pd.Index(train_ids).get_indexer(train)
+work_start = drivers.work_start.to_numpy()[driver_code]
+work_end = drivers.work_end.to_numpy()[driver_code]
+
+# Event loop, one vectorised pass per round: a trip that fails leaves its driver and train
+# as they were, which can change the later trips. Each round takes the valid trips of the
+# previous one; it settles once no trip changes, at the latest after a round per failure chain.
+in_hours = (work_start <= departure) & (departure <= arrival) & (arrival <= work_end)
+valid = np.ones(len(plan), dtype=bool)
+while True:
+    previous_driver, driver_order, driver_groups = previous_valid(driver_code, valid)
+    driver_busy = busy(previous_driver, departure, arrival)
+    train_busy = busy(previous_valid(train_code, valid)[0], departure, arrival)
+    driving_left = DRIVING_TIME - used_before(driver_order, driver_groups, cost, valid)
+    short = driving_left < cost
+    checked = ~driver_busy & ~train_busy & ~short & in_hours
+    if np.array_equal(checked, valid):
+        break
+    valid = checked
+
+result = np.full(len(plan), "SUCCESS", dtype=object)
+for i in np.flatnonzero(~valid).tolist():
+    reason = []
+
+    # Constraint 1: driver/trains đang bận
+    if driver_busy[i]:
+        reason.append("Driver is already on a trip")
+    if train_busy[i]:
+        reason.append("Train is already on a trip")
+
+    # Constraint 3: driving time
+    if short[i]:
+        reason.append("Driver has insufficient driving time left")
+
+    # Constraint 4: working hours
+    if not in_hours[i]:
+        reason.append(f"Driver outside work hours {work_start[i]}-{work_end[i]} "
+                      f"(Trip: {departure[i]}-{arrival[i]})")
+    result[i] = "; ".join(reason)
+
+log_df = pd.DataFrame({"time": departure, "driver": driver, "train": train,
+                       "destination": destination, "driving_time_left": driving_left,
+                       "cost_driving_time": cost, "result": result})
 log_df = log_df.sort_values(by=["time", "driver", "train", "destination"])
 print(log_df)
 if log_df[log_df.result != "SUCCESS"].shape[0] == 0:
@@ -127,7 +181,17 @@ else:
     log_df[log_df.result != "SUCCESS"].to_csv("failed.csv", index=False)
 
 log_df.to_csv("log.csv", index=False)
-inventory_records_df = pd.DataFrame(inventory_records)
-inventory_records_df = inventory_records_df.sort_values(by=["type", "entity", "time"])
-inventory_records_df = inventory_records_df[["type", "entity", "time", "location", "status", "driving_time"]]
-inventory_records_df.to_csv("inventory.csv", index=False)
+times = np.unique(departure)
+if args.no_inventory:
+    pass
+elif len(times) * (len(drivers) + len(train_ids)) > INVENTORY_LIMIT:
+    print(f"inventory.csv skipped: {len(times)} departure times x {len(drivers) + len(train_ids)} drivers "
+          f"and trains is over {INVENTORY_LIMIT} rows")
+else:
+    inventory_records_df = pd.concat([
+        inventory("driver", drivers.index, driver_code, valid, departure, arrival, destination, cost, times),
+        inventory("train", train_ids, train_code, valid, departure, arrival, destination, cost, times),
+    ], ignore_index=True)
+    inventory_records_df = inventory_records_df.sort_values(by=["type", "entity", "time"])
+    inventory_records_df = inventory_records_df[["type", "entity", "time", "location", "status", "driving_time"]]
+    inventory_records_df.to_csv("inventory.csv", index=False)
@@ -0,0 +1,142 @@
+import json
+
+from ortools.sat.python import cp_model
+
+
+def load_drivers(instance, path):
+    """Driver name of every row in an earlier solution.json (None where it has no trip).
+
+    Both layouts are read: a plain list of trips (solve_greedy.py, solve_naive.py)
+    and {"trips": [...], "drivers": [...]}.
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    trips = data["trips"] if isinstance(data, dict) else data
+    drivers = [None] * instance.n_trips
+    for trip in trips:
+        t = instance.row.get(trip["nr"])
+        if t is not None:
+            drivers[t] = trip["driver"]
+    return drivers
+
+
+def fits(instance, rules, rows):
+    """Whether `rows` (sorted by departure) make one feasible duty."""
+    departure = instance.departure
+    arrival = instance.arrival
+    if any(arrival[a] > departure[b] for a, b in zip(rows, rows[1:])):
+        return False
+    return rules.shift(departure[rows].tolist(), arrival[rows].tolist(),
+                       instance.driving_time[rows].tolist()) is not None
+
+
+def repair_duties(instance, rules, drivers):
+    """Feasible duties from a driver name (or None) per row.
+
+    Fix-up for hints made under older rules: each driver keeps its trips in
+    departure order as long as the duty stays feasible, and the dropped or
+    unassigned trips then go first-fit into the repaired duties or new ones.
+    Returns `(duties, moved)`, the duties as lists of rows and the number of
+    trips that changed driver.
+    """
+    by_driver = {}
+    leftover = []
+    for t, name in enumerate(drivers):  # rows are sorted by departure
+        if name is None:
+            leftover.append(t)
+        else:
+            by_driver.setdefault(name, []).append(t)
+
+    duties = []
+    for rows in by_driver.values():
+        duty = []
+        for t in rows:
+            if fits(instance, rules, duty + [t]):
+                duty.append(t)
+            else:
+                leftover.append(t)
+        duties.append(duty)
+
+    for t in sorted(leftover):
+        for duty in duties:
+            chain = sorted(duty + [t])
+            if fits(instance, rules, chain):
+                duty[:] = chain
+                break
+        else:
+            duties.append([t])
+    return [duty for duty in duties if duty], len(leftover)
+
+
+def hint_slots(instance, rules, path, max_drivers):
+    """Driver slot of every row from an earlier solution, for warm starts.
+
+    Duties are repaired under `rules`; the `max_drivers` longest get slots,
+    numbered by first departure, and rows of the others get None and are left
+    to the solver.
+    """
+    duties, moved = repair_duties(instance, rules, load_drivers(instance, path))
+    kept = sorted(sorted(duties, key=len, reverse=True)[:max_drivers], key=lambda duty: duty[0])
+    slots = [None] * instance.n_trips
+    for d, duty in enumerate(kept):
+        for t in duty:
+            slots[t] = d
+    print(f"Hint from {path}: {len(duties)} drivers after the fix-up ({moved} trips moved), "
+          f"{sum(slot is not None for slot in slots)}/{instance.n_trips} trips hinted")
+    return slots
+
+
+def add_hints(model, slots, driver_used, assigned_dr=None, trip_driver=None):
+    """CP-SAT AddHint from `slots` on whichever of the slot booleans and driver indices exist."""
+    used = set(slot for slot in slots if slot is not None)
+    for d, var in driver_used.items():
+        model.AddHint(var, d in used)
+    for t, slot in enumerate(slots):
+        if slot is None:
+            continue
+        if trip_driver:
+            model.AddHint(trip_driver[t], slot)
+        if assigned_dr:
+            for d in driver_used:
+                model.AddHint(assigned_dr[(t, d)], d == slot)
+    if None not in slots:  # trips left to the solver may need slots the hint already fills
+        complete_hint(model)
+
+
+def complete_hint(model, time_limit=10.0):
+    """Extend the hint of a CP-SAT model to every variable, keeping the hinted values.
+
+    CP-SAT often fails to turn a partial hint (trip slots only) into a
+    solution within short time limits, e.g. on one worker. Solving a copy
+    with the hinted values fixed is quick, and its solution becomes a complete
+    hint, which CP-SAT takes as its first incumbent. The hint stays partial if
+    the copy finds nothing.
+    """
+    hint = model.Proto().solution_hint
+    fixed = model.Clone()
+    fixed.ClearHints()
+    for index, value in zip(hint.vars, hint.values):
+        fixed.Add(fixed.GetIntVarFromProtoIndex(index) == value)
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    solver.parameters.stop_after_first_solution = True
+    status = solver.Solve(fixed)
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        print(f"Hint not completed ({solver.StatusName(status)}), keeping it partial")
+        return
+    model.ClearHints()
+    for index in range(len(model.Proto().variables)):
+        model.AddHint(model.GetIntVarFromProtoIndex(index), solver.Value(fixed.GetIntVarFromProtoIndex(index)))
+    print(f"Hint completed in {solver.WallTime():.2f} seconds")
+
+
+def set_start(slots, x, driver_used):
+    """Gurobi MIP start from `slots` on x[t, d] and driver_used[d]."""
+    used = set(slot for slot in slots if slot is not None)
+    for d in driver_used.keys():
+        driver_used[d].Start = int(d in used)
+    for t, slot in enumerate(slots):
+        if slot is None:
+            continue
+        for d in driver_used.keys():
+            x[t, d].Start = int(d == slot)
@@ -1,167 +1,180 @@
+import argparse
 import json
 from ortools.sat.python import cp_model
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds
+from hints import add_hints, hint_slots
+from symmetry import SYMMETRY, break_symmetry
+from portfolio import add_portfolio_arguments, configure, portfolio_parameters
+from profiler import BuildProfile, add_layer_timings
+from rules import MONDAY
 
 
-def solve_with_ortools_improved():
+def solve_with_ortools_improved(instance, conflicts="cliques", hint=None, symmetry="none",
+                                num_workers=0, seed=1, deterministic=False, subsolvers=None, profile=None, names=True):
+    """Driver layer: returns the driver name of every row; trains are solved separately.
+
+    `conflicts` is "cliques" (one AllDifferent per maximal clique of overlapping
+    trips) or "pairwise" (one != per overlapping pair). `hint` is the path
+    of an earlier solution.json used as a warm start. `symmetry` is one of
+    symmetry.SYMMETRY.
+    `num_workers=0` lets CP-SAT use every core; `seed`, `deterministic` and
+    `subsolvers` set the rest of the portfolio (see portfolio.py). `profile`
+    is the path of a JSON report with the time, variables and constraints of
+    every build phase and the presolve statistics (see profiler.py). `names=False` leaves the variables
+    unnamed, which skips formatting one name per variable.
+    """
     """Improved version with better constraint modeling for CP-SAT"""
-    
-    # Load trip data
-    with open("data/monfri.json", "r") as f:
-        data = json.load(f)
-    trips = data["trips"]
-    
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+
     # Constants
     WORKING_TIME = 9 * 60  # 9 hours in minutes
     DRIVING_TIME = 7 * 60  # 7 hours in minutes
-    n_trips = len(trips)
+    n_trips = instance.n_trips
     
-    # More conservative bounds based on problem structure
-    max_trains = min(n_trips, 20)  # Reasonable upper bound
-    max_drivers = min(n_trips, 15)  # Reasonable upper bound
+    # Driver slots come from a feasible greedy (upper bound); the lower bound
+    # is posted below so the search stops as soon as it is reached
+    lower_bound, max_drivers = driver_bounds(instance, MONDAY)
     
     print(f"Problem size: {n_trips} trips")
-    print(f"Maximum resources: {max_drivers} drivers, {max_trains} trains")
-    
+    print(f"Maximum resources: {max_drivers} drivers")
+
     # Create the CP-SAT model
     model = cp_model.CpModel()
+    profiler = BuildProfile(model, profile is not None)
+    profiler.phase("usage linking")
     
-    # Decision variables: which driver and train is assigned to each trip
+    # Decision variables: which driver is assigned to each trip
     trip_driver = {}
-    trip_train = {}
     for t in range(n_trips):
-        trip_driver[t] = model.NewIntVar(0, max_drivers - 1, f'trip_driver_{t}')
-        trip_train[t] = model.NewIntVar(0, max_trains - 1, f'trip_train_{t}')
+        trip_driver[t] = model.NewIntVar(0, max_drivers - 1, f'trip_driver_{t}' if names else '')
     
     # Binary variables for resource usage
     driver_used = {}
-    train_used = {}
     for d in range(max_drivers):
-        driver_used[d] = model.NewBoolVar(f'driver_used_{d}')
-    for tr in range(max_trains):
-        train_used[tr] = model.NewBoolVar(f'train_used_{tr}')
+        driver_used[d] = model.NewBoolVar(f'driver_used_{d}' if names else '')
     
     print("Adding constraints...")
     
-    # Constraint 1: Link driver/train assignment to usage variables (simplified)
+    # Constraint 1: Link driver assignment to usage variables (simplified)
+    assigned_dr = {}
     for d in range(max_drivers):
         # Driver d is used if any trip is assigned to driver d
         assigned_trips = []
         for t in range(n_trips):
-            trip_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}')
+            trip_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}' if names else '')
+            assigned_dr[(t, d)] = trip_assigned_to_d
             model.Add(trip_driver[t] == d).OnlyEnforceIf(trip_assigned_to_d)
             model.Add(trip_driver[t] != d).OnlyEnforceIf(trip_assigned_to_d.Not())
             assigned_trips.append(trip_assigned_to_d)
         
         # Driver is used if at least one trip is assigned to it
-        model.Add(sum(assigned_trips) >= 1).OnlyEnforceIf(driver_used[d])
-        model.Add(sum(assigned_trips) == 0).OnlyEnforceIf(driver_used[d].Not())
+        trips_of_d = cp_model.LinearExpr.Sum(assigned_trips)
+        model.Add(trips_of_d >= 1).OnlyEnforceIf(driver_used[d])
+        model.Add(trips_of_d == 0).OnlyEnforceIf(driver_used[d].Not())
 
-    for tr in range(max_trains):
-        # Train tr is used if any trip is assigned to train tr
-        assigned_trips = []
-        for t in range(n_trips):
-            trip_assigned_to_tr = model.NewBoolVar(f'trip_{t}_assigned_to_train_{tr}')
-            model.Add(trip_train[t] == tr).OnlyEnforceIf(trip_assigned_to_tr)
-            model.Add(trip_train[t] != tr).OnlyEnforceIf(trip_assigned_to_tr.Not())
-            assigned_trips.append(trip_assigned_to_tr)
-        
-        # Train is used if at least one trip is assigned to it
-        model.Add(sum(assigned_trips) >= 1).OnlyEnforceIf(train_used[tr])
-        model.Add(sum(assigned_trips) == 0).OnlyEnforceIf(train_used[tr].Not())    # Constraint 2: No time conflicts for trains
-    for t1 in range(n_trips):
-        for t2 in range(t1 + 1, n_trips):
-            trip1, trip2 = trips[t1], trips[t2]
-            # Check if trips overlap in time (corrected logic)
-            # Trips overlap if NOT (one ends before the other starts)
-            if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                # If trips overlap, they cannot use the same train
-                model.Add(trip_train[t1] != trip_train[t2])
+    # Constraint 2 (no time conflicts for trains) is solved by the train layer in pipeline.py
 
     # Constraint 3: No time conflicts for drivers
-    for t1 in range(n_trips):
-        for t2 in range(t1 + 1, n_trips):
-            trip1, trip2 = trips[t1], trips[t2]
-            # Check if trips overlap in time (corrected logic)
-            # Trips overlap if NOT (one ends before the other starts)
-            if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                # If trips overlap, they cannot use the same driver
-                model.Add(trip_driver[t1] != trip_driver[t2])    # Constraint 4: Driver driving time constraints (simplified)
+    profiler.phase("driver conflicts")
+    if conflicts == "cliques":
+        # Trips of a maximal clique all overlap at one instant, so they need distinct drivers
+        for clique in instance.maximal_cliques():
+            model.AddAllDifferent([trip_driver[t] for t in clique.tolist()])
+    else:
+        # Trips overlap if NOT (one ends before the other starts)
+        for t1, t2 in zip(*(pairs.tolist() for pairs in instance.overlapping_pairs())):
+            # If trips overlap, they cannot use the same driver
+            model.Add(trip_driver[t1] != trip_driver[t2])
+
+    # Constraint 4: Driver driving time constraints (simplified)
+    profiler.phase("driving time")
     for d in range(max_drivers):
         # Calculate total driving time for driver d
-        total_driving_time = 0
+        assigned_to_d = []
         for t in range(n_trips):
             # Create a boolean variable for whether trip t is assigned to driver d
-            is_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}')
+            is_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}' if names else '')
             model.Add(trip_driver[t] == d).OnlyEnforceIf(is_assigned_to_d)
             model.Add(trip_driver[t] != d).OnlyEnforceIf(is_assigned_to_d.Not())
             
-            # Add the driving time for this trip if assigned to driver d
-            total_driving_time += is_assigned_to_d * trips[t]["drivingTime"]
+            assigned_to_d.append(is_assigned_to_d)
         
         # Total driving time must not exceed the limit
-        model.Add(total_driving_time <= DRIVING_TIME)
+        model.Add(cp_model.LinearExpr.WeightedSum(assigned_to_d, driving_time) <= DRIVING_TIME)
     
     # Constraint 5: Driver working time constraints (Big-M approach like ILP)
+    profiler.phase("span")
     BIG_M = 24 * 60  # 24 hours in minutes
     
     for d in range(max_drivers):
         # Track start and end times for each driver
-        driver_start_time = model.NewIntVar(0, BIG_M, f'driver_{d}_start_time')
-        driver_end_time = model.NewIntVar(0, BIG_M, f'driver_{d}_end_time')
+        driver_start_time = model.NewIntVar(0, BIG_M, f'driver_{d}_start_time' if names else '')
+        driver_end_time = model.NewIntVar(0, BIG_M, f'driver_{d}_end_time' if names else '')
         
         # For each trip, if assigned to this driver, constrain start/end times
         for t in range(n_trips):
-            is_assigned = model.NewBoolVar(f'driver_{d}_trip_{t}_assigned_working')
+            is_assigned = model.NewBoolVar(f'driver_{d}_trip_{t}_assigned_working' if names else '')
             model.Add(trip_driver[t] == d).OnlyEnforceIf(is_assigned)
             model.Add(trip_driver[t] != d).OnlyEnforceIf(is_assigned.Not())
             
             # If trip is assigned: start_time <= departure, end_time >= arrival
             # Using Big-M: constraint is enforced when is_assigned=1, relaxed when is_assigned=0
-            model.Add(driver_start_time <= trips[t]["departure"] + BIG_M * (1 - is_assigned))
-            model.Add(driver_end_time >= trips[t]["arrival"] - BIG_M * (1 - is_assigned))
+            model.Add(driver_start_time <= departure[t] + BIG_M * (1 - is_assigned))
+            model.Add(driver_end_time >= arrival[t] - BIG_M * (1 - is_assigned))
         
         # Working time constraint: end_time - start_time <= WORKING_TIME when driver is used
-        driver_has_trips = model.NewBoolVar(f'driver_{d}_has_trips_working')
+        driver_has_trips = model.NewBoolVar(f'driver_{d}_has_trips_working' if names else '')
         trip_assignments = []
         for t in range(n_trips):
-            is_assigned_check = model.NewBoolVar(f'driver_{d}_trip_{t}_check_working')
+            is_assigned_check = model.NewBoolVar(f'driver_{d}_trip_{t}_check_working' if names else '')
             model.Add(trip_driver[t] == d).OnlyEnforceIf(is_assigned_check)
             model.Add(trip_driver[t] != d).OnlyEnforceIf(is_assigned_check.Not())
             trip_assignments.append(is_assigned_check)
         
-        model.Add(sum(trip_assignments) >= 1).OnlyEnforceIf(driver_has_trips)
-        model.Add(sum(trip_assignments) == 0).OnlyEnforceIf(driver_has_trips.Not())
+        trips_of_d = cp_model.LinearExpr.Sum(trip_assignments)
+        model.Add(trips_of_d >= 1).OnlyEnforceIf(driver_has_trips)
+        model.Add(trips_of_d == 0).OnlyEnforceIf(driver_has_trips.Not())
         
         # Working time span constraint with Big-M relaxation
-        working_span = model.NewIntVar(0, BIG_M, f'driver_{d}_working_span')
+        working_span = model.NewIntVar(0, BIG_M, f'driver_{d}_working_span' if names else '')
         model.Add(working_span == driver_end_time - driver_start_time)
         model.Add(working_span <= WORKING_TIME + BIG_M * (1 - driver_has_trips))
-    # Objective: Lexicographic optimization - first minimize trains, then drivers
-    model.Minimize(sum(driver_used[d] for d in range(max_drivers)))
-    # model.Minimize(sum(train_used[tr] for tr in range(max_trains)) + sum(driver_used[d] for d in range(max_drivers)))
+
+    # Driver slots are interchangeable; optionally keep one ordering of them
+    profiler.phase("symmetry")
+    break_symmetry(model, symmetry, assigned_dr, driver_used, n_trips, max_drivers, names)
+
+    # Warm start from an earlier solution, repaired to the current rules
+    profiler.phase("hint")
+    if hint is not None:
+        add_hints(model, hint_slots(instance, MONDAY, hint, max_drivers), driver_used, assigned_dr, trip_driver)
+
+    # Objective: trains are already minimal (exact train layer), so only drivers remain
+    profiler.phase("objective")
+    drivers_used = cp_model.LinearExpr.Sum([driver_used[d] for d in range(max_drivers)])
+    model.Add(drivers_used >= lower_bound)
+    model.Minimize(drivers_used)
 
     # Create solver and set time limit
     solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 300.0  # 5 minutes time limit
+    configure(solver, portfolio_parameters(num_workers, seed, deterministic, subsolvers), 300.0)  # 5 minutes
     solver.parameters.log_search_progress = True
+    if hint is not None:
+        # Otherwise presolve may drop the hinted solution
+        solver.parameters.keep_all_feasible_solutions_in_presolve = True
+    profiler.stop()
+    if profile is not None:
+        # The presolve statistics come from the solver log
+        solver.log_callback = profiler.log
     
     # Solve the model
     status = solver.Solve(model)
-    
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # Get the optimal number of trains
-        optimal_trains = sum(solver.Value(train_used[tr]) for tr in range(max_trains))
-        print(f"Optimal number of trains: {optimal_trains}")
-        
-        # # Now add constraint to fix trains at optimal value and minimize drivers
-        # model.Add(sum(train_used[tr] for tr in range(max_trains)) == optimal_trains)
-        # model.Minimize(sum(driver_used[d] for d in range(max_drivers)))
-        
-        print("Second pass: minimizing drivers with fixed trains...")
-        solver2 = cp_model.CpSolver()
-        solver2.parameters.max_time_in_seconds = 300.0
-        solver2.parameters.log_search_progress = True
-        status = solver2.Solve(model)
+    profiler.save(profile)
     
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         if status == cp_model.OPTIMAL:
@@ -170,40 +183,39 @@ def solve_with_ortools_improved():
             print("Feasible solution found!")
         
         # Extract solution
-        solution = []
-        used_drivers = set()
-        used_trains = set()
+        drivers = [f"D{solver.Value(trip_driver[t]) + 1}" for t in range(n_trips)]
         
-        for t in range(n_trips):
-            driver_id = solver2.Value(trip_driver[t])
-            train_id = solver2.Value(trip_train[t])
-            
-            trip = trips[t]
-            solution.append({
-                "nr": trip["nr"],
-                "train": f"T{train_id + 1}",
-                "driver": f"D{driver_id + 1}",
-                "departure": trip["departure"],
-                "arrival": trip["arrival"],
-                "destination": trip["destination"]
-            })
-            used_drivers.add(driver_id)
-            used_trains.add(train_id)
-        
-        print(f"Solution uses {len(used_drivers)} drivers and {len(used_trains)} trains")
-        print(f"Solve time: {solver2.WallTime():.2f} seconds")
-        return solution
+        print(f"Solution uses {len(set(drivers))} drivers")
+        print(f"Solve time: {solver.WallTime():.2f} seconds")
+        return drivers, None
         
     else:
-        raise Exception(f"No solution found. Status: {solver2.StatusName(status)}")
+        raise Exception(f"No solution found. Status: {solver.StatusName(status)}")
 
 
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the driver layer with OR-Tools CP-SAT")
+    parser.add_argument("--hint", help="solution.json of an earlier run (CP, ILP, greedy or naive) to warm-start from")
+    parser.add_argument("--symmetry", choices=SYMMETRY, default="none",
+                        help="symmetry breaking on driver slots: used-slot ordering, or also first-trip ordering")
+    parser.add_argument("--profile", nargs="?", const="profile.json",
+                        help="write the time, size and presolve statistics of every build phase to this JSON file")
+    parser.add_argument("--no-names", action="store_true", help="build the model without variable names (faster)")
+    add_portfolio_arguments(parser)
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
     print("Solving train scheduling problem using OR-Tools CP-SAT")
     print("=" * 60)
     
-    solution = solve_with_ortools_improved()
+    solution, _, timings = solve_layers(Instance.load(), solve_with_ortools_improved, hint=args.hint,
+                                        symmetry=args.symmetry, num_workers=args.workers, seed=args.seed,
+                                        deterministic=args.deterministic, subsolvers=args.subsolvers,
+                                        profile=args.profile, names=not args.no_names,
+                                        train_layer=train_layer(args.turnaround))
+    if args.profile:
+        add_layer_timings(args.profile, timings)
     
     print(f"Optimization completed:")
     print(f"  - All {len(solution)} trips scheduled")
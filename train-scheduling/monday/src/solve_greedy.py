@@ -1,155 +1,134 @@
 import json
-from datetime import datetime
-
-# Load trip data
-with open("data/monfri.json", "r") as f:
-    data = json.load(f)
-
-trips = data["trips"]
-print(f"Solving train scheduling problem with {len(trips)} trips using greedy heuristic")
-
-# Constants
-WORKING_TIME = 9 * 60  # 9 hours in minutes
-DRIVING_TIME = 7 * 60  # 7 hours in minutes
-
-# Sort trips by departure time
-trips_sorted = sorted(trips, key=lambda x: x["departure"])
-
-# Initialize resources
-drivers = []
-trains = []
-solution = []
-
-def trips_overlap(trip1, trip2):
-    """Check if two trips overlap in time"""
-    return not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"])
-
-def can_assign_driver(driver_trips, new_trip):
-    """Check if a driver can take this trip based on constraints"""
-    if not driver_trips:
-        return True
-    
-    # Check overlap with existing trips
-    for existing_trip in driver_trips:
-        if trips_overlap(existing_trip, new_trip):
-            return False
-    
-    # Check working time constraint
-    all_trips = driver_trips + [new_trip]
-    start_time = min(trip["departure"] for trip in all_trips)
-    end_time = max(trip["arrival"] for trip in all_trips)
-    if (end_time - start_time) > WORKING_TIME:
-        return False
-    
-    # Check driving time constraint
-    total_driving = sum(trip["drivingTime"] for trip in all_trips)
-    if total_driving > DRIVING_TIME:
-        return False
-    
-    return True
-
-def can_assign_train(train_trips, new_trip):
-    """Check if a train can take this trip (no overlap)"""
-    for existing_trip in train_trips:
-        if trips_overlap(existing_trip, new_trip):
-            return False
-    return True
-
-# Greedy assignment
-for trip in trips_sorted:
-    assigned = False
-    
-    # Try to assign to existing driver-train pairs
-    for driver_id in range(len(drivers)):
-        for train_id in range(len(trains)):
-            if (can_assign_driver(drivers[driver_id], trip) and 
-                can_assign_train(trains[train_id], trip)):
-                
-                # Assign trip
-                drivers[driver_id].append(trip)
-                trains[train_id].append(trip)
-                solution.append({
-                    "nr": trip["nr"],
-                    "train": f"T{train_id + 1}",
-                    "driver": f"D{driver_id + 1}",
-                    "departure": trip["departure"],
-                    "arrival": trip["arrival"],
-                    "destination": trip["destination"]
-                })
-                assigned = True
-                break
-        
-        if assigned:
-            break
-    
-    # If not assigned, try to use existing driver with new train
-    if not assigned:
-        for driver_id in range(len(drivers)):
-            if can_assign_driver(drivers[driver_id], trip):
-                # Create new train
-                trains.append([trip])
-                drivers[driver_id].append(trip)
-                solution.append({
-                    "nr": trip["nr"],
-                    "train": f"T{len(trains)}",
-                    "driver": f"D{driver_id + 1}",
-                    "departure": trip["departure"],
-                    "arrival": trip["arrival"],
-                    "destination": trip["destination"]
-                })
-                assigned = True
-                break
-    
-    # If still not assigned, try to use existing train with new driver
-    if not assigned:
-        for train_id in range(len(trains)):
-            if can_assign_train(trains[train_id], trip):
-                # Create new driver
-                drivers.append([trip])
-                trains[train_id].append(trip)
-                solution.append({
-                    "nr": trip["nr"],
-                    "train": f"T{train_id + 1}",
-                    "driver": f"D{len(drivers)}",
-                    "departure": trip["departure"],
-                    "arrival": trip["arrival"],
-                    "destination": trip["destination"]
-                })
-                assigned = True
-                break
-    
-    # If still not assigned, create new driver and train
-    if not assigned:
-        drivers.append([trip])
-        trains.append([trip])
-        solution.append({
-            "nr": trip["nr"],
-            "train": f"T{len(trains)}",
-            "driver": f"D{len(drivers)}",
-            "departure": trip["departure"],
-            "arrival": trip["arrival"],
-            "destination": trip["destination"]
-        })
-
-# Sort solution by departure time
-solution.sort(key=lambda x: x["departure"])
-
-# Save solution
-with open("solution.json", "w") as f:
-    json.dump(solution, f, indent=4)
-
-print(f"Greedy solution completed!")
-print(f"Drivers used: {len(drivers)}")
-print(f"Trains used: {len(trains)}")
-print(f"All {len(solution)} trips scheduled")
-
-# Print driver schedules
-print("\nDriver Work Schedules:")
-for i, driver_trips in enumerate(drivers):
-    if driver_trips:
-        start_time = min(trip["departure"] for trip in driver_trips)
-        end_time = max(trip["arrival"] for trip in driver_trips)
-        total_driving = sum(trip["drivingTime"] for trip in driver_trips)
-        print(f"  D{i + 1}: {start_time}-{end_time} ({end_time - start_time} min work, {total_driving} min driving, {len(driver_trips)} trips)")
-
-print(f"\nSolution saved to solution.json")
+from instance import Instance
+from rules import MONDAY
+from train_assignment import assign_trains
+
+FITS = ["best", "first"]
+
+
+def extend(rules, duty, departure, arrival, driving_time):
+    """State of `duty` with one more trip appended, or None if the duty would break a rule.
+
+    Trips come in departure order. A duty state is (latest, earliest,
+    break_latest, last_arrival, driving); None is the empty duty. `latest`
+    is the latest clock-on, fixed by the first trip, and `earliest` the
+    earliest one the working time and the begin of day allow, which only
+    grows. `break_latest` is the latest clock-on, at most `latest`, for
+    which the break fits in a gap before the first trip or between two
+    trips; those gaps never change, so one number stands for all of them.
+    A break after the last trip fits whenever the shift starts at or after
+    last_arrival + break_duration - break_end. This is `rules.shift`
+    kept up to date in O(1) per trip.
+    """
+    earliest = max(rules.begin_of_day, arrival + rules.clock_off - rules.working_time)
+    if duty is None:
+        latest = departure - rules.clock_on
+        # The gap before the first trip takes any early enough clock-on
+        break_latest = min(latest, departure - rules.break_duration - rules.break_start)
+        driving = driving_time
+    else:
+        latest, previous, break_latest, last_arrival, driving = duty
+        if last_arrival > departure:
+            return None
+        driving += driving_time
+        earliest = max(earliest, previous)
+        if departure - last_arrival >= rules.break_duration:
+            # The gap before this trip becomes one between two trips
+            low = last_arrival + rules.break_duration - rules.break_end
+            high = min(latest, departure - rules.break_duration - rules.break_start)
+            if low <= high:
+                break_latest = max(break_latest, high)
+    if driving > rules.driving_time or earliest > latest:
+        return None
+    if rules.break_duration and earliest > break_latest \
+            and arrival + rules.break_duration - rules.break_end > latest:
+        return None
+    return latest, earliest, break_latest, arrival, driving
+
+
+def fit_duties(instance, rules, fit="best"):
+    """Duties built in one pass over the trips, each going to a duty that can take it.
+
+    With fit="best" the duty whose last trip ends latest wins (the shortest
+    idle gap), with "first" the oldest duty; a trip no duty can take opens a
+    new one. Duties that no later trip can join are dropped from the search.
+    Each trip is a linear scan of the duties left, those clocked on within a
+    working time of it, calling `extend` on each (O(1)): O(duties on duty)
+    per trip, all of them for the best fit, up to the first match for the
+    first fit. No key orders the scan, since whether a duty takes a trip
+    depends on its free time, driving time and break together.
+    Returns the duties as lists of rows sorted by departure.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+
+    duties = []
+    states = []
+    candidates = []  # indices of the duties a later trip may still join
+    for t in range(instance.n_trips):  # rows are sorted by departure
+        best, best_state = None, None
+        for k in candidates:
+            state = extend(rules, states[k], departure[t], arrival[t], driving_time[t])
+            if state is not None and (best is None or fit == "best" and states[k][3] > states[best][3]):
+                best, best_state = k, state
+                if fit == "first":
+                    break
+        if best is None:
+            best_state = extend(rules, None, departure[t], arrival[t], driving_time[t])
+            if best_state is None:
+                raise ValueError(f"Trip {instance.nr[t]} cannot be driven by any duty")
+            best = len(duties)
+            duties.append([])
+            states.append(None)
+            candidates.append(best)
+        duties[best].append(t)
+        states[best] = best_state
+
+        # Later trips arrive after this departure, so these duties would work too long
+        closing = departure[t] + rules.clock_off - rules.working_time
+        candidates = [k for k in candidates if max(states[k][1], closing) <= states[k][0]]
+    return duties
+
+
+# Main execution
+if __name__ == "__main__":
+    # Load trip data
+    instance = Instance.load()
+    print(f"Solving train scheduling problem with {instance.n_trips} trips using greedy heuristic")
+
+    # Trains are assigned exactly by the train layer; the greedy only decides drivers
+    train_layer = assign_trains(instance)
+
+    # Each trip goes to the first driver, in hiring order, that can take it
+    duties = fit_duties(instance, MONDAY, "first")
+    driver_of = {t: k for k, duty in enumerate(duties) for t in duty}
+    solution = [{
+        "nr": trip["nr"],
+        "train": train_layer.name(t),
+        "driver": f"D{driver_of[t] + 1}",
+        "departure": trip["departure"],
+        "arrival": trip["arrival"],
+        "destination": trip["destination"]
+    } for t, trip in enumerate(instance.trips())]
+
+    # Sort solution by departure time
+    solution.sort(key=lambda x: x["departure"])
+
+    # Save solution
+    with open("solution.json", "w") as f:
+        json.dump(solution, f, indent=4)
+
+    print(f"Greedy solution completed!")
+    print(f"Drivers used: {len(duties)}")
+    print(f"Trains used: {train_layer.n_trains}")
+    print(f"All {len(solution)} trips scheduled")
+
+    # Print driver schedules
+    print("\nDriver Work Schedules:")
+    for i, duty in enumerate(duties):
+        start_time, end_time = instance.departure[duty[0]], instance.arrival[duty[-1]]
+        print(f"  D{i + 1}: {start_time}-{end_time} ({end_time - start_time} min work, "
+              f"{instance.driving_time[duty].sum()} min driving, {len(duty)} trips)")
+
+    print(f"\nSolution saved to solution.json")
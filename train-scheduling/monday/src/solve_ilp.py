@@ -1,7 +1,16 @@
+import argparse
 import json
 import gurobipy as gp
 from gurobipy import GRB
 from utils import load_wsl_lic
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds
+from hints import hint_slots, set_start
+from symmetry import SYMMETRY, break_symmetry_gurobi
+from profiler import BuildProfile, add_layer_timings
+from rules import MONDAY
 
 LICENSE_DICT = load_wsl_lic('./gurobi.lic')
 
@@ -12,37 +21,48 @@ env.setParam('TimeLimit', 300)  # 5 minutes time limit
 env.start()
 
 
-def solve_with_gurobi():
-    """Solve train scheduling problem using only Gurobi optimization"""
-    
-    # Load trip data
-    with open("data/monfri.json", "r") as f:
-        data = json.load(f)
-    trips = data["trips"]
+def solve_with_gurobi(instance, conflicts="cliques", hint=None, symmetry="none", profile=None):
+    """Solve train scheduling problem using only Gurobi optimization
+
+    `conflicts` is "cliques" (one row per maximal clique of overlapping trips
+    and driver) or "pairwise" (one row per overlapping pair and driver).
+    `hint` is the path of an earlier solution.json used as a MIP start.
+    `symmetry` is one of symmetry.SYMMETRY. `profile` is the path of a JSON
+    report with the time, variables and constraints of every build phase
+    and the presolve statistics (see profiler.py).
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
     
     # Constants
     WORKING_TIME = 9 * 60  # 9 hours in minutes
     DRIVING_TIME = 7 * 60  # 7 hours in minutes
-    n_trips = len(trips)
+    n_trips = instance.n_trips
     
-    # Estimate reasonable upper bounds for drivers and trains
-    max_drivers = n_trips  # Upper bound: one driver per trip
-    max_trains = n_trips   # Upper bound: one train per trip
+    # Driver slots come from a feasible greedy (upper bound); the lower bound
+    # is posted as a row so Gurobi can stop as soon as it is reached
+    lower_bound, max_drivers = driver_bounds(instance, MONDAY)
     
     print(f"Problem size: {n_trips} trips")
-    print(f"Maximum resources: {max_drivers} drivers, {max_trains} trains")
+    print(f"Maximum resources: {max_drivers} drivers")
+
+    # Trains only need non-overlapping trips, so they are assigned exactly
+    # by the train layer in pipeline.py and the ILP only has to decide drivers
     
     # Create optimization model
     model = gp.Model("train_scheduling", env=env)
+    profiler = BuildProfile(model, profile is not None)
+    profiler.phase("usage linking")
     # Decision variables
-    # x[t,d,tr] = 1 if trip t is assigned to driver d and train tr
-    x = model.addVars(n_trips, max_drivers, max_trains, vtype=GRB.BINARY, name="x")
+    # x[t,d] = 1 if trip t is assigned to driver d
+    x = model.addVars(n_trips, max_drivers, vtype=GRB.BINARY, name="x")
     
     # Binary variables for resource usage
     driver_used = model.addVars(max_drivers, vtype=GRB.BINARY, name="driver_used")
-    train_used = model.addVars(max_trains, vtype=GRB.BINARY, name="train_used")
     
     # Additional variables for working time constraints
+    profiler.phase("span")
     # For each driver, track the earliest start time and latest end time
     driver_start_time = model.addVars(max_drivers, vtype=GRB.CONTINUOUS, name="driver_start_time")
     driver_end_time = model.addVars(max_drivers, vtype=GRB.CONTINUOUS, name="driver_end_time")
@@ -52,17 +72,18 @@ def solve_with_gurobi():
     
     print("Adding constraints...")
     
-    # Constraint 1: Each trip must be assigned to exactly one driver-train pair
+    # Constraint 1: Each trip must be assigned to exactly one driver
+    profiler.phase("usage linking")
     for t in range(n_trips):
         model.addConstr(
-            gp.quicksum(x[t, d, tr] for d in range(max_drivers) for tr in range(max_trains)) == 1,
+            x.sum(t, '*') == 1,
             name=f"trip_assignment_{t}"
         )
     
     # Constraint 2: Link resource usage variables
     for d in range(max_drivers):
         # Driver is used if they have at least one trip assigned
-        total_trips_for_driver = gp.quicksum(x[t, d, tr] for t in range(n_trips) for tr in range(max_trains))
+        total_trips_for_driver = x.sum('*', d)
         model.addConstr(
             driver_used[d] * n_trips >= total_trips_for_driver,
             name=f"driver_usage_upper_{d}"
@@ -72,32 +93,10 @@ def solve_with_gurobi():
             name=f"driver_usage_lower_{d}"
         )
         
-    for tr in range(max_trains):
-        # Train is used if it has at least one trip assigned
-        total_trips_for_train = gp.quicksum(x[t, d, tr] for t in range(n_trips) for d in range(max_drivers))
-        model.addConstr(
-            train_used[tr] * n_trips >= total_trips_for_train,
-            name=f"train_usage_upper_{tr}"
-        )
-        model.addConstr(
-            train_used[tr] <= total_trips_for_train,
-            name=f"train_usage_lower_{tr}"
-        )
-    
-    # Constraint 3: No time conflicts for trains (trains cannot overlap)
-    for tr in range(max_trains):
-        for t1 in range(n_trips):
-            for t2 in range(t1 + 1, n_trips):
-                trip1, trip2 = trips[t1], trips[t2]
-                # Check if trips overlap in time
-                if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                    model.addConstr(
-                        gp.quicksum(x[t1, d, tr] for d in range(max_drivers)) + 
-                        gp.quicksum(x[t2, d, tr] for d in range(max_drivers)) <= 1,
-                        name=f"train_conflict_{tr}_{t1}_{t2}"
-                    )
+    # Constraint 3 (no time conflicts for trains) is solved by the train layer in pipeline.py
     
     # Constraint 4: Driver working time constraints
+    profiler.phase("span")
     for d in range(max_drivers):
         # Initialize start and end times when driver is not used
         model.addConstr(
@@ -111,18 +110,17 @@ def solve_with_gurobi():
         
         # For each trip, if assigned to this driver, update start/end times
         for t in range(n_trips):
-            trip = trips[t]
-            trip_assigned_to_driver = gp.quicksum(x[t, d, tr] for tr in range(max_trains))
+            trip_assigned_to_driver = x[t, d]
             
             # If trip is assigned to driver, start time must be <= trip departure
             model.addConstr(
-                driver_start_time[d] <= trip["departure"] + BIG_M * (1 - trip_assigned_to_driver),
+                driver_start_time[d] <= departure[t] + BIG_M * (1 - trip_assigned_to_driver),
                 name=f"driver_start_time_{d}_{t}"
             )
             
             # If trip is assigned to driver, end time must be >= trip arrival
             model.addConstr(
-                driver_end_time[d] >= trip["arrival"] - BIG_M * (1 - trip_assigned_to_driver),
+                driver_end_time[d] >= arrival[t] - BIG_M * (1 - trip_assigned_to_driver),
                 name=f"driver_end_time_{d}_{t}"
             )
         
@@ -134,12 +132,12 @@ def solve_with_gurobi():
         )
 
     # Constraint 5: Driver driving time constraints
+    profiler.phase("driving time")
     for d in range(max_drivers):
-        # Total driving time for this driver across all trains and trips
+        # Total driving time for this driver across all trips
         total_driving_time = gp.quicksum(
-            x[t, d, tr] * trips[t]["drivingTime"] 
-            for t in range(n_trips) 
-            for tr in range(max_trains)
+            x[t, d] * driving_time[t] 
+            for t in range(n_trips)
         )
         model.addConstr(
             total_driving_time <= DRIVING_TIME,
@@ -147,80 +145,88 @@ def solve_with_gurobi():
         )
     
     # Constraint 6: Driver cannot be in two places at once (no overlapping trips)
-    for d in range(max_drivers):
-        for t1 in range(n_trips):
-            for t2 in range(t1 + 1, n_trips):
-                trip1, trip2 = trips[t1], trips[t2]
-                # Check if trips overlap in time
-                if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                    model.addConstr(
-                        gp.quicksum(x[t1, d, tr] for tr in range(max_trains)) + 
-                        gp.quicksum(x[t2, d, tr] for tr in range(max_trains)) <= 1,
-                        name=f"driver_conflict_{d}_{t1}_{t2}"
-                    )
-    
-    # Objective: Minimize total number of drivers and trains used
+    profiler.phase("driver conflicts")
+    if conflicts == "cliques":
+        # Trips of a maximal clique all run at one instant: a driver takes at most
+        # one of them, and only if used. One row replaces all pairs of the clique.
+        cliques = instance.maximal_cliques()
+        for k, clique in enumerate(cliques):
+            for d in range(max_drivers):
+                model.addConstr(
+                    gp.quicksum(x[t, d] for t in clique.tolist()) <= driver_used[d],
+                    name=f"driver_clique_{d}_{k}"
+                )
+        conflict_rows = len(cliques) * max_drivers
+    else:
+        # Trips overlap if NOT (one ends before the other starts)
+        overlapping = list(zip(*(pairs.tolist() for pairs in instance.overlapping_pairs())))
+        for d in range(max_drivers):
+            for t1, t2 in overlapping:
+                model.addConstr(
+                    x[t1, d] + x[t2, d] <= 1,
+                    name=f"driver_conflict_{d}_{t1}_{t2}"
+                )
+        conflict_rows = len(overlapping) * max_drivers
+    
+    profiler.phase("objective")
+    model.addConstr(driver_used.sum() >= lower_bound, name="driver_lower_bound")
+    
+    # Objective: Minimize total number of drivers used (trains are already minimal)
     model.setObjective(
-        gp.quicksum(driver_used[tr] for tr in range(max_drivers)),
+        gp.quicksum(driver_used[d] for d in range(max_drivers)),
         GRB.MINIMIZE
     )
+
+    # Driver slots are interchangeable; optionally keep one ordering of them
+    profiler.phase("symmetry")
+    break_symmetry_gurobi(model, symmetry, x, driver_used, n_trips, max_drivers)
+
+    # Warm start from an earlier solution, repaired to the current rules
+    profiler.phase("hint")
+    if hint is not None:
+        set_start(hint_slots(instance, MONDAY, hint, max_drivers), x, driver_used)
+    
+    model.update()
+    # Presolve statistics: Gurobi presolves a copy once (Model.presolve)
+    profiler.presolve_gurobi()
+    profiler.save(profile)
+    print(f"Model size: {model.NumConstrs} rows ({conflict_rows} {conflicts} conflict rows), {model.NumVars} columns")
     
     print("Starting optimization...")
     model.optimize()
+    print(f"Runtime: {model.Runtime:.2f} seconds")
     
     if model.status == GRB.OPTIMAL:
         print("Optimal solution found!")
         
         # Extract solution
-        solution = []
+        drivers = [None] * n_trips
         drivers_count = 0
-        trains_count = 0
         
         for t in range(n_trips):
             for d in range(max_drivers):
-                for tr in range(max_trains):
-                    if x[t, d, tr].X > 0.5:  # Binary variable is 1
-                        trip = trips[t]
-                        solution.append({
-                            "nr": trip["nr"],
-                            "train": f"T{tr + 1}",
-                            "driver": f"D{d + 1}",
-                            "departure": trip["departure"],
-                            "arrival": trip["arrival"],
-                            "destination": trip["destination"]
-                        })
-                        drivers_count = max(drivers_count, d + 1)
-                        trains_count = max(trains_count, tr + 1)
+                if x[t, d].X > 0.5:  # Binary variable is 1
+                    drivers[t] = f"D{d + 1}"
+                    drivers_count = max(drivers_count, d + 1)
         
-        print(f"Solution uses {drivers_count} drivers and {trains_count} trains")
-        return solution
+        print(f"Solution uses {drivers_count} drivers")
+        return drivers, None
         
     elif model.status == GRB.TIME_LIMIT:
         print("Time limit reached, using best solution found so far...")
         if model.SolCount > 0:
             # Extract best solution found
-            solution = []
+            drivers = [None] * n_trips
             drivers_count = 0
-            trains_count = 0
             
             for t in range(n_trips):
                 for d in range(max_drivers):
-                    for tr in range(max_trains):
-                        if x[t, d, tr].X > 0.5:  # Binary variable is 1
-                            trip = trips[t]
-                            solution.append({
-                                "nr": trip["nr"],
-                                "train": f"T{tr + 1}",
-                                "driver": f"D{d + 1}",
-                                "departure": trip["departure"],
-                                "arrival": trip["arrival"],
-                                "destination": trip["destination"]
-                            })
-                            drivers_count = max(drivers_count, d + 1)
-                            trains_count = max(trains_count, tr + 1)
+                    if x[t, d].X > 0.5:  # Binary variable is 1
+                        drivers[t] = f"D{d + 1}"
+                        drivers_count = max(drivers_count, d + 1)
             
-            print(f"Best solution uses {drivers_count} drivers and {trains_count} trains")
-            return solution
+            print(f"Best solution uses {drivers_count} drivers")
+            return drivers, None
         else:
             raise Exception("No feasible solution found within time limit")
     else:
@@ -228,12 +234,27 @@ def solve_with_gurobi():
         
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the driver layer with Gurobi")
+    parser.add_argument("--conflicts", choices=["cliques", "pairwise"], default="cliques",
+                        help="overlap rows: one per maximal clique (default) or one per pair")
+    parser.add_argument("--hint", help="solution.json of an earlier run (CP, ILP, greedy or naive) to warm-start from")
+    parser.add_argument("--symmetry", choices=SYMMETRY, default="none",
+                        help="symmetry breaking on driver slots: used-slot ordering, or also first-trip ordering")
+    parser.add_argument("--profile", nargs="?", const="profile.json",
+                        help="write the time, size and presolve statistics of every build phase to this JSON file")
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
     print("Solving train scheduling problem using Gurobi optimization only")
     print("=" * 60)
     
     try:
         # Solve with Gurobi
-        solution = solve_with_gurobi()
+        solution, _, timings = solve_layers(Instance.load(), solve_with_gurobi, conflicts=args.conflicts,
+                                            hint=args.hint, symmetry=args.symmetry, profile=args.profile,
+                                            train_layer=train_layer(args.turnaround))
+        if args.profile:
+            add_layer_timings(args.profile, timings)
         
         print(f"Optimization completed:")
         print(f"  - All {len(solution)} trips scheduled")
@@ -42,30 +42,26 @@
 # ]
 import json
 from heapq import heappush, heappop
+from instance import Instance
+from train_assignment import assign_trains
 
-def greedy_assign(trips):
-    # trips sorted by departure time
-    trips = sorted(trips, key=lambda x: x["departure"])
+def greedy_assign(instance):
+    # instance rows are already sorted by departure time
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
 
-    trains = []   # min-heap of (available_time, train_id)
+    # trains come from the exact train layer (same earliest-free heap sweep)
+    trains = assign_trains(instance)
     drivers = []  # min-heap of (available_time, driver_id)
 
     assignments = []
-    next_train_id = 1
     next_driver_id = 1
 
-    for trip in trips:
-        dep = trip["departure"]
-        arr = trip["arrival"]
+    for t in range(instance.n_trips):
+        dep = departure[t]
+        arr = arrival[t]
 
-        # assign train - check if any available train can be used
-        if trains and trains[0][0] <= dep:
-            # reuse an available train
-            _, train_id = heappop(trains)
-        else:
-            # create new train
-            train_id = f"T{next_train_id}"
-            next_train_id += 1
+        train_id = trains.name(t)
 
         # assign driver - check if any available driver can be used
         if drivers and drivers[0][0] <= dep:
@@ -76,25 +72,14 @@ def greedy_assign(trips):
             driver_id = f"D{next_driver_id}"
             next_driver_id += 1
 
-        # push them back with new availability time
-        heappush(trains, (arr, train_id))
+        # push the driver back with new availability time
         heappush(drivers, (arr, driver_id))
 
-        assignments.append({
-            "nr": trip["nr"],
-            "train": train_id,
-            "driver": driver_id,
-            "departure": dep,
-            "arrival": arr,
-            "destination": trip["destination"]
-        })
+        assignments.append(instance.assignment(t, driver_id, train_id))
 
     return assignments
 
-with open("data/monfri.json", "r") as f:
-    trips = json.load(f)["trips"]
-
-assignments = greedy_assign(trips)
+assignments = greedy_assign(Instance.load())
 for a in assignments:
     print(a)
 
@@ -0,0 +1,95 @@
+import argparse
+from functools import partial
+from heapq import heappush, heappop
+
+import numpy as np
+
+
+class TrainAssignment:
+    """Result of `assign_trains`.
+
+    `train[t]` is the 0-based train of row `t`. `peak_time` is the certificate of
+    optimality: `n_trains` trips (`peak_trips`) occupy a train at that moment, so
+    no schedule can use fewer trains.
+    """
+
+    def __init__(self, train, n_trains, peak_time, peak_trips, turnaround):
+        self.train = train
+        self.n_trains = n_trains
+        self.peak_time = peak_time
+        self.peak_trips = peak_trips
+        self.turnaround = turnaround
+
+    def name(self, t):
+        return f"T{self.train[t] + 1}"
+
+    def names(self):
+        return [f"T{tr + 1}" for tr in self.train.tolist()]
+
+
+def peak_overlap(starts, ends):
+    """Maximum number of half-open intervals [start, end) covering one instant.
+
+    Returns (count, time). The maximum is always reached at some start, so only
+    starts are probed.
+    """
+    sorted_starts = np.sort(starts)
+    sorted_ends = np.sort(ends)
+    active = (np.searchsorted(sorted_starts, sorted_starts, side="right")
+              - np.searchsorted(sorted_ends, sorted_starts, side="right"))
+    best = int(np.argmax(active))
+    return int(active[best]), int(sorted_starts[best])
+
+
+def assign_trains(instance, turnaround=0):
+    """Minimum-fleet train assignment in O(n log n).
+
+    Trains only have to avoid overlapping trips, so the problem is interval
+    graph colouring: sweep trips by departure and reuse the train that became
+    free the earliest, otherwise open a new one. A train arriving at `a` may
+    depart again from `a + turnaround`.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+
+    train = np.empty(instance.n_trips, dtype=np.int64)
+    available = []  # min-heap of (available_time, train_id)
+    n_trains = 0
+    for t in range(instance.n_trips):  # rows are sorted by departure
+        if available and available[0][0] <= departure[t]:
+            _, tr = heappop(available)
+        else:
+            tr = n_trains
+            n_trains += 1
+        train[t] = tr
+        heappush(available, (arrival[t] + turnaround, tr))
+
+    ends = instance.arrival + turnaround
+    peak, peak_time = peak_overlap(instance.departure, ends)
+    assert peak == n_trains, f"Sweep used {n_trains} trains but the peak overlap is {peak}"
+    peak_trips = np.flatnonzero((instance.departure <= peak_time) & (peak_time < ends))
+    return TrainAssignment(train, n_trains, peak_time, peak_trips, turnaround)
+
+
+def describe(assignment):
+    h, m = divmod(assignment.peak_time, 60)
+    return (f"{assignment.n_trains} trains (optimal: {assignment.n_trains} trips in service "
+            f"at {h:02d}:{m:02d}, turnaround {assignment.turnaround} min)")
+
+
+def minutes(text):
+    value = int(text)
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+    return value
+
+
+def add_train_arguments(parser):
+    """--turnaround of the scripts that assign trains."""
+    parser.add_argument("--turnaround", type=minutes, default=0,
+                        help="minutes a train stands after arriving before it may depart again")
+
+
+def train_layer(turnaround=0):
+    """assign_trains with a fixed turnaround, as the train_layer of pipeline.solve_layers."""
+    return partial(assign_trains, turnaround=turnaround)
@@ -2,6 +2,12 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 import seaborn as sns
+import os
+import sys
+
+# instance.py lives one level up in src/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instance import Instance
 
 # Set style for better aesthetics
 plt.style.use('seaborn-v0_8-whitegrid')
@@ -15,9 +21,9 @@ def to_time_str(minutes):
     h = int(h)
     return f"{h:02d}:{m:02d}"
 
-def filter_trips_data(trips, destination=None, time_range=None):
+def filter_trips_data(instance, destination=None, time_range=None):
     """Filter trips data by destination and/or time range"""
-    df = pd.DataFrame(trips)
+    df = pd.DataFrame(instance.as_columns())
     
     # Filter by destination if specified
     if destination:
@@ -69,9 +75,9 @@ def setup_time_axis(ax, df, padding_minutes=15, tick_interval=30):
     
     return start_time, end_time
 
-def create_filtered_timeline(trips, destination=None, time_range=None):
+def create_filtered_timeline(instance, destination=None, time_range=None):
     """Create a timeline view filtered by destination and/or time range"""
-    df = filter_trips_data(trips, destination, time_range)
+    df = filter_trips_data(instance, destination, time_range)
     if df is None:
         return None
     
@@ -207,9 +213,9 @@ def create_filtered_timeline(trips, destination=None, time_range=None):
     
     return fig
 
-def create_interval_partitioning_visualization(trips, destination=None, time_range=None):
+def create_interval_partitioning_visualization(instance, destination=None, time_range=None):
     """Create interval partitioning visualization showing maximum overlaps and minimum trains needed"""
-    df = filter_trips_data(trips, destination, time_range)
+    df = filter_trips_data(instance, destination, time_range)
     if df is None:
         return None
     
@@ -387,18 +393,13 @@ def save_and_close_figure(fig, filename, saved_files=None):
 
 # Generate timeline images only
 if __name__ == "__main__":
-    import json 
-    with open("data/monfri.json", "r") as f:
-        timetable = json.load(f)
-    
-    trips = timetable["trips"][:]
-    df = pd.DataFrame(trips)
-    destinations = df['destination'].unique()
+    instance = Instance.load()
+    destinations = instance.destinations
     
     print("=" * 80)
     print("🚂 TRAIN TIMELINE VISUALIZATION GENERATOR")
     print("=" * 80)
-    print(f"Total trips: {len(trips)}")
+    print(f"Total trips: {instance.n_trips}")
     print(f"Destinations: {', '.join([dest.title() for dest in destinations])}")
     print()
     
@@ -409,12 +410,12 @@ if __name__ == "__main__":
         # (description, function, args, filename_template)
         ("Creating interval partitioning analysis...", 
          create_interval_partitioning_visualization, 
-         {"trips": trips}, 
+         {"instance": instance}, 
          "train_interval_partitioning.png"),
         
         ("Creating overall timeline overview...", 
          create_filtered_timeline, 
-         {"trips": trips}, 
+         {"instance": instance}, 
          "train_timeline_overview.png"),
     ]
     
@@ -424,7 +425,7 @@ if __name__ == "__main__":
         visualizations.append((
             f"Creating timeline for {start_hour:02d}:00-{end_hour:02d}:00...",
             create_filtered_timeline,
-            {"trips": trips, "time_range": (start_hour, end_hour)},
+            {"instance": instance, "time_range": (start_hour, end_hour)},
             f"train_timeline_{start_hour:02d}h-{end_hour:02d}h.png"
         ))
     
@@ -433,12 +434,12 @@ if __name__ == "__main__":
         visualizations.extend([
             (f"Creating timeline for {destination.title()}...",
              create_filtered_timeline,
-             {"trips": trips, "destination": destination},
+             {"instance": instance, "destination": destination},
              f"train_timeline_{destination}.png"),
             
             (f"Creating interval partitioning analysis for {destination.title()}...",
              create_interval_partitioning_visualization,
-             {"trips": trips, "destination": destination},
+             {"instance": instance, "destination": destination},
              f"train_interval_partitioning_{destination}.png"),
         ])
     
@@ -448,7 +449,7 @@ if __name__ == "__main__":
             visualizations.append((
                 f"Creating timeline for {destination.title()} ({start_hour:02d}:00-{end_hour:02d}:00)...",
                 create_filtered_timeline,
-                {"trips": trips, "destination": destination, "time_range": (start_hour, end_hour)},
+                {"instance": instance, "destination": destination, "time_range": (start_hour, end_hour)},
                 f"train_timeline_{destination}_{start_hour:02d}h-{end_hour:02d}h.png"
             ))
     
@@ -0,0 +1,144 @@
+import hashlib
+import json
+from functools import lru_cache
+
+import numpy as np
+
+DATA_PATH = "data/monfri.json"
+
+
+class Instance:
+    """Timetable stored as NumPy columns, one row per trip, sorted by departure.
+
+    Solvers index trips by row `t`; `row[nr]` maps a trip number back to its row.
+    """
+
+    def __init__(self, trips, working_time_limit=None, driving_time_limit=None):
+        order = sorted(range(len(trips)), key=lambda i: trips[i]["departure"])
+        trips = [trips[i] for i in order]
+
+        self.nr = np.array([trip["nr"] for trip in trips], dtype=np.int64)
+        self.departure = np.array([trip["departure"] for trip in trips], dtype=np.int64)
+        self.arrival = np.array([trip["arrival"] for trip in trips], dtype=np.int64)
+        self.duration = np.array([trip["duration"] for trip in trips], dtype=np.int64)
+        self.driving_time = np.array([trip["drivingTime"] for trip in trips], dtype=np.int64)
+
+        # Destinations are stored as small integer codes into `destinations`
+        self.destinations = sorted(set(trip["destination"] for trip in trips))
+        code = {name: i for i, name in enumerate(self.destinations)}
+        self.destination = np.array([code[trip["destination"]] for trip in trips], dtype=np.int64)
+
+        self.row = {nr: t for t, nr in enumerate(self.nr.tolist())}
+        self.working_time_limit = working_time_limit
+        self.driving_time_limit = driving_time_limit
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data["trips"],
+            working_time_limit=data.get("workingTimeLimit"),
+            driving_time_limit=data.get("drivingTimeLimit"),
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def load(path=DATA_PATH):
+        """Parse a monfri.json file once; later calls with the same path reuse it."""
+        with open(path, "r") as f:
+            return Instance.from_json(json.load(f))
+
+    @property
+    def n_trips(self):
+        return len(self.nr)
+
+    def __len__(self):
+        return self.n_trips
+
+    def destination_name(self, t):
+        return self.destinations[self.destination[t]]
+
+    def fingerprint(self):
+        """Hex digest of the timetable, stable across runs; keys on-disk caches."""
+        digest = hashlib.sha256()
+        for column in (self.nr, self.departure, self.arrival, self.duration, self.driving_time, self.destination):
+            digest.update(column.tobytes())
+        digest.update("\n".join(self.destinations).encode())
+        return digest.hexdigest()
+
+    def trip(self, t):
+        """Row `t` as a plain dict with the same keys as monfri.json."""
+        return {
+            "duration": int(self.duration[t]),
+            "nr": int(self.nr[t]),
+            "arrival": int(self.arrival[t]),
+            "destination": self.destination_name(t),
+            "drivingTime": int(self.driving_time[t]),
+            "departure": int(self.departure[t]),
+        }
+
+    def trips(self):
+        return [self.trip(t) for t in range(self.n_trips)]
+
+    def as_columns(self):
+        """Columns keyed like monfri.json, ready for `pd.DataFrame(...)`."""
+        return {
+            "duration": self.duration,
+            "nr": self.nr,
+            "arrival": self.arrival,
+            "destination": np.array(self.destinations, dtype=object)[self.destination],
+            "drivingTime": self.driving_time,
+            "departure": self.departure,
+        }
+
+    def assignment(self, t, driver, train):
+        """Solution entry for row `t` in the solution.json format."""
+        return {
+            "nr": int(self.nr[t]),
+            "train": train,
+            "driver": driver,
+            "departure": int(self.departure[t]),
+            "arrival": int(self.arrival[t]),
+            "destination": self.destination_name(t),
+        }
+
+    def overlapping_pairs(self):
+        """All pairs (t1, t2), t1 < t2, whose [departure, arrival) intervals overlap.
+
+        Rows are sorted by departure, so t2 overlaps t1 exactly when
+        departure[t2] < arrival[t1]; the candidates form a contiguous block.
+        """
+        n = self.n_trips
+        first = np.arange(1, n + 1)
+        last = np.searchsorted(self.departure, self.arrival, side="left")
+        counts = np.maximum(last - first, 0)
+        t1 = np.repeat(np.arange(n), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        t2 = np.repeat(first, counts) + offsets
+        return t1, t2
+
+    def maximal_cliques(self):
+        """Maximal sets of pairwise overlapping trips, as arrays of rows.
+
+        Overlapping intervals share a common instant, so one sweep over the
+        departure/arrival events lists every maximal clique: a clique is
+        complete when the first arrival follows a run of departures. Arrivals
+        sort before departures at the same minute since [dep, arr) is half-open.
+        Single trips are skipped.
+        """
+        events = sorted(
+            [(a, 0, t) for t, a in enumerate(self.arrival.tolist())]
+            + [(d, 1, t) for t, d in enumerate(self.departure.tolist())]
+        )
+        cliques = []
+        active = set()
+        grown = False
+        for _, is_departure, t in events:
+            if is_departure:
+                active.add(t)
+                grown = True
+            else:
+                if grown and len(active) > 1:
+                    cliques.append(np.array(sorted(active), dtype=np.int64))
+                grown = False
+                active.discard(t)
+        return cliques
@@ -0,0 +1,121 @@
+from ortools.sat.python import cp_model
+
+from portfolio import IncumbentTimes, configure, spent_time
+
+OBJECTIVES = ["drivers", "lexicographic", "weighted"]
+
+
+def expression_range(model, expression):
+    """(min, max) of a linear expression over the variable domains of `model`."""
+    model.Minimize(expression)
+    proto = model.Proto()
+    low = high = proto.objective.offset
+    for ref, coeff in zip(proto.objective.vars, proto.objective.coeffs):
+        domain = list(proto.variables[ref if ref >= 0 else -ref - 1].domain)
+        low += min(coeff * domain[0], coeff * domain[-1])
+        high += max(coeff * domain[0], coeff * domain[-1])
+    model.ClearObjective()
+    return int(low), int(high)
+
+
+def lexicographic_weights(ranges):
+    """Weights of one objective that ranks solutions like the lexicographic order.
+
+    One unit of an objective outweighs the whole range of every later one.
+    """
+    weights = []
+    later = 0
+    for low, high in reversed(ranges):
+        weights.insert(0, later + 1)
+        later += weights[0] * (high - low)
+    return weights
+
+
+def solve_lexicographic(model, objectives, mode="passes", time_limit=300.0, shares=None, parameters=None,
+                        log_callback=None):
+    """Minimise `objectives`, a list of (name, linear expression), most important first.
+
+    mode="passes" solves once per objective. Each pass bounds its objective
+    by the value found, so later passes cannot make it worse, and hints the
+    whole incumbent to the next pass, whose presolve keeps it feasible.
+    `time_limit` is split by `shares` (equal by default); time a pass does not
+    use goes to the remaining ones (deterministic time with interleave_search,
+    see portfolio.configure). If a later pass finds nothing, the
+    solution of the previous one is kept.
+
+    mode="weighted" solves once with the objectives summed under
+    lexicographic_weights over their ranges.
+
+    `parameters` are set on every CpSolver, and `log_callback` receives
+    their log lines (e.g. profiler.BuildProfile.log). Returns `(status, solver,
+    values, passes)`: the overall status (OPTIMAL only if every pass is),
+    the solver holding the returned solution (None if there is none), the
+    value of every objective, and one dict per solve with its name, status,
+    value, bound, wall time and the wall time of its last incumbent.
+    """
+    parameters = parameters or {}
+    shares = shares or [1.0] * len(objectives)
+
+    def solve(name, objective, budget, keep_hint):
+        model.Minimize(objective)
+        solver = cp_model.CpSolver()
+        configure(solver, parameters, budget)
+        if log_callback is not None:
+            solver.log_callback = log_callback
+        if keep_hint:
+            # Otherwise presolve may drop the hinted incumbent
+            solver.parameters.keep_all_feasible_solutions_in_presolve = True
+        incumbents = IncumbentTimes()
+        status = solver.Solve(model, incumbents)
+        found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        return solver, status, {
+            "objective": name,
+            "status": solver.StatusName(status),
+            "value": solver.ObjectiveValue() if found else None,
+            "bound": solver.BestObjectiveBound(),
+            "time": solver.WallTime(),
+            "incumbent_time": incumbents.times[-1][0] if incumbents.times else None,
+        }
+
+    if mode == "weighted":
+        ranges = [expression_range(model, expression) for _, expression in objectives]
+        weights = lexicographic_weights(ranges)
+        print("Weighted objective: " + " + ".join(f"{w} * {name}" for w, (name, _) in zip(weights, objectives)))
+        weighted = sum(w * expression for w, (_, expression) in zip(weights, objectives))
+        solver, status, result = solve("weighted", weighted, time_limit, False)
+        found = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        passes = [result]
+        values = [solver.Value(expression) if found else None for _, expression in objectives]
+        return status, solver if found else None, values, passes
+
+    remaining = time_limit
+    best, status = None, cp_model.UNKNOWN
+    values = [None] * len(objectives)
+    passes = []
+    for i, (name, expression) in enumerate(objectives):
+        budget = max(0.0, remaining) * shares[i] / sum(shares[i:])
+        solver, pass_status, result = solve(name, expression, budget, i > 0)
+        remaining -= spent_time(solver)
+        found = pass_status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+        passes.append(result)
+        print(f"Pass {i + 1}/{len(objectives)} ({name}): {passes[-1]['status']}, "
+              f"value {passes[-1]['value']}, bound {passes[-1]['bound']:.0f}, {solver.WallTime():.2f} seconds")
+        if not found:
+            status = pass_status if best is None else cp_model.FEASIBLE
+            break
+
+        best = solver
+        proven = pass_status == cp_model.OPTIMAL and (i == 0 or status == cp_model.OPTIMAL)
+        status = cp_model.OPTIMAL if proven else cp_model.FEASIBLE
+        values[i] = int(solver.ObjectiveValue())
+        if i + 1 < len(objectives):
+            # Later passes keep this objective and start from the incumbent
+            model.Add(expression <= values[i])
+            model.ClearHints()
+            for index in range(len(model.Proto().variables)):
+                var = model.GetIntVarFromProtoIndex(index)
+                model.AddHint(var, solver.Value(var))
+
+    if best is not None:
+        values = [best.Value(expression) for _, expression in objectives]
+    return status, best, values, passes
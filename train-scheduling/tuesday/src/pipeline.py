@@ -0,0 +1,53 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from train_assignment import assign_trains, describe
+
+
+def _timed(layer, *args, **kwargs):
+    start = time.perf_counter()
+    result = layer(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def solve_layers(instance, driver_layer, train_layer=assign_trains, parallel=True, **driver_kwargs):
+    """Solve the train and driver subproblems separately and merge them.
+
+    No rule links the driver of a trip to its train, so the two layers are
+    independent: `train_layer(instance)` returns a TrainAssignment and
+    `driver_layer(instance, **driver_kwargs)` returns `(drivers, extra)` where
+    `drivers[t]` is the driver name of row `t`. With `parallel=True` each
+    layer runs in its own worker process.
+
+    Returns `(solution, extra, timings)`; `timings` holds the wall time of each
+    layer as measured inside its worker and the total wall time.
+    """
+    start = time.perf_counter()
+    if parallel:
+        # spawn: workers must not inherit solver environments (e.g. Gurobi) from the parent
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            train_future = pool.submit(_timed, train_layer, instance)
+            driver_future = pool.submit(_timed, driver_layer, instance, **driver_kwargs)
+            trains, train_time = train_future.result()
+            (drivers, extra), driver_time = driver_future.result()
+    else:
+        trains, train_time = _timed(train_layer, instance)
+        (drivers, extra), driver_time = _timed(driver_layer, instance, **driver_kwargs)
+    timings = {
+        "trains": train_time,
+        "drivers": driver_time,
+        "total": time.perf_counter() - start,
+    }
+
+    print(f"Train layer: {describe(trains)}")
+    report_timings(timings)
+    solution = [instance.assignment(t, drivers[t], trains.name(t)) for t in range(instance.n_trips)]
+    return solution, extra, timings
+
+
+def report_timings(timings):
+    sequential = timings["trains"] + timings["drivers"]
+    print(f"Wall time: trains {timings['trains']:.2f}s, drivers {timings['drivers']:.2f}s, "
+          f"total {timings['total']:.2f}s (sequential sum {sequential:.2f}s)")
@@ -0,0 +1,181 @@
+import json
+import re
+import time
+
+PHASES = ["usage linking", "train conflicts", "driver conflicts", "driving time", "span", "breaks",
+          "symmetry", "hint", "objective"]
+
+# Kinds of a CP-SAT ConstraintProto, most frequent in these models first
+CP_KINDS = ["linear", "bool_or", "bool_and", "at_most_one", "exactly_one", "interval", "no_overlap",
+            "all_diff", "lin_max", "element", "table", "bool_xor", "int_prod", "int_div", "int_mod",
+            "cumulative", "circuit", "routes", "inverse", "automaton", "reservoir", "no_overlap_2d"]
+
+
+class BuildProfile:
+    """Wall time, variables and constraints added by each phase of a model build.
+
+    Works on a CP-SAT CpModel or a Gurobi Model. `phase(name)` ends the
+    running phase and starts `name`, like a lap timer, so the build code
+    keeps its layout; a name seen before adds to its totals, which lets a
+    loop over drivers alternate phases. Counting happens between phases and
+    is not timed. A disabled profile does nothing.
+    """
+
+    def __init__(self, model, enabled=True):
+        self.model = model
+        self.enabled = enabled
+        self.phases = {}
+        self.presolve = None
+        self.presolve_log = []
+        self._searching = False
+        self.start = time.perf_counter()
+        self.build_time = None
+        self._running = None
+
+    def _counts(self):
+        if hasattr(self.model, "Proto"):
+            proto = self.model.Proto()
+            return len(proto.variables), len(proto.constraints), {}
+        self.model.update()
+        kinds = {"linear": self.model.NumConstrs, "general": self.model.NumGenConstrs,
+                 "quadratic": self.model.NumQConstrs, "sos": self.model.NumSOS}
+        return self.model.NumVars, sum(kinds.values()), kinds
+
+    def _cp_kinds(self, first, last):
+        """Constraint kinds of CP-SAT constraints first..last-1, with the number under enforcement."""
+        kinds = {}
+        constraints = self.model.Proto().constraints
+        for i in range(first, last):
+            constraint = constraints[i]
+            kind = next((kind for kind in CP_KINDS if getattr(constraint, f"has_{kind}")()), "other")
+            kinds[kind] = kinds.get(kind, 0) + 1
+            if len(constraint.enforcement_literal):
+                kinds["enforced"] = kinds.get("enforced", 0) + 1
+        return kinds
+
+    def phase(self, name):
+        """End the running phase (if any) and start `name`; None only ends it."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        variables, constraints, kinds = self._counts()
+        if self._running is not None:
+            running, started, before = self._running
+            entry = self.phases.setdefault(running, {"time": 0.0, "variables": 0, "constraints": 0, "kinds": {}})
+            entry["time"] += now - started
+            entry["variables"] += variables - before[0]
+            entry["constraints"] += constraints - before[1]
+            if kinds:
+                added = {kind: kinds[kind] - before[2][kind] for kind in kinds}
+            else:
+                added = self._cp_kinds(before[1], constraints)
+            for kind, count in added.items():
+                if count:
+                    entry["kinds"][kind] = entry["kinds"].get(kind, 0) + count
+        self._running = None if name is None else (name, time.perf_counter(), (variables, constraints, kinds))
+
+    def stop(self):
+        """End the build: the running phase closes and build_time is taken."""
+        self.phase(None)
+        if self.build_time is None:
+            self.build_time = time.perf_counter() - self.start
+
+    def log(self, line):
+        """CpSolver.log_callback: keeps the log up to the first search, which holds the presolve.
+
+        The solve needs log_search_progress (log_to_stdout may be off).
+        """
+        if self.enabled and not self._searching:
+            self.presolve_log.append(line)
+            self._searching = "Starting search" in line
+
+    def presolve_gurobi(self):
+        """Presolve the Gurobi model once (Model.presolve) and keep the size of the result."""
+        if not self.enabled:
+            return
+        self.stop()
+        start = time.perf_counter()
+        presolved = self.model.presolve()
+        self.presolve = {
+            "time": time.perf_counter() - start,
+            "variables": presolved.NumVars,
+            "binaries": presolved.NumBinVars,
+            "integers": presolved.NumIntVars,
+            "constraints": presolved.NumConstrs + presolved.NumGenConstrs,
+            "nonzeros": presolved.NumNZs,
+        }
+
+    def report(self):
+        self.stop()
+        if self.presolve is None and self.presolve_log:
+            self.presolve = parse_presolve_log(self.presolve_log)
+        variables, constraints, _ = self._counts()
+        phases = sorted(self.phases.items(), key=lambda item: PHASES.index(item[0])
+                        if item[0] in PHASES else len(PHASES))
+        return {
+            "build_time": self.build_time,
+            "variables": variables,
+            "constraints": constraints,
+            "phases": [{"phase": name, **entry} for name, entry in phases],
+            "presolve": self.presolve,
+        }
+
+    def save(self, path):
+        """Write the report as JSON and print one line per phase."""
+        if not self.enabled:
+            return
+        report = self.report()
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Build profile ({report['build_time']:.2f} seconds, {report['variables']} variables, "
+              f"{report['constraints']} constraints):")
+        for entry in report["phases"]:
+            print(f"  {entry['phase']:<17} {entry['time']:8.3f}s {entry['variables']:>9} variables "
+                  f"{entry['constraints']:>9} constraints")
+        if report["presolve"] is not None:
+            print(f"  presolve          {report['presolve'].get('time', float('nan')):8.3f}s "
+                  f"{report['presolve'].get('variables', '?'):>9} variables "
+                  f"{report['presolve'].get('constraints', '?'):>9} constraints left")
+        print(f"Profile saved to {path}")
+
+
+def parse_presolve_log(lines):
+    """Presolve time, size of the presolved model, slowest presolve steps and rules applied, from a CP-SAT log."""
+    stats = {"kinds": {}, "steps": {}, "rules": {}}
+    number = lambda text: int(text.replace("'", ""))
+    presolved = False
+    started = 0.0
+    for line in "\n".join(lines).splitlines():
+        if match := re.match(r"Starting presolve at ([\d.]+)s", line):
+            started = float(match.group(1))
+        elif match := re.match(r"Starting search at ([\d.]+)s", line):
+            stats["time"] = float(match.group(1)) - started
+        elif match := re.match(r"\s*([\d.e+-]+)s\s+[\d.e+-]+d\s+\[(\w+)\]", line):
+            stats["steps"][match.group(2)] = stats["steps"].get(match.group(2), 0.0) + float(match.group(1))
+        elif match := re.match(r"\s*- rule '(.*)' was applied ([\d']+) time", line):
+            stats["rules"][match.group(1)] = number(match.group(2))
+        elif line.startswith("Presolved "):
+            presolved = True
+        elif presolved and (match := re.match(r"#Variables: ([\d']+)", line)):
+            stats["variables"] = number(match.group(1))
+        elif presolved and (match := re.match(r"#k(\w+): ([\d']+)", line)):
+            stats["kinds"][match.group(1)] = number(match.group(2))
+        elif presolved and not line.startswith(("#", " ")):
+            presolved = False
+    stats["constraints"] = sum(stats["kinds"].values())
+    slowest = sorted(stats["steps"].items(), key=lambda item: -item[1])[:10]
+    stats["steps"] = {name: round(seconds, 4) for name, seconds in slowest}
+    stats["rules"] = dict(sorted(stats["rules"].items(), key=lambda item: -item[1]))
+    return stats
+
+
+def add_layer_timings(path, timings):
+    """Add the wall time of the train and driver layers (pipeline.solve_layers) to a saved report.
+
+    Train conflicts are not in the driver models: the train layer solves them.
+    """
+    with open(path, "r") as f:
+        report = json.load(f)
+    report["layers"] = timings
+    with open(path, "w") as f:
+        json.dump(report, f, indent=4)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import time
+
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from rules import RULES
+
+FITS = ["best", "first"]
+
+
+def extend(rules, duty, departure, arrival, driving_time):
+    """State of `duty` with one more trip appended, or None if the duty would break a rule.
+
+    Trips come in departure order. A duty state is (latest, earliest,
+    break_latest, last_arrival, driving); None is the empty duty. `latest`
+    is the latest clock-on, fixed by the first trip, and `earliest` the
+    earliest one the working time and the begin of day allow, which only
+    grows. `break_latest` is the latest clock-on, at most `latest`, for
+    which the break fits in a gap before the first trip or between two
+    trips; those gaps never change, so one number stands for all of them.
+    A break after the last trip fits whenever the shift starts at or after
+    last_arrival + break_duration - break_end. This is `rules.shift`
+    kept up to date in O(1) per trip.
+    """
+    earliest = max(rules.begin_of_day, arrival + rules.clock_off - rules.working_time)
+    if duty is None:
+        latest = departure - rules.clock_on
+        # The gap before the first trip takes any early enough clock-on
+        break_latest = min(latest, departure - rules.break_duration - rules.break_start)
+        driving = driving_time
+    else:
+        latest, previous, break_latest, last_arrival, driving = duty
+        if last_arrival > departure:
+            return None
+        driving += driving_time
+        earliest = max(earliest, previous)
+        if departure - last_arrival >= rules.break_duration:
+            # The gap before this trip becomes one between two trips
+            low = last_arrival + rules.break_duration - rules.break_end
+            high = min(latest, departure - rules.break_duration - rules.break_start)
+            if low <= high:
+                break_latest = max(break_latest, high)
+    if driving > rules.driving_time or earliest > latest:
+        return None
+    if rules.break_duration and earliest > break_latest \
+            and arrival + rules.break_duration - rules.break_end > latest:
+        return None
+    return latest, earliest, break_latest, arrival, driving
+
+
+def fit_duties(instance, rules, fit="best"):
+    """Duties built in one pass over the trips, each going to a duty that can take it.
+
+    With fit="best" the duty whose last trip ends latest wins (the shortest
+    idle gap), with "first" the oldest duty; a trip no duty can take opens a
+    new one. Duties that no later trip can join are dropped from the search.
+    Each trip is a linear scan of the duties left, those clocked on within a
+    working time of it, calling `extend` on each (O(1)): O(duties on duty)
+    per trip, all of them for the best fit, up to the first match for the
+    first fit. No key orders the scan, since whether a duty takes a trip
+    depends on its free time, driving time and break together.
+    Returns the duties as lists of rows sorted by departure.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+
+    duties = []
+    states = []
+    candidates = []  # indices of the duties a later trip may still join
+    for t in range(instance.n_trips):  # rows are sorted by departure
+        best, best_state = None, None
+        for k in candidates:
+            state = extend(rules, states[k], departure[t], arrival[t], driving_time[t])
+            if state is not None and (best is None or fit == "best" and states[k][3] > states[best][3]):
+                best, best_state = k, state
+                if fit == "first":
+                    break
+        if best is None:
+            best_state = extend(rules, None, departure[t], arrival[t], driving_time[t])
+            if best_state is None:
+                raise ValueError(f"Trip {instance.nr[t]} cannot be driven by any duty")
+            best = len(duties)
+            duties.append([])
+            states.append(None)
+            candidates.append(best)
+        duties[best].append(t)
+        states[best] = best_state
+
+        # Later trips arrive after this departure, so these duties would work too long
+        closing = departure[t] + rules.clock_off - rules.working_time
+        candidates = [k for k in candidates if max(states[k][1], closing) <= states[k][0]]
+    return duties
+
+
+def solve_greedy(instance, rules, fits=FITS):
+    """Driver layer: driver name of every row and the "drivers" entries of solution.json.
+
+    The duties of every fit in `fits` are built and the fewest kept; neither
+    fit wins on every timetable. Drivers are numbered in the order of their
+    first trip; each shift is `rules.shift` of its duty (latest feasible clock-on).
+    """
+    drivers = [None] * instance.n_trips
+    driver_times = []
+    duties = min((fit_duties(instance, rules, fit) for fit in fits), key=len)
+    for k, duty in enumerate(duties):
+        shift = rules.shift(instance.departure[duty].tolist(), instance.arrival[duty].tolist(),
+                            instance.driving_time[duty].tolist())
+        if shift is None:
+            raise ValueError(f"Greedy duty {k + 1} breaks the rules")  # extend() and rules.shift disagree
+        for t in duty:
+            drivers[t] = f"D{k + 1}"
+        start, end = shift
+        driver_times.append({
+            "driver": f"D{k + 1}",
+            "start": start,
+            "end": end,
+            "breaks_window_start": start + rules.break_start,
+            "breaks_window_end": start + rules.break_end,
+        })
+    return drivers, driver_times
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Best-fit greedy with clock-on/off, working, driving and break rules")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="tuesday")
+    parser.add_argument("--fit", nargs="+", choices=FITS, default=FITS,
+                        help="best: the duty free last before the trip; first: the oldest duty that can take it")
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    instance = Instance.load(args.data)
+    solution, driver_times, _ = solve_layers(instance, solve_greedy, parallel=False, rules=RULES[args.rules],
+                                             fits=args.fit,
+                                             train_layer=train_layer(args.turnaround))
+    elapsed = time.perf_counter() - start
+
+    with open("solution.json", "w") as f:
+        json.dump({"trips": solution, "drivers": driver_times}, f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {len(driver_times)} drivers and {len(set(s['train'] for s in solution))} trains")
+    print(f"Solved in {elapsed * 1000:.1f} milliseconds")
+    print("\nSolution is ready for validation with checker.py")
@@ -0,0 +1,60 @@
+SYMMETRY = ["none", "used", "first-trip"]
+
+
+def break_symmetry(model, symmetry, assigned_dr, driver_used, n_trips, max_drivers, names=True):
+    """Symmetry-breaking constraints on the interchangeable driver slots of a CP-SAT model.
+
+    "used" orders the used slots first (driver_used[d] >= driver_used[d + 1]).
+    "first-trip" adds that slots are opened in departure order: the earliest
+    trip is in slot 0, and trip t can take slot d > 0 only if slot d - 1
+    already has an earlier trip, so first trips increase with the slot.
+    `opened[t, d]` is true only if slot d has a trip among rows 0..t.
+    Rows are sorted by departure; hint_slots numbers slots the same way.
+    `names=False` leaves `opened` unnamed.
+    """
+    if symmetry == "none":
+        return
+    for d in range(max_drivers - 1):
+        model.AddImplication(driver_used[d + 1], driver_used[d])
+    if symmetry != "first-trip":
+        return
+
+    model.Add(assigned_dr[(0, 0)] == 1)
+    opened = {}
+    for t in range(n_trips):
+        for d in range(max_drivers):
+            if d > t:
+                model.Add(assigned_dr[(t, d)] == 0)
+                continue
+            opened[(t, d)] = model.NewBoolVar(f'opened_{t}_{d}' if names else '')
+            earlier = [opened[(t - 1, d)]] if (t - 1, d) in opened else []
+            model.AddBoolOr(earlier + [assigned_dr[(t, d)]]).OnlyEnforceIf(opened[(t, d)])
+            if d > 0:
+                model.AddImplication(assigned_dr[(t, d)], opened[(t - 1, d - 1)])
+
+
+def break_symmetry_gurobi(model, symmetry, x, driver_used, n_trips, max_drivers):
+    """The same constraints for a Gurobi model with binaries x[t, d] and driver_used[d].
+
+    `opened[t, d]` is continuous in [0, 1] and only bounded from above by the
+    trips of slot d so far, which is enough to forbid opening slots out of order.
+    """
+    if symmetry == "none":
+        return
+    model.addConstrs((driver_used[d] >= driver_used[d + 1] for d in range(max_drivers - 1)),
+                     name="symmetry_used")
+    if symmetry != "first-trip":
+        return
+
+    model.addConstr(x[0, 0] == 1, name="symmetry_first_trip")
+    opened = model.addVars(n_trips, max_drivers, ub=1, name="opened")
+    for t in range(n_trips):
+        for d in range(max_drivers):
+            if d > t:
+                x[t, d].UB = 0
+                opened[t, d].UB = 0
+                continue
+            earlier = opened[t - 1, d] if t > 0 else 0
+            model.addConstr(opened[t, d] <= earlier + x[t, d], name=f"symmetry_opened_{t}_{d}")
+            if d > 0:
+                model.addConstr(x[t, d] <= opened[t - 1, d - 1], name=f"symmetry_order_{t}_{d}")
@@ -0,0 +1,51 @@
+import argparse
+import json
+import os
+
+from benchmark import measure_build, print_table
+from generate_timetable import generate
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+COLUMNS = [
+    ("trips", "trips", "d"),
+    ("drivers", "slots", "d"),
+    ("variables", "vars", "d"),
+    ("constraints", "constraints", "d"),
+    ("build_time", "build (s)", ".2f"),
+    ("peak_rss_mb", "RSS (MB)", ".0f"),
+]
+
+
+def synthetic(trips, seed=0):
+    """Path of a generated timetable with `trips` trips, written on first use."""
+    path = f"data/synthetic-{trips}-{seed}.json"
+    if not os.path.exists(path):
+        with open(path, "w") as f:
+            json.dump(generate(trips=trips, seed=seed), f, indent=4)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Model build time of the CP driver formulations, with and without names")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS) + ["2000"],
+                        help="names in DATASETS, a number of trips to generate (see generate_timetable.py) "
+                             "or paths to monfri.json files")
+    parser.add_argument("--formulations", nargs="+", choices=["int", "bool"], default=["int", "bool"])
+    parser.add_argument("--repeats", type=int, default=1, help="builds per row; the fastest is reported")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.datasets:
+        path = DATASETS.get(name) or (synthetic(int(name)) if name.isdigit() else name)
+        for formulation in args.formulations:
+            for names in (True, False):
+                print(f"\n--- {name}, {formulation}, {'names' if names else 'no names'} ---")
+                runs = [measure_build(path, formulation=formulation, names=names) for _ in range(args.repeats)]
+                stats = min(runs, key=lambda run: run["build_time"])
+                rows.append(((name, formulation, "yes" if names else "no"), stats))
+
+    print_table(["data", "formulation", "names"], rows, COLUMNS)
@@ -0,0 +1,27 @@
+import argparse
+
+from benchmark import measure, print_table
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the int and bool driver formulations")
+    parser.add_argument("--time-limit", type=float, default=60.0)
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT workers (0: all cores)")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS),
+                        help="names in DATASETS or paths to monfri.json files (see generate_timetable.py)")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.datasets:
+        for formulation in ("int", "bool"):
+            print(f"\n--- {name}, {formulation} ---")
+            stats = measure("solve_cp_minmax_optimized", DATASETS.get(name, name), formulation=formulation,
+                            time_limit=args.time_limit, num_workers=args.workers)
+            rows.append(((name, formulation), stats))
+
+    print_table(["data", "formulation"], rows)
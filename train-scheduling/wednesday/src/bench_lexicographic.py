@@ -0,0 +1,49 @@
+import argparse
+
+from benchmark import COLUMNS, measure, print_table
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+STRATEGIES = ["lexicographic", "weighted"]
+
+COLUMNS = COLUMNS[:6] + [("working_span", "span", ".0f")] + COLUMNS[6:]
+
+
+def faster(results):
+    """Strategy with the best (drivers, working span), then the shortest solve time."""
+    def key(item):
+        _, stats = item
+        found = stats.get("objective") is not None
+        return (not found, stats.get("objective") or 0, stats.get("working_span") or 0, stats.get("solve_time", 0))
+    return min(results.items(), key=key)[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare lexicographic passes with one weighted pass "
+                                                 "for drivers, then total working span")
+    parser.add_argument("--time-limit", type=float, default=120.0)
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT workers (0: all cores)")
+    parser.add_argument("--formulation", choices=["int", "bool"], default="bool")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS),
+                        help="names in DATASETS or paths to monfri.json files (see generate_timetable.py)")
+    args = parser.parse_args()
+
+    rows = []
+    winners = {}
+    for name in args.datasets:
+        results = {}
+        for strategy in STRATEGIES:
+            print(f"\n--- {name}, {strategy} ---")
+            results[strategy] = measure("solve_cp_minmax_optimized", DATASETS.get(name, name),
+                                        formulation=args.formulation, objective=strategy,
+                                        time_limit=args.time_limit, num_workers=args.workers)
+            rows.append(((name, strategy), results[strategy]))
+        winners[name] = faster(results)
+
+    print_table(["data", "strategy"], rows, COLUMNS)
+    print()
+    for name, strategy in winners.items():
+        print(f"{name}: {strategy} is faster (best drivers and working span, then solve time)")
@@ -0,0 +1,31 @@
+import argparse
+
+from benchmark import measure, print_table
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+MODELS = {
+    "compact": "solve_cp_minmax_optimized",
+    "duties": "solve_cp_set_partition",
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the compact CP model with set covering over duties")
+    parser.add_argument("--time-limit", type=float, default=300.0)
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT workers (0: all cores)")
+    parser.add_argument("--datasets", nargs="+", default=["wednesday"],
+                        help="names in DATASETS or paths to monfri.json files (see generate_timetable.py)")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.datasets:
+        for model, module in MODELS.items():
+            print(f"\n--- {name}, {model} ---")
+            stats = measure(module, DATASETS.get(name, name), time_limit=args.time_limit, num_workers=args.workers)
+            rows.append(((name, model), stats))
+
+    print_table(["data", "model"], rows)
@@ -0,0 +1,29 @@
+import argparse
+
+from benchmark import measure, print_table
+from symmetry import SYMMETRY
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time to prove optimality with and without symmetry breaking")
+    parser.add_argument("--time-limit", type=float, default=120.0)
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT workers (0: all cores)")
+    parser.add_argument("--formulation", choices=["int", "bool"], default="bool")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS),
+                        help="names in DATASETS or paths to monfri.json files (see generate_timetable.py)")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.datasets:
+        for symmetry in SYMMETRY:
+            print(f"\n--- {name}, {symmetry} ---")
+            stats = measure("solve_cp_minmax_optimized", DATASETS.get(name, name), formulation=args.formulation,
+                            symmetry=symmetry, time_limit=args.time_limit, num_workers=args.workers)
+            rows.append(((name, symmetry), stats))
+
+    print_table(["data", "symmetry"], rows)
@@ -0,0 +1,51 @@
+import argparse
+import os
+
+from benchmark import measure, print_table
+
+DATASETS = {
+    "monday": "../monday/data/monfri.json",
+    "wednesday": "data/monfri.json",
+}
+
+WORKERS = [1, 2, 4, 8, 16]
+
+COLUMNS = [
+    ("solve_time", "solve (s)", ".2f"),
+    ("optimal_time", "optimal (s)", ".2f"),
+    ("incumbent_time", "incumbent (s)", ".2f"),
+    ("speedup", "speedup", ".2f"),
+    ("objective", "drivers", ".0f"),
+    ("bound", "bound", ".0f"),
+    ("status", "status", ""),
+]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scaling of the CP-SAT portfolio with the number of workers")
+    parser.add_argument("--time-limit", type=float, default=120.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=WORKERS)
+    parser.add_argument("--deterministic", action="store_true",
+                        help="interleaved workers; the time limit is then deterministic time")
+    parser.add_argument("--formulation", choices=["int", "bool"], default="bool")
+    parser.add_argument("--datasets", nargs="+", default=list(DATASETS),
+                        help="names in DATASETS or paths to monfri.json files (see generate_timetable.py)")
+    args = parser.parse_args()
+
+    rows = []
+    for name in args.datasets:
+        base = None
+        for workers in args.workers:
+            print(f"\n--- {name}, {workers} workers ---")
+            stats = measure("solve_cp_minmax_optimized", DATASETS.get(name, name), formulation=args.formulation,
+                            time_limit=args.time_limit, num_workers=workers, deterministic=args.deterministic)
+            # Time to optimal only counts when optimality was proven; speedup is on the final incumbent
+            if stats.get("status") == "OPTIMAL":
+                stats["optimal_time"] = stats["solve_time"]
+            if stats.get("incumbent_time"):
+                base = base or stats["incumbent_time"]
+                stats["speedup"] = base / stats["incumbent_time"]
+            rows.append(((name, workers), stats))
+
+    print(f"\n{os.cpu_count()} cores")
+    print_table(["data", "workers"], rows, COLUMNS)
@@ -0,0 +1,85 @@
+import importlib
+import multiprocessing
+import resource
+import time
+
+from ortools.sat.python import cp_model
+
+from instance import Instance
+
+COLUMNS = [
+    ("variables", "vars", "d"),
+    ("constraints", "constraints", "d"),
+    ("build_time", "build (s)", ".2f"),
+    ("solve_time", "solve (s)", ".2f"),
+    ("peak_rss_mb", "RSS (MB)", ".0f"),
+    ("objective", "drivers", ".0f"),
+    ("bound", "bound", ".0f"),
+    ("status", "status", ""),
+]
+
+
+def _measure(module, path, kwargs):
+    solve = importlib.import_module(module).solve_with_ortools_improved
+    stats = {}
+    try:
+        solve(Instance.load(path), log=False, stats=stats, **kwargs)
+    except Exception as e:
+        print(e)
+    stats["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return stats
+
+
+def measure(module, path, **kwargs):
+    """Build and solve `module`'s CP model on `path` in a fresh process.
+
+    Returns the `stats` filled by the solver plus the peak resident memory of
+    that process, so runs do not share allocations.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure, (module, path, kwargs))
+
+
+def _measure_build(path, kwargs):
+    from bounds import driver_bounds
+    from rules import WEDNESDAY
+    from solve_cp_minmax_optimized import build_driver_model
+
+    instance = Instance.load(path)
+    _, max_drivers = driver_bounds(instance, WEDNESDAY)
+    model = cp_model.CpModel()
+    start = time.perf_counter()
+    build_driver_model(model, instance, max_drivers, **kwargs)
+    return {
+        "trips": instance.n_trips,
+        "drivers": max_drivers,
+        "build_time": time.perf_counter() - start,
+        "variables": len(model.Proto().variables),
+        "constraints": len(model.Proto().constraints),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def measure_build(path, **kwargs):
+    """Only build the wednesday CP model (build_driver_model) on `path`, in a fresh process.
+
+    The driver slots come from bounds.driver_bounds, outside the timing.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(_measure_build, (path, kwargs))
+
+
+def print_table(labels, rows, columns=COLUMNS):
+    """`rows` are (label values, stats) pairs; missing stats print as '-'."""
+    widths = [max(len(label), 10) for label in labels]
+    headers = [f"{label:<{width}}" for label, width in zip(labels, widths)]
+    headers += [f"{header:>{max(len(header), 8)}}" for _, header, _ in columns]
+    print("\n" + "  ".join(headers))
+    for values, stats in rows:
+        cells = [f"{value:<{width}}" for value, width in zip(values, widths)]
+        for key, header, spec in columns:
+            cell = format(stats[key], spec) if stats.get(key) is not None else "-"
+            cells.append(f"{cell:>{max(len(header), 8)}}")
+        print("  ".join(cells))
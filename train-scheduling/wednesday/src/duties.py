@@ -0,0 +1,248 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from instance import Instance
+from rules import RULES
+
+CACHE_DIR = "cache"
+CACHE_VERSION = 1
+MAX_CONNECTIONS = 3  # successors kept per trip by default; None keeps them all
+
+
+class DutyPool:
+    """Feasible driver duties of one instance under one set of rules.
+
+    Duty `k` covers the rows set in `bits[k]`, a bitset packed with
+    `np.packbits` (one bit per row, rows sorted by departure). `start[k]` and
+    `end[k]` are its clock-on and clock-off times.
+    """
+
+    def __init__(self, bits, n_trips, start, end):
+        self.bits = bits
+        self.n_trips = n_trips
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_duties(cls, duties, n_trips, start, end):
+        lengths = [len(duty) for duty in duties]
+        matrix = np.zeros((len(duties), n_trips), dtype=bool)
+        matrix[np.repeat(np.arange(len(duties)), lengths), np.concatenate(duties or [[]]).astype(np.int64)] = True
+        return cls(np.packbits(matrix, axis=1), n_trips,
+                   np.array(start, dtype=np.int64), np.array(end, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.bits)
+
+    def matrix(self):
+        """Boolean (duties x trips) incidence matrix."""
+        return np.unpackbits(self.bits, axis=1, count=self.n_trips).astype(bool)
+
+    def rows(self, k):
+        return np.flatnonzero(np.unpackbits(self.bits[k], count=self.n_trips))
+
+    def union(self, other):
+        """Duties of both pools without duplicates; duties of `self` keep their indices."""
+        bits = np.concatenate([self.bits, other.bits])
+        _, first = np.unique(bits, axis=0, return_index=True)
+        keep = np.concatenate([np.arange(len(self)), np.sort(first[first >= len(self)])])
+        return DutyPool(bits[keep], self.n_trips, np.concatenate([self.start, other.start])[keep],
+                        np.concatenate([self.end, other.end])[keep])
+
+    def duties_of_trips(self):
+        """For each row, the array of duties that cover it."""
+        duty, trip = np.nonzero(self.matrix())
+        order = np.argsort(trip, kind="stable")
+        return np.split(duty[order], np.searchsorted(trip[order], np.arange(1, self.n_trips)))
+
+    def save(self, path):
+        np.savez_compressed(path, bits=self.bits, n_trips=self.n_trips, start=self.start, end=self.end)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data["bits"], int(data["n_trips"]), data["start"], data["end"])
+
+
+def successor_graph(instance, rules, max_connections=MAX_CONNECTIONS):
+    """successors[t]: rows that may directly follow row t in a duty.
+
+    u must depart after t arrives and end within one working span of t's
+    clock-on. With `max_connections=k`, only the k earliest such successors
+    are kept, plus the k earliest that leave a gap long enough for the
+    break; `None` keeps every connection.
+    """
+    departure = instance.departure
+    arrival = instance.arrival
+    latest_arrival = departure - rules.clock_on + rules.working_time - rules.clock_off
+    first = np.searchsorted(departure, arrival, side="left")
+
+    successors = []
+    for t in range(instance.n_trips):
+        candidates = np.arange(first[t], instance.n_trips)
+        candidates = candidates[arrival[candidates] <= latest_arrival[t]]
+        if max_connections is not None:
+            with_break = candidates[departure[candidates] - arrival[t] >= rules.break_duration]
+            candidates = np.union1d(candidates[:max_connections], with_break[:max_connections])
+        successors.append(candidates.tolist())
+    return successors
+
+
+def enumerate_duties(instance, rules, max_connections=MAX_CONNECTIONS, dominance=True):
+    """All feasible duties along the successor graph, by depth-first search.
+
+    A chain that breaks a rule is not extended: every superset of an
+    infeasible duty is infeasible too. With `dominance`, a chain is dropped
+    when it can still be extended at either end by a successor or
+    predecessor in the graph, since that longer duty is also in the pool and
+    any solution using the shorter one can use the longer one instead
+    (covering its extra trip twice, then dropping it from the other duty).
+
+    The defaults give a heuristic pool, not every feasible duty:
+    MAX_CONNECTIONS prunes the successor graph, so the best cover over the
+    pool may need more drivers than the best schedule. With `dominance` the
+    pool only suits a covering master (each trip covered at least once, the
+    duplicates removed by driver_schedule); a partition (each trip exactly
+    once) may have no solution. Callers that need every duty pass
+    `max_connections=None`, and `dominance=False` for a partition.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+    successors = successor_graph(instance, rules, max_connections)
+    predecessors = [[] for _ in range(instance.n_trips)]
+    for t, following in enumerate(successors):
+        for u in following:
+            predecessors[u].append(t)
+
+    duties, starts, ends = [], [], []
+    chain, deps, arrs, drives = [], [], [], []
+
+    def extends_front():
+        return any(rules.shift([departure[v]] + deps, [arrival[v]] + arrs, [driving_time[v]] + drives) is not None
+                   for v in predecessors[chain[0]])
+
+    def visit(shift):
+        extended = False
+        for u in successors[chain[-1]]:
+            chain.append(u)
+            deps.append(departure[u])
+            arrs.append(arrival[u])
+            drives.append(driving_time[u])
+            longer = rules.shift(deps, arrs, drives)
+            if longer is not None:
+                extended = True
+                visit(longer)
+            chain.pop()
+            deps.pop()
+            arrs.pop()
+            drives.pop()
+        if not dominance or not (extended or extends_front()):
+            duties.append(list(chain))
+            starts.append(shift[0])
+            ends.append(shift[1])
+
+    for t in range(instance.n_trips):
+        chain.append(t)
+        deps.append(departure[t])
+        arrs.append(arrival[t])
+        drives.append(driving_time[t])
+        shift = rules.shift(deps, arrs, drives)
+        if shift is None:
+            raise ValueError(f"Trip {instance.nr[t]} cannot be driven by any duty")
+        visit(shift)
+        chain.pop()
+        deps.pop()
+        arrs.pop()
+        drives.pop()
+
+    return DutyPool.from_duties(duties, instance.n_trips, starts, ends)
+
+
+def duty_shift(instance, rules, duty):
+    """`rules.shift` of a duty given as rows sorted by departure."""
+    return rules.shift(instance.departure[duty].tolist(), instance.arrival[duty].tolist(),
+                       instance.driving_time[duty].tolist())
+
+
+def duty_pool(instance, rules, duties):
+    """DutyPool of explicit duties (lists of rows), e.g. the greedy ones."""
+    shifts = [duty_shift(instance, rules, duty) for duty in duties]
+    return DutyPool.from_duties(duties, instance.n_trips, [start for start, _ in shifts],
+                                [end for _, end in shifts])
+
+
+def driver_schedule(instance, rules, duties, names=None):
+    """Driver name of every row and the "drivers" entries of solution.json.
+
+    Duties are numbered by clock-on, or named `names[k]` in the given order.
+    A row covered by several duties stays in the earliest one only, which
+    keeps the others feasible; a duty left without trips is dropped.
+    """
+    drivers = [None] * instance.n_trips
+    driver_times = []
+    order = list(range(len(duties)))
+    if names is None:
+        order.sort(key=lambda k: duty_shift(instance, rules, duties[k])[0])
+    for k in order:
+        rows = [t for t in duties[k] if drivers[t] is None]
+        if not rows:
+            continue
+        name = names[k] if names is not None else f"D{len(driver_times) + 1}"
+        for t in rows:
+            drivers[t] = name
+        start, end = duty_shift(instance, rules, rows)
+        driver_times.append({
+            "driver": name,
+            "start": start,
+            "end": end,
+            "breaks_window_start": start + rules.break_start,
+            "breaks_window_end": start + rules.break_end,
+        })
+    return drivers, driver_times
+
+
+def cache_path(instance, rules, max_connections, dominance, cache_dir=CACHE_DIR):
+    key = repr((CACHE_VERSION, instance.fingerprint(), rules.key(), max_connections, dominance))
+    return os.path.join(cache_dir, f"duties-{hashlib.sha256(key.encode()).hexdigest()[:16]}.npz")
+
+
+def load_duties(instance, rules, max_connections=MAX_CONNECTIONS, dominance=True, cache_dir=CACHE_DIR):
+    """Duty pool from the on-disk cache, enumerated and saved on a miss.
+
+    Same pool as enumerate_duties, so by default a pruned subset of the
+    feasible duties, usable only by a covering master (see there).
+    """
+    path = cache_path(instance, rules, max_connections, dominance, cache_dir)
+    start = time.perf_counter()
+    if os.path.exists(path):
+        pool = DutyPool.load(path)
+        print(f"Loaded {len(pool)} duties from {path} in {time.perf_counter() - start:.2f} seconds")
+        return pool
+
+    pool = enumerate_duties(instance, rules, max_connections, dominance)
+    print(f"Enumerated {len(pool)} duties in {time.perf_counter() - start:.2f} seconds")
+    os.makedirs(cache_dir, exist_ok=True)
+    pool.save(path)
+    print(f"Saved duty pool to {path}")
+    return pool
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enumerate feasible driver duties")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--connections", type=int, default=MAX_CONNECTIONS,
+                        help="successors kept per trip (0: all)")
+    parser.add_argument("--no-dominance", action="store_true")
+    args = parser.parse_args()
+
+    instance = Instance.load(args.data)
+    pool = load_duties(instance, RULES[args.rules], args.connections or None, not args.no_dominance)
+    lengths = pool.matrix().sum(axis=1)
+    print(f"{len(pool)} duties over {instance.n_trips} trips, "
+          f"{lengths.mean():.1f} trips per duty on average, {pool.bits.nbytes / 1024:.0f} KiB packed")
@@ -0,0 +1,110 @@
+import argparse
+import json
+
+import numpy as np
+
+# Cork suburban destinations first, then numbered lines
+LINE_NAMES = ["Cobh", "Midleton", "Mallow", "Youghal", "Kent", "Fota", "Blarney", "Charleville",
+              "Limerick Junction", "Killarney", "Tralee", "Banteer", "Millstreet", "Carrigtwohill"]
+# Monday-to-friday service: every 20 minutes from 5:30 to 22:50, twice as often in the rush hours
+FIRST_DEPARTURE = 5 * 60 + 30
+LAST_DEPARTURE = 22 * 60 + 50
+HEADWAY = 20
+PEAKS = "450-600:2,990-1120:2"
+
+
+def parse_peaks(text):
+    """'start-end:factor,...' (minutes) -> [(start, end, factor)]."""
+    peaks = []
+    for part in filter(None, text.split(",")):
+        window, factor = part.split(":")
+        start, end = window.split("-")
+        peaks.append((int(start), int(end), float(factor)))
+    return peaks
+
+
+def line_departures(offset, first, last, headway, peaks):
+    """Departure minutes of one line; inside a peak the headway is divided by its factor."""
+    departures = []
+    time = first + offset
+    while time <= last:
+        departures.append(int(round(time)))
+        factor = max([f for start, end, f in peaks if start <= time < end], default=1.0)
+        time += headway / factor
+    return departures
+
+
+def generate(lines=3, trips=None, headway=HEADWAY, first=FIRST_DEPARTURE, last=LAST_DEPARTURE,
+             peaks=PEAKS, duration=(55, 65), jitter=0, driving_ratio=0.95, seed=0):
+    """A monfri.json-style timetable dict, reproducible from `seed`.
+
+    Each line runs from `first` to `last` every `headway` minutes, starting at
+    a random offset within one headway, and more often inside `peaks`. Every
+    line has a base trip duration drawn uniformly from `duration` (minutes);
+    each trip adds a uniform jitter of up to `jitter` minutes, and drives
+    `driving_ratio` of its duration. With `trips`, enough lines are added to
+    reach that many trips and a random subset of exactly `trips` is kept.
+    """
+    rng = np.random.default_rng(seed)
+    peaks = parse_peaks(peaks) if isinstance(peaks, str) else peaks
+
+    generated = []
+    line = 0
+    while line < lines or (trips is not None and len(generated) < trips):
+        name = LINE_NAMES[line] if line < len(LINE_NAMES) else f"Line {line + 1}"
+        offset = rng.uniform(0, headway)
+        base = int(rng.integers(duration[0], duration[1] + 1))
+        for departure in line_departures(offset, first, last, headway, peaks):
+            length = max(1, base + int(rng.integers(-jitter, jitter + 1)))
+            generated.append({
+                "duration": length,
+                "destination": name,
+                "drivingTime": max(1, min(length, int(round(length * driving_ratio)))),
+                "departure": departure,
+            })
+        line += 1
+
+    if trips is not None:
+        keep = np.sort(rng.choice(len(generated), size=trips, replace=False))
+        generated = [generated[i] for i in keep]
+
+    generated.sort(key=lambda trip: (trip["departure"], trip["destination"]))
+    return {
+        "nrTrips": len(generated),
+        "trips": [{
+            "duration": trip["duration"],
+            "nr": nr,
+            "arrival": trip["departure"] + trip["duration"],
+            "destination": trip["destination"],
+            "drivingTime": trip["drivingTime"],
+            "departure": trip["departure"],
+        } for nr, trip in enumerate(generated, start=1)],
+        "workingTimeLimit": 9 * 60,
+        "drivingTimeLimit": 7 * 60,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic monfri.json timetable")
+    parser.add_argument("--trips", type=int, help="exact number of trips (adds lines as needed)")
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--headway", type=float, default=HEADWAY, help="minutes between departures of a line")
+    parser.add_argument("--first", type=int, default=FIRST_DEPARTURE, help="first departure (minutes)")
+    parser.add_argument("--last", type=int, default=LAST_DEPARTURE, help="last departure (minutes)")
+    parser.add_argument("--peaks", default=PEAKS, help="rush hours as 'start-end:factor,...' in minutes")
+    parser.add_argument("--duration", type=int, nargs=2, default=(55, 65), metavar=("MIN", "MAX"),
+                        help="range of the base trip duration of a line")
+    parser.add_argument("--jitter", type=int, default=0, help="per-trip duration jitter (minutes)")
+    parser.add_argument("--driving-ratio", type=float, default=0.95, help="drivingTime / duration")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="default: data/synthetic-<trips>-<seed>.json")
+    args = parser.parse_args()
+
+    timetable = generate(args.lines, args.trips, args.headway, args.first, args.last, args.peaks,
+                         tuple(args.duration), args.jitter, args.driving_ratio, args.seed)
+    output = args.output or f"data/synthetic-{timetable['nrTrips']}-{args.seed}.json"
+    with open(output, "w") as f:
+        json.dump(timetable, f, indent=4)
+
+    lines = len(set(trip["destination"] for trip in timetable["trips"]))
+    print(f"Wrote {timetable['nrTrips']} trips on {lines} lines to {output}")
@@ -0,0 +1,250 @@
+from bisect import bisect_left, bisect_right
+
+from rules import INFINITY
+
+MOVES = ["relocate", "swap", "chain"]
+
+
+class Schedule:
+    """Trips of every resource (driver or train) as row lists sorted by departure, with cached aggregates.
+
+    Resource k keeps its rows, their departures and arrivals, prefix sums
+    of driving time and its long gaps: the gaps between consecutive trips
+    wide enough to hold the break of `rules` wherever the window puts it.
+    A move is scored without building the new sequences: each new sequence
+    is a concatenation of at most four segments (a slice of a resource or a
+    single trip), and `span` checks it from the segments' aggregates, in
+    O(segments + log n). Without `rules` (trains) only overlaps count.
+
+    The objective is (resources, idle), idle being the minutes between the
+    first departure and the last arrival of a resource that are not spent on
+    its trips. Trips only move between resources, so a move changes idle by
+    the change in the spans (last arrival - first departure).
+    """
+
+    def __init__(self, instance, sequences, rules=None):
+        self.departure = instance.departure.tolist()
+        self.arrival = instance.arrival.tolist()
+        self.driving_time = instance.driving_time.tolist()
+        self.rules = rules
+        if rules is None:
+            self.driving_limit = INFINITY
+            self.break_duration = 0
+        else:
+            self.driving_limit = rules.driving_time
+            self.break_duration = rules.break_duration
+            # rules.shift fits the break in a gap of this width or more
+            self.long_gap = max(rules.break_duration, 2 * rules.break_duration + rules.break_start - rules.break_end)
+
+        self.owner = [None] * instance.n_trips
+        self.rows, self.dep, self.arr, self.driving, self.spans = [], [], [], [], []
+        self.gap_index, self.gap_start, self.gap_end = [], [], []
+        self.active = []  # non-empty resources
+        self.slot = []  # position of a resource in `active`
+        for rows in sequences:
+            k = len(self.rows)
+            for cache in (self.rows, self.dep, self.arr, self.driving, self.spans,
+                          self.gap_index, self.gap_start, self.gap_end, self.slot):
+                cache.append(None)
+            self._set(k, sorted(rows))
+            if self.span(((k, 0, len(self.rows[k])),)) is None:
+                raise ValueError(f"Resource {k + 1} of the start solution breaks the rules")
+        self.idle = sum(self.spans[k] for k in self.active) - sum(a - d for d, a in zip(self.departure, self.arrival))
+
+    def _set(self, k, rows):
+        """Replace the rows of resource k and refresh its caches."""
+        departure, arrival = self.departure, self.arrival
+        was_active = self.rows[k]
+        self.rows[k] = rows
+        self.dep[k] = dep = [departure[t] for t in rows]
+        self.arr[k] = arr = [arrival[t] for t in rows]
+        driving = [0]
+        for t in rows:
+            driving.append(driving[-1] + self.driving_time[t])
+        self.driving[k] = driving
+        self.spans[k] = arr[-1] - dep[0] if rows else 0
+        if self.break_duration:
+            long_gaps = [i for i in range(len(rows) - 1) if dep[i + 1] - arr[i] >= self.long_gap]
+            self.gap_index[k] = long_gaps
+            self.gap_start[k] = [arr[i] for i in long_gaps]
+            self.gap_end[k] = [dep[i + 1] for i in long_gaps]
+        for t in rows:
+            self.owner[t] = k
+
+        if rows and not was_active:
+            self.slot[k] = len(self.active)
+            self.active.append(k)
+        elif was_active and not rows:
+            last = self.active.pop()
+            if last != k:
+                self.active[self.slot[k]] = last
+                self.slot[last] = self.slot[k]
+
+    def span(self, segments):
+        """Last arrival - first departure of the sequence made of `segments`, or None if it breaks a rule.
+
+        A segment is (k, lo, hi), rows lo..hi-1 of resource k, or (-1, t, t + 1)
+        for the single trip t; empty segments are skipped. The checks are
+        those of rules.shift: no overlap, driving time, working time from the
+        latest clock-on and a break before the first trip, after the last one,
+        in a new gap where two segments meet or in a long gap of a segment.
+        """
+        first = last = None
+        driving = 0
+        joints = []
+        for k, lo, hi in segments:
+            if lo >= hi:
+                continue
+            if k < 0:
+                departure, arrival, time = self.departure[lo], self.arrival[lo], self.driving_time[lo]
+            else:
+                departure, arrival = self.dep[k][lo], self.arr[k][hi - 1]
+                time = self.driving[k][hi] - self.driving[k][lo]
+            if last is None:
+                first = departure
+            elif last > departure:
+                return None
+            elif self.break_duration and departure - last >= self.long_gap:
+                joints.append((last, departure))
+            last = arrival
+            driving += time
+        if first is None:
+            return 0
+        if self.rules is None:
+            return last - first
+        if driving > self.driving_limit:
+            return None
+
+        rules = self.rules
+        latest = first - rules.clock_on
+        earliest = max(rules.begin_of_day, last + rules.clock_off - rules.working_time)
+        if earliest > latest:
+            return None
+        if not self.break_duration or earliest <= first - rules.break_duration - rules.break_start \
+                or last + rules.break_duration - rules.break_end <= latest:
+            return last - first
+        # A gap [gap_start, gap_end] holds the break iff gap_start <= high and gap_end >= low
+        high = latest + rules.break_end - rules.break_duration
+        low = earliest + rules.break_duration + rules.break_start
+        for gap_start, gap_end in joints:
+            if gap_start <= high and gap_end >= low:
+                return last - first
+        for k, lo, hi in segments:
+            if k < 0 or hi - lo < 2:
+                continue
+            # Long gaps of k inside the segment; both their starts and ends increase,
+            # so the last one starting by `high` ends the latest
+            index = self.gap_index[k]
+            a = bisect_left(index, lo)
+            b = bisect_left(index, hi - 1)
+            p = bisect_right(self.gap_start[k], high, a, b) - 1
+            if p >= a and self.gap_end[k][p] >= low:
+                return last - first
+        return None
+
+    def relocate(self, t, b):
+        """(resources, idle) change of moving trip t to resource b, or None if b cannot take it."""
+        a = self.owner[t]
+        if a == b:
+            return None
+        rows_b = self.rows[b]
+        j = bisect_left(rows_b, t)
+        span_b = self.span(((b, 0, j), (-1, t, t + 1), (b, j, len(rows_b))))
+        if span_b is None:
+            return None
+        rows_a = self.rows[a]
+        n_a = len(rows_a)
+        if n_a == 1:
+            return -1, span_b - self.spans[b] - self.spans[a]
+        # Fewer trips never break a rule
+        i = bisect_left(rows_a, t)
+        dep, arr = self.dep[a], self.arr[a]
+        span_a = arr[-1] - dep[1] if i == 0 else arr[-2] - dep[0] if i == n_a - 1 else self.spans[a]
+        return 0, span_a + span_b - self.spans[a] - self.spans[b]
+
+    def _exchange(self, k, i, u):
+        """Segments of resource k with its row at position i replaced by trip u."""
+        p = bisect_left(self.rows[k], u)
+        n = len(self.rows[k])
+        if p <= i:
+            return (k, 0, p), (-1, u, u + 1), (k, p, i), (k, i + 1, n)
+        return (k, 0, i), (k, i + 1, p), (-1, u, u + 1), (k, p, n)
+
+    def swap(self, t, u):
+        """(resources, idle) change of exchanging trips t and u between their resources, or None."""
+        a, b = self.owner[t], self.owner[u]
+        if a == b:
+            return None
+        i = bisect_left(self.rows[a], t)
+        j = bisect_left(self.rows[b], u)
+        span_a = self.span(self._exchange(a, i, u))
+        if span_a is None:
+            return None
+        span_b = self.span(self._exchange(b, j, t))
+        if span_b is None:
+            return None
+        return 0, span_a + span_b - self.spans[a] - self.spans[b]
+
+    def chain(self, t, b):
+        """(resources, idle) change of a chain exchange, or None.
+
+        The resource a of trip t hands t and its later trips to b, and b
+        hands a its trips departing after t. When b has none and t is the
+        first trip of a, a is emptied into b.
+        """
+        a = self.owner[t]
+        if a == b:
+            return None
+        rows_a, rows_b = self.rows[a], self.rows[b]
+        i = bisect_left(rows_a, t)
+        j = bisect_left(rows_b, t)
+        if i == 0 and j == 0:
+            return None  # the resources would only trade names
+        span_b = self.span(((b, 0, j), (a, i, len(rows_a))))
+        if span_b is None:
+            return None
+        span_a = self.span(((a, 0, i), (b, j, len(rows_b))))
+        if span_a is None:
+            return None
+        return -(i == 0 and j == len(rows_b)), span_a + span_b - self.spans[a] - self.spans[b]
+
+    def apply_relocate(self, t, b):
+        a = self.owner[t]
+        self._set(a, [s for s in self.rows[a] if s != t])
+        rows_b = self.rows[b]
+        j = bisect_left(rows_b, t)
+        self._set(b, rows_b[:j] + [t] + rows_b[j:])
+
+    def apply_swap(self, t, u):
+        a, b = self.owner[t], self.owner[u]
+        self._set(a, sorted([s for s in self.rows[a] if s != t] + [u]))
+        self._set(b, sorted([s for s in self.rows[b] if s != u] + [t]))
+
+    def apply_chain(self, t, b):
+        a = self.owner[t]
+        rows_a, rows_b = self.rows[a], self.rows[b]
+        i = bisect_left(rows_a, t)
+        j = bisect_left(rows_b, t)
+        self._set(a, rows_a[:i] + rows_b[j:])
+        self._set(b, rows_b[:j] + rows_a[i:])
+
+    def apply(self, move, t, other, delta):
+        """Carry out a move scored by `delta` (its (resources, idle) change)."""
+        if move == "relocate":
+            self.apply_relocate(t, other)
+        elif move == "swap":
+            self.apply_swap(t, other)
+        else:
+            self.apply_chain(t, other)
+        self.idle += delta[1]
+
+    @property
+    def n_resources(self):
+        return len(self.active)
+
+    def cost(self):
+        return self.n_resources, self.idle
+
+    def sequences(self):
+        """Rows of every non-empty resource, in the order of their first trip."""
+        return sorted((list(self.rows[k]) for k in self.active), key=lambda rows: rows[0])
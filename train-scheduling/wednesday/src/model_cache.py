@@ -0,0 +1,50 @@
+import hashlib
+import os
+import time
+
+import numpy as np
+
+from duties import CACHE_DIR
+
+
+def model_cache_path(instance, rules, options, cache_dir=CACHE_DIR):
+    """Path of a built model: keyed by the timetable, the rules and the builder's `options`.
+
+    `options` holds everything else the model depends on (slot counts,
+    formulation, builder version...) as a dict.
+    """
+    key = repr((instance.fingerprint(), rules.key(), sorted(options.items())))
+    return os.path.join(cache_dir, f"model-{hashlib.sha256(key.encode()).hexdigest()[:16]}.npz")
+
+
+def _indices(variables):
+    if isinstance(variables, list):
+        return [_indices(var) for var in variables]
+    return variables.Index()
+
+
+def _variables(model, indices):
+    if isinstance(indices, list):
+        return [_variables(model, index) for index in indices]
+    return model.GetIntVarFromProtoIndex(indices)
+
+
+def save_model(path, model, variables):
+    """Write `model` and `variables` (a dict of lists, or lists of lists, of its variables).
+
+    The CpModelProto is stored as UTF-8 text format (the Python wrapper
+    parses no binary proto) next to the proto index of every variable.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(path, proto=np.frombuffer(str(model.Proto()).encode(), dtype=np.uint8),
+                        **{name: np.array(_indices(group), dtype=np.int32) for name, group in variables.items()})
+
+
+def load_model(path, model):
+    """Fill the empty CpModel `model` from `path`; returns its variables as save_model got them."""
+    start = time.perf_counter()
+    data = np.load(path)
+    model.Proto().parse_text_format(data["proto"].tobytes().decode())
+    variables = {name: _variables(model, data[name].tolist()) for name in data.files if name != "proto"}
+    print(f"Loaded model from {path} in {time.perf_counter() - start:.2f} seconds")
+    return variables
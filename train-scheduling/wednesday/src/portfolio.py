@@ -0,0 +1,57 @@
+from ortools.sat.python import cp_model
+
+
+def add_portfolio_arguments(parser):
+    """--workers, --seed, --deterministic and --subsolvers of the CP-SAT scripts."""
+    parser.add_argument("--workers", type=int, default=0, help="CP-SAT workers (0: all cores)")
+    parser.add_argument("--seed", type=int, default=1, help="CP-SAT random seed")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="reproducible search: interleaved workers and a deterministic time limit")
+    parser.add_argument("--subsolvers", nargs="+", metavar="NAME",
+                        help="run only these CP-SAT subsolvers, e.g. default_lp max_lp core no_lp quick_restart")
+
+
+def portfolio_parameters(num_workers=0, seed=1, deterministic=False, subsolvers=None):
+    """SatParameters fields of a portfolio, for configure()."""
+    parameters = {"num_workers": num_workers, "random_seed": seed}
+    if deterministic:
+        parameters["interleave_search"] = True
+    if subsolvers:
+        parameters["subsolvers"] = list(subsolvers)
+    return parameters
+
+
+def configure(solver, parameters, time_limit):
+    """Set `parameters` and the time limit on a CpSolver.
+
+    With interleave_search the workers run in deterministic batches and the
+    limit is deterministic time, so runs with the same seed and worker count
+    repeat exactly; otherwise it is wall time.
+    """
+    for key, value in parameters.items():
+        if isinstance(value, list):
+            getattr(solver.parameters, key).extend(value)
+        else:
+            setattr(solver.parameters, key, value)
+    if solver.parameters.interleave_search:
+        solver.parameters.max_deterministic_time = time_limit
+    else:
+        solver.parameters.max_time_in_seconds = time_limit
+
+
+def spent_time(solver):
+    """Time a solve used against its limit: deterministic or wall time, as set by configure()."""
+    if solver.parameters.interleave_search:
+        return solver.response_proto.deterministic_time
+    return solver.WallTime()
+
+
+class IncumbentTimes(cp_model.CpSolverSolutionCallback):
+    """(wall time, objective) of every solution the solver reports."""
+
+    def __init__(self):
+        super().__init__()
+        self.times = []
+
+    def on_solution_callback(self):
+        self.times.append((self.WallTime(), self.ObjectiveValue()))
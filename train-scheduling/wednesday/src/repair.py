@@ -0,0 +1,231 @@
+import argparse
+import json
+import time
+from collections import Counter
+
+import numpy as np
+
+from instance import Instance
+from duties import driver_schedule
+from hints import fits, repair_duties
+from solve_lns import FREED_DRIVERS, choose_drivers, reoptimise
+from rules import RULES
+
+
+def apply_changes(instance, changes):
+    """Timetable after `changes`, with the sets of retimed, cancelled and added trip numbers.
+
+    A change is {"nr", "cancelled": true}; {"nr", "departure", "arrival"} for
+    a trip of the timetable, whose duration follows and whose drivingTime
+    scales with it unless given; or a trip with a new "nr" and the keys of
+    monfri.json (duration may be left out).
+    """
+    trips = {trip["nr"]: trip for trip in instance.trips()}
+    retimed, cancelled, added = set(), set(), set()
+    for change in changes:
+        nr = change["nr"]
+        if change.get("cancelled"):
+            if nr not in trips:
+                raise ValueError(f"Cannot cancel trip {nr}: not in the timetable")
+            del trips[nr]
+            cancelled.add(nr)
+            retimed.discard(nr)
+            added.discard(nr)
+        elif nr in trips:
+            trip = dict(trips[nr])
+            trip["departure"] = change.get("departure", trip["departure"])
+            trip["arrival"] = change.get("arrival", trip["arrival"])
+            duration = trip["arrival"] - trip["departure"]
+            trip["drivingTime"] = change.get("drivingTime", trip["drivingTime"] * duration // max(trip["duration"], 1))
+            trip["duration"] = duration
+            trips[nr] = trip
+            if nr not in added:
+                retimed.add(nr)
+        else:
+            trips[nr] = {
+                "duration": change.get("duration", change["arrival"] - change["departure"]),
+                "nr": nr,
+                "arrival": change["arrival"],
+                "destination": change["destination"],
+                "drivingTime": change["drivingTime"],
+                "departure": change["departure"],
+            }
+            added.add(nr)
+    changed = Instance(list(trips.values()), instance.working_time_limit, instance.driving_time_limit)
+    return changed, retimed, cancelled, added
+
+
+def name_duties(duties, drivers, taken):
+    """Driver name of every duty: the name most of its trips had, else a new D<n>.
+
+    `drivers` holds the earlier name per row (None for added trips); a name
+    goes to one duty only. New names skip every name in `taken`.
+    """
+    names = [None] * len(duties)
+    used = set()
+    # Largest duties choose first, so a split duty keeps its name on the bigger part
+    for k in sorted(range(len(duties)), key=lambda k: -len(duties[k])):
+        counts = Counter(drivers[t] for t in duties[k] if drivers[t] is not None)
+        names[k] = next((name for name, _ in counts.most_common() if name not in used), None)
+        used.add(names[k])
+    n = 0
+    for k in range(len(duties)):
+        while names[k] is None:
+            n += 1
+            if f"D{n}" not in taken and f"D{n}" not in used:
+                names[k] = f"D{n}"
+                used.add(names[k])
+    return names
+
+
+def assign_changed_trains(instance, trains, rows):
+    """Give each of `rows` (None in `trains`) the train that became free last before its departure.
+
+    Trains without a free slot are skipped; if none is free a new T<n> is opened.
+    """
+    members = {}
+    for t, name in enumerate(trains):
+        if name is not None:
+            members.setdefault(name, []).append(t)
+    departure = instance.departure
+    arrival = instance.arrival
+    for t in sorted(rows):
+        best, best_free = None, None
+        for name, others in members.items():
+            if any(departure[u] < arrival[t] and departure[t] < arrival[u] for u in others):
+                continue
+            free = max((arrival[u] for u in others if arrival[u] <= departure[t]), default=-1)
+            if best is None or free > best_free:
+                best, best_free = name, free
+        if best is None:
+            n = len(members) + 1
+            while f"T{n}" in members:
+                n += 1
+            best = f"T{n}"
+            members[best] = []
+        trains[t] = best
+        members[best].append(t)
+
+
+def repair(instance, rules, solution, changes, time_limit=0.5, neighbours=FREED_DRIVERS, parameters=None):
+    """Plan for the timetable after `changes`, moving as few assignments as possible.
+
+    `solution` is the "trips" list of solution.json for `instance`. Trips
+    keep their driver and train. A retimed trip leaves its driver only if
+    the driver's duty breaks a rule with the new times, and its train only
+    if it now overlaps another trip of the train. The freed and added trips
+    go first-fit into the duties (hints.repair_duties) and to the train that
+    became free last before them. If that takes more drivers, the duties
+    that received a trip and `neighbours` more, chosen like the "window"
+    neighbourhood of solve_lns.py, are re-solved together (solve_lns.reoptimise) within `time_limit`,
+    every other duty staying frozen.
+
+    `parameters` are set on that CP-SAT solve (default one worker, which
+    starts fastest). Returns `(instance, trips, driver_times, report)`: the
+    changed timetable, the "trips" and "drivers" of solution.json and a dict
+    counting the changes and the assignments that changed.
+    """
+    start = time.perf_counter()
+    changed, retimed, cancelled, added = apply_changes(instance, changes)
+    old_driver = {trip["nr"]: trip["driver"] for trip in solution}
+    old_train = {trip["nr"]: trip["train"] for trip in solution}
+    nrs = changed.nr.tolist()
+
+    # Drivers: a retimed trip leaves its duty only if the duty no longer fits
+    drivers = [old_driver.get(nr) for nr in nrs]
+    by_driver = {}
+    for t, name in enumerate(drivers):
+        if name is not None:
+            by_driver.setdefault(name, []).append(t)
+    for rows in by_driver.values():
+        if not fits(changed, rules, rows):
+            for t in rows:
+                if nrs[t] in retimed:
+                    drivers[t] = None
+    duties, moved = repair_duties(changed, rules, drivers)
+    names = name_duties(duties, drivers, set(old_driver.values()))
+
+    drivers_before = len(set(old_driver.values()))
+    affected = [k for k, duty in enumerate(duties) if any(drivers[t] != names[k] for t in duty)]
+    if len(duties) > drivers_before and affected:
+        # The duties that took a trip, grown like the "window" neighbourhood of the LNS
+        freed = choose_drivers(changed, rules, duties, "window", len(affected) + neighbours,
+                               np.random.default_rng(0), seeds=affected)
+        result = reoptimise(changed, rules, [duties[k] for k in freed], time_limit=time_limit,
+                            parameters=parameters or {"num_workers": 1})
+        if result is not None and len(result) < len(freed):
+            duties = [duty for k, duty in enumerate(duties) if k not in freed] + result
+            names = name_duties(duties, drivers, set(old_driver.values()))
+    new_drivers, driver_times = driver_schedule(changed, rules, duties, names)
+
+    # Trains: a retimed trip keeps its train unless it now overlaps another of its trips
+    trains = [old_train.get(nr) for nr in nrs]
+    for t in range(changed.n_trips):
+        if nrs[t] not in retimed:
+            continue
+        others = [u for u in range(changed.n_trips) if u != t and trains[u] == trains[t]]
+        if any(changed.departure[u] < changed.arrival[t] and changed.departure[t] < changed.arrival[u]
+               for u in others):
+            trains[t] = None
+    assign_changed_trains(changed, trains, [t for t in range(changed.n_trips) if trains[t] is None])
+
+    trips = [changed.assignment(t, new_drivers[t], trains[t]) for t in range(changed.n_trips)]
+    kept = [t for t in range(changed.n_trips) if nrs[t] not in added]
+    report = {
+        "retimed": len(retimed),
+        "cancelled": len(cancelled),
+        "added": len(added),
+        "driver_changes": sum(new_drivers[t] != old_driver[nrs[t]] for t in kept),
+        "train_changes": sum(trains[t] != old_train[nrs[t]] for t in kept),
+        "drivers": {"before": drivers_before, "after": len(driver_times)},
+        "trains": {"before": len(set(old_train.values())), "after": len(set(trains))},
+        "time": time.perf_counter() - start,
+    }
+    return changed, trips, driver_times, report
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Repair solution.json after delayed, cancelled or added trips. "
+                    "Check the result with checker.py --data set to the --timetable written here")
+    parser.add_argument("--changes", required=True,
+                        help='path to a JSON file with a list of changes, or the list itself, e.g. '
+                             '\'[{"nr": 12, "departure": 430, "arrival": 470}, {"nr": 40, "cancelled": true}]\'')
+    parser.add_argument("--solution", default="solution.json", help="solution of --data to repair")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--time-limit", type=float, default=0.5, help="CP-SAT limit for re-solving affected duties")
+    parser.add_argument("--neighbours", type=int, default=FREED_DRIVERS,
+                        help="unchanged duties re-solved with the affected ones when drivers are added")
+    parser.add_argument("--timetable", default="data/monfri-repaired.json",
+                        help="where to write the timetable with the changes applied")
+    args = parser.parse_args()
+
+    instance = Instance.load(args.data)
+    with open(args.solution, "r") as f:
+        data = json.load(f)
+    if args.changes.lstrip().startswith("["):
+        changes = json.loads(args.changes)
+    else:
+        with open(args.changes, "r") as f:
+            changes = json.load(f)
+
+    changed, trips, driver_times, report = repair(
+        instance, RULES[args.rules], data["trips"] if isinstance(data, dict) else data, changes, args.time_limit,
+        args.neighbours)
+
+    with open(args.timetable, "w") as f:
+        json.dump({"nrTrips": changed.n_trips, "trips": changed.trips(),
+                   "workingTimeLimit": changed.working_time_limit,
+                   "drivingTimeLimit": changed.driving_time_limit}, f, indent=4)
+    with open("solution.json", "w") as f:
+        json.dump({"trips": trips, "drivers": driver_times}, f, indent=4)
+
+    print(f"{report['retimed']} retimed, {report['cancelled']} cancelled, {report['added']} added trips")
+    print(f"Changed assignments: {report['driver_changes']} drivers, {report['train_changes']} trains")
+    print(f"Drivers: {report['drivers']['before']} -> {report['drivers']['after']}, "
+          f"trains: {report['trains']['before']} -> {report['trains']['after']}")
+    print(f"Repaired in {report['time']:.3f} seconds")
+    print(f"\nSolution saved to solution.json, timetable to {args.timetable}")
+    print("\nSolution is ready for validation with checker.py")
@@ -0,0 +1,82 @@
+INFINITY = 10 ** 9
+
+
+class Rules:
+    """Driver duty rules in minutes, as enforced by checker.py.
+
+    The shift runs from clock-on to clock-off and may start earlier than
+    `clock_on` minutes before the first trip. With `break_duration > 0` the
+    shift needs a break of that length, free of trips, inside
+    [start + break_start, start + break_end] and before clock-off.
+    """
+
+    def __init__(self, working_time=9 * 60, driving_time=7 * 60, clock_on=0, clock_off=0,
+                 break_start=3 * 60, break_end=6 * 60, break_duration=0, begin_of_day=0):
+        self.working_time = working_time
+        self.driving_time = driving_time
+        self.clock_on = clock_on
+        self.clock_off = clock_off
+        self.break_start = break_start
+        self.break_end = break_end
+        self.break_duration = break_duration
+        self.begin_of_day = begin_of_day
+
+    def key(self):
+        return (self.working_time, self.driving_time, self.clock_on, self.clock_off,
+                self.break_start, self.break_end, self.break_duration, self.begin_of_day)
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return (f"Rules(working_time={self.working_time}, driving_time={self.driving_time}, "
+                f"clock_on={self.clock_on}, clock_off={self.clock_off}, break_start={self.break_start}, "
+                f"break_end={self.break_end}, break_duration={self.break_duration}, "
+                f"begin_of_day={self.begin_of_day})")
+
+    @property
+    def trip_time(self):
+        """Upper bound on the minutes of trips one shift can hold."""
+        return self.working_time - self.clock_on - self.clock_off - self.break_duration
+
+    def shift(self, departures, arrivals, driving_times):
+        """(start, end) of a feasible shift for a duty, or None if it breaks a rule.
+
+        The duty is given as lists of its non-overlapping trips sorted by
+        departure. The latest feasible start is returned. Removing trips from
+        a feasible duty keeps it feasible.
+        """
+        if sum(driving_times) > self.driving_time:
+            return None
+        latest = departures[0] - self.clock_on
+        earliest = max(self.begin_of_day, arrivals[-1] + self.clock_off - self.working_time)
+        if earliest > latest:
+            return None
+        if not self.break_duration:
+            return latest, arrivals[-1] + self.clock_off
+
+        # A break in the gap [gap_start, gap_end] between trips fits the break
+        # window iff the shift starts in [gap_start + duration - break_end,
+        # gap_end - duration - break_start]; keep the latest such start
+        best = None
+        for gap_start, gap_end in zip([-INFINITY] + arrivals, departures + [INFINITY]):
+            if gap_end - gap_start < self.break_duration:
+                continue
+            low = max(earliest, gap_start + self.break_duration - self.break_end)
+            high = min(latest, gap_end - self.break_duration - self.break_start)
+            if low <= high and (best is None or high > best[0]):
+                best = (high, max(gap_start, high + self.break_start))
+        if best is None:
+            return None
+        start, break_start = best
+        return start, max(arrivals[-1] + self.clock_off, break_start + self.break_duration)
+
+
+MONDAY = Rules()
+TUESDAY = Rules(clock_on=15, clock_off=15, break_duration=60)
+WEDNESDAY = Rules(clock_on=15, clock_off=15, break_duration=60, begin_of_day=5 * 60)
+
+RULES = {"monday": MONDAY, "tuesday": TUESDAY, "wednesday": WEDNESDAY}
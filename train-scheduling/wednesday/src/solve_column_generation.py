@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import time
+from ortools.linear_solver import pywraplp
+from ortools.sat.python import cp_model
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds, greedy_duties
+from duties import driver_schedule, duty_shift, successor_graph
+from portfolio import add_portfolio_arguments, configure, portfolio_parameters
+from rules import INFINITY, RULES, WEDNESDAY
+
+EPSILON = 1e-6
+COLUMNS_PER_ITERATION = 100
+MAX_LABELS = 20  # labels kept per trip by the heuristic pricing
+
+
+class Master:
+    """Restricted master LP: cover every trip with the fewest (fractional) duties.
+
+    Rows are `sum of duties covering t >= 1`; covering rather than partitioning
+    keeps the duals non-negative, and any cover is turned into a partition by
+    dropping repeated trips from all but one duty.
+    """
+
+    def __init__(self, n_trips):
+        self.solver = pywraplp.Solver.CreateSolver("GLOP")
+        self.rows = [self.solver.Constraint(1, self.solver.infinity()) for _ in range(n_trips)]
+        self.objective = self.solver.Objective()
+        self.objective.SetMinimization()
+        self.columns = []
+        self.duties = []
+
+    def add(self, duty):
+        column = self.solver.NumVar(0, self.solver.infinity(), f"duty_{len(self.columns)}")
+        for t in duty:
+            self.rows[t].SetCoefficient(column, 1)
+        self.objective.SetCoefficient(column, 1)
+        self.columns.append(column)
+        self.duties.append(duty)
+
+    def solve(self):
+        """(objective, duals) of the LP over the current columns."""
+        if self.solver.Solve() != pywraplp.Solver.OPTIMAL:
+            raise Exception("Master LP not solved to optimality")
+        return self.objective.Value(), [row.dual_value() for row in self.rows]
+
+
+def price(instance, rules, successors, duals, max_labels=None, deadline=None):
+    """Duties of negative reduced cost, by labelling over the successor graph.
+
+    A label is a chain of trips ending at a row, with the total dual value of
+    its trips, the departure of its first trip (which fixes the latest
+    clock-on), its driving time and the latest clock-on for which a gap seen
+    so far can hold the break. A label dominates another at the same row if
+    it is at least as good in all four; then every completion of the other is
+    feasible and at least as valuable for it. Rows are sorted by departure, so
+    each row's labels are final when it is reached.
+
+    With `max_labels`, only that many labels of highest value are extended from
+    each row (a heuristic); with `None` the search is exact. Returns
+    `(columns, best)`: the best duty ending at each row whose reduced cost
+    `1 - value` is negative, by decreasing value, and the highest value of any
+    duty. Past `deadline` (a time.perf_counter()) the rows left are skipped
+    and `best` is None, since it no longer bounds every duty.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+    duration = rules.break_duration
+
+    def break_gap(gap_start, gap_end, latest):
+        """Latest clock-on for which the gap holds the break, or -INFINITY."""
+        if gap_end - gap_start < duration:
+            return -INFINITY
+        low = gap_start + duration - rules.break_end
+        high = gap_end - duration - rules.break_start
+        return high if low <= min(latest, high) else -INFINITY
+
+    def complete(row, first, break_latest):
+        """Whether the chain ending at `row` is a feasible duty (with its break)."""
+        if not duration:
+            return True
+        earliest = max(rules.begin_of_day, arrival[row] + rules.clock_off - rules.working_time)
+        latest = first - rules.clock_on
+        # The break may also come after the last trip
+        return break_latest >= earliest or max(earliest, arrival[row] + duration - rules.break_end) <= latest
+
+    # label: (value, first departure, driving time, break latest, row, parent label)
+    labels = [[] for _ in range(instance.n_trips)]
+
+    def insert(label):
+        value, first, drive, break_latest = label[:4]
+        bucket = labels[label[4]]
+        for other in bucket:
+            if other[0] >= value and other[1] >= first and other[2] <= drive and other[3] >= break_latest:
+                return
+        bucket[:] = [other for other in bucket
+                     if not (value >= other[0] and first >= other[1] and drive <= other[2] and break_latest >= other[3])]
+        bucket.append(label)
+
+    best = 0.0
+    columns = []
+    for t in range(instance.n_trips):
+        if deadline is not None and time.perf_counter() >= deadline:
+            best = None
+            break
+        latest = departure[t] - rules.clock_on
+        if max(rules.begin_of_day, arrival[t] + rules.clock_off - rules.working_time) <= latest:
+            # A break before the first trip
+            insert((duals[t], departure[t], driving_time[t],
+                    break_gap(-INFINITY, departure[t], latest), t, None))
+
+        bucket = sorted(labels[t], key=lambda label: -label[0])
+        labels[t] = None  # free memory, the row is done
+        finished = [label for label in bucket if complete(t, label[1], label[3])]
+        if finished:
+            best = max(best, finished[0][0])
+            if finished[0][0] > 1 + EPSILON:
+                columns.append(finished[0])
+
+        for label in bucket[:max_labels]:
+            value, first, drive, break_latest = label[:4]
+            latest = first - rules.clock_on
+            for u in successors[t]:
+                earliest = max(rules.begin_of_day, arrival[u] + rules.clock_off - rules.working_time)
+                if earliest > latest or drive + driving_time[u] > rules.driving_time:
+                    continue
+                extended_break = max(break_latest, break_gap(arrival[t], departure[u], latest))
+                if duration and extended_break < earliest and arrival[u] + duration - rules.break_end > latest:
+                    continue  # no gap, now or later, can hold the break
+                insert((value + duals[u], first, drive + driving_time[u], extended_break, u, label))
+
+    columns.sort(key=lambda label: -label[0])
+    duties = []
+    for label in columns:
+        duty = []
+        while label is not None:
+            duty.append(label[4])
+            label = label[5]
+        duties.append(duty[::-1])
+    return duties, best
+
+
+def column_generation(instance, rules, max_connections=None, max_iterations=1000,
+                      columns_per_iteration=COLUMNS_PER_ITERATION, max_labels=MAX_LABELS, time_limit=None):
+    """Solve the LP relaxation of driver set covering by column generation.
+
+    Starts from the greedy duties, prices heuristically while that finds
+    columns and exactly otherwise, for at most `max_iterations` iterations
+    and `time_limit` seconds of wall time. Returns `(master, lower_bound,
+    exact)`: `lower_bound` on the number of drivers is the LP optimum when
+    the last exact pricing found no column (`exact=True`), else Farley's
+    bound (LP value / highest duty value) from the best completed exact
+    pricing, 0 if there was none.
+    """
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    successors = successor_graph(instance, rules, max_connections)
+    master = Master(instance.n_trips)
+    for duty in greedy_duties(instance, rules):
+        master.add(duty)
+
+    lower_bound = 0
+    labels = max_labels
+    for iteration in range(1, max_iterations + 1):
+        objective, duals = master.solve()
+        start = time.perf_counter()
+        duties, best = price(instance, rules, successors, duals, labels, deadline)
+        if best is None:
+            print(f"Iteration {iteration}: LP {objective:.3f}, {len(master.duties)} columns, pricing cut short")
+            break
+        print(f"Iteration {iteration}: LP {objective:.3f}, {len(master.duties)} columns, "
+              f"best reduced cost {1 - best:.3f} ({'exact' if labels is None else 'heuristic'} "
+              f"pricing, {time.perf_counter() - start:.2f} seconds)")
+        if labels is None:
+            lower_bound = max(lower_bound, math.ceil(objective / max(best, 1) - EPSILON))
+        if not duties:
+            if labels is None:
+                return master, math.ceil(objective - EPSILON), True
+            labels = None  # heuristic pricing is exhausted
+            continue
+        for duty in duties[:columns_per_iteration]:
+            if duty_shift(instance, rules, duty) is None:
+                raise Exception(f"Pricing produced an infeasible duty {duty}")
+            master.add(duty)
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+    else:
+        print(f"Pricing stopped after {max_iterations} iterations, Farley bound {lower_bound}")
+        return master, lower_bound, False
+    print(f"Pricing stopped at the {time_limit:g} second limit, Farley bound {lower_bound}"
+          + ("" if lower_bound else " (no exact pricing completed)"))
+    return master, lower_bound, False
+
+
+def solve_with_column_generation(instance, rules=WEDNESDAY, max_connections=None, pricing_time_limit=60.0,
+                                 time_limit=300.0, num_workers=0, seed=1, deterministic=False, subsolvers=None,
+                                 log=False):
+    """Driver layer by column generation, then an integer solve over the columns.
+
+    Column generation gets `pricing_time_limit` seconds and the integer
+    solve `time_limit`. The LP lower bound is reported next to the integer
+    answer so the gap to optimal is known. `num_workers`, `seed`, `deterministic` and `subsolvers`
+    set the CP-SAT portfolio of the integer solve (see portfolio.py). Returns
+    `(drivers, driver_times)` for solve_layers.
+    """
+    start = time.perf_counter()
+    lower_bound, max_drivers = driver_bounds(instance, rules)
+    master, lp_bound, exact = column_generation(instance, rules, max_connections, time_limit=pricing_time_limit)
+    lower_bound = max(lower_bound, lp_bound)
+    print(f"Column generation: {len(master.duties)} columns in {time.perf_counter() - start:.2f} seconds, "
+          f"LP bound {lp_bound} ({'LP optimum' if exact else 'Farley' if lp_bound else 'no exact pricing'})")
+
+    # Integer solve over the generated columns, starting from the greedy duties
+    model = cp_model.CpModel()
+    duty_used = [model.NewBoolVar(f"duty_{k}") for k in range(len(master.duties))]
+    covering = [[] for _ in range(instance.n_trips)]
+    for k, duty in enumerate(master.duties):
+        for t in duty:
+            covering[t].append(duty_used[k])
+        model.AddHint(duty_used[k], k < max_drivers)  # greedy columns come first
+    for lits in covering:
+        model.AddBoolOr(lits)
+    model.Add(cp_model.LinearExpr.Sum(duty_used) >= lower_bound)
+    model.Minimize(cp_model.LinearExpr.Sum(duty_used))
+
+    solver = cp_model.CpSolver()
+    configure(solver, portfolio_parameters(num_workers, seed, deterministic, subsolvers), time_limit)
+    solver.parameters.log_search_progress = log
+    status = solver.Solve(model)
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        raise Exception(f"No solution found. Status: {solver.StatusName(status)}")
+
+    chosen = [duty for k, duty in enumerate(master.duties) if solver.BooleanValue(duty_used[k])]
+    drivers, driver_times = driver_schedule(instance, rules, chosen)
+    print(f"Solution uses {len(driver_times)} drivers, LP lower bound {lower_bound} "
+          f"(gap {len(driver_times) - lower_bound}), {solver.StatusName(status)} over the columns")
+    print(f"Solve time: {time.perf_counter() - start:.2f} seconds")
+    return drivers, driver_times
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the driver layer by column generation")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--connections", type=int, default=0,
+                        help="successors kept per trip in the pricing graph (0: all)")
+    parser.add_argument("--pricing-time-limit", type=float, default=60.0, help="column generation time limit")
+    parser.add_argument("--time-limit", type=float, default=300.0, help="integer solve time limit")
+    add_portfolio_arguments(parser)
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
+    print("Solving train scheduling problem by column generation (GLOP + CP-SAT)")
+    print("=" * 60)
+
+    solution, driver_times, _ = solve_layers(Instance.load(args.data), solve_with_column_generation,
+                                             rules=RULES[args.rules], max_connections=args.connections or None,
+                                             pricing_time_limit=args.pricing_time_limit, time_limit=args.time_limit, num_workers=args.workers, seed=args.seed,
+                                             deterministic=args.deterministic, subsolvers=args.subsolvers,
+                                             train_layer=train_layer(args.turnaround))
+
+    print(f"Optimization completed:")
+    print(f"  - All {len(solution)} trips scheduled")
+
+    # Sort by departure time and save
+    solution.sort(key=lambda x: x["departure"])
+
+    with open("solution.json", "w") as f:
+        json.dump({"trips": solution, "drivers": driver_times}, f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {len(set(s['driver'] for s in solution))} drivers and {len(set(s['train'] for s in solution))} trains")
+
+    print("\nSolution is ready for validation with checker.py")
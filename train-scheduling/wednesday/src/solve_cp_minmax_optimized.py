@@ -1,124 +1,143 @@
+import argparse
 import json
+import os
+import time
 from ortools.sat.python import cp_model
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds
+from hints import add_hints, hint_slots
+from symmetry import SYMMETRY, break_symmetry
+from lexicographic import OBJECTIVES, solve_lexicographic
+from portfolio import add_portfolio_arguments, portfolio_parameters
+from profiler import BuildProfile, add_layer_timings
+from duties import CACHE_DIR
+from model_cache import load_model, model_cache_path, save_model
+from rules import WEDNESDAY
 
-def solve_with_ortools_improved():
-    # Load trip data
-    with open("data/monfri.json", "r") as f:
-        data = json.load(f)
-    trips = data["trips"]
-    
-    # Constants
-    WORKING_TIME = 9 * 60  # 9 hours in minutes
-    DRIVING_TIME = 7 * 60  # 7 hours in minutes
-    CLOCK_ON = 15
-    CLOCK_OFF = 15
-    BREAK_START = 3 * 60
-    BREAK_END = 6 * 60
-    BREAK_DURATION = 60
-    END_OF_DAY = 24 * 60 * 2
-    BEGIN_OF_DAY = 5 * 60  # 5:00 AM in minutes
-    n_trips = len(trips)
-    
-    # More conservative bounds based on problem structure
-    max_trains = min(n_trips, 30)  # Reasonable upper bound
-    max_drivers = min(n_trips, 50)  # Reasonable upper bound
-    
-    print(f"Problem size: {n_trips} trips")
-    print(f"Maximum resources: {max_drivers} drivers, {max_trains} trains")
-    
-    # Create the CP-SAT model
-    model = cp_model.CpModel()
+MODEL_VERSION = 2  # part of the model cache key: bump it when build_driver_model changes
+
+# Constants
+WORKING_TIME = 9 * 60  # 9 hours in minutes
+DRIVING_TIME = 7 * 60  # 7 hours in minutes
+CLOCK_ON = 15
+CLOCK_OFF = 15
+BREAK_START = 3 * 60
+BREAK_END = 6 * 60
+BREAK_DURATION = 60
+END_OF_DAY = 24 * 60 * 2
+BEGIN_OF_DAY = 5 * 60  # 5:00 AM in minutes
+
+
+def build_driver_model(model, instance, max_drivers, formulation="int", conflicts="cliques", symmetry="none",
+                       profiler=None, names=True):
+    """Add the driver layer of `instance` with `max_drivers` driver slots to `model`.
+
+    Returns its variables as lists (model_cache.save_model stores them):
+    "trip_driver" per trip (empty for the "bool" formulation), "assigned"
+    per trip and slot, and "driver_used", "start", "end" and "working_span"
+    per slot. Hints and objectives are not added, so a cached model serves
+    every hint and objective. `names=False` leaves the variables unnamed.
+    """
+    profiler = profiler or BuildProfile(model, False)
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+    n_trips = instance.n_trips
+
+    profiler.phase("usage linking")
     
-    # Decision variables: which driver and train is assigned to each trip
+    # Decision variables: which driver is assigned to each trip
     trip_driver = {}
-    trip_train = {}
-    for t in range(n_trips):
-        trip_driver[t] = model.NewIntVar(0, max_drivers - 1, f'trip_driver_{t}')
-        trip_train[t] = model.NewIntVar(0, max_trains - 1, f'trip_train_{t}')
+    if formulation == "int":
+        for t in range(n_trips):
+            trip_driver[t] = model.NewIntVar(0, max_drivers - 1, f'trip_driver_{t}' if names else '')
     
     # Binary variables for resource usage
     driver_used = {}
-    train_used = {}
     for d in range(max_drivers):
-        driver_used[d] = model.NewBoolVar(f'driver_used_{d}')
-    for tr in range(max_trains):
-        train_used[tr] = model.NewBoolVar(f'train_used_{tr}')
+        driver_used[d] = model.NewBoolVar(f'driver_used_{d}' if names else '')
     
     print("Adding constraints...")
     
-    # Constraint 1: Link driver/train assignment to usage variables 
+    # Constraint 1: Link driver assignment to usage variables 
     assigned_dr = {}
-    assigned_tr = {}
-    for d in range(max_drivers):
-        # Driver d is used if any trip is assigned to driver d
-        assigned_trips = []
+    if formulation == "bool":
+        # Booleans only: x[t, d] is true iff driver d drives trip t
         for t in range(n_trips):
-            trip_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}')
-            assigned_dr[(t, d)] = trip_assigned_to_d
-            model.Add(trip_driver[t] == d).OnlyEnforceIf(trip_assigned_to_d)
-            model.Add(trip_driver[t] != d).OnlyEnforceIf(trip_assigned_to_d.Not())
-            assigned_trips.append(trip_assigned_to_d)
-        
-        # Driver is used if at least one trip is assigned to it
-        model.Add(sum(assigned_trips) >= 1).OnlyEnforceIf(driver_used[d])
-        model.Add(sum(assigned_trips) == 0).OnlyEnforceIf(driver_used[d].Not())
+            for d in range(max_drivers):
+                assigned_dr[(t, d)] = model.NewBoolVar(f'x_{t}_{d}' if names else '')
+            model.AddExactlyOne(assigned_dr[(t, d)] for d in range(max_drivers))
+        for d in range(max_drivers):
+            # Driver is used iff at least one trip is assigned to it
+            assigned_trips = [assigned_dr[(t, d)] for t in range(n_trips)]
+            for trip_assigned_to_d in assigned_trips:
+                model.AddImplication(trip_assigned_to_d, driver_used[d])
+            model.AddBoolOr(assigned_trips).OnlyEnforceIf(driver_used[d])
+    else:
+        for d in range(max_drivers):
+            # Driver d is used if any trip is assigned to driver d
+            assigned_trips = []
+            for t in range(n_trips):
+                trip_assigned_to_d = model.NewBoolVar(f'trip_{t}_assigned_to_driver_{d}' if names else '')
+                assigned_dr[(t, d)] = trip_assigned_to_d
+                model.Add(trip_driver[t] == d).OnlyEnforceIf(trip_assigned_to_d)
+                model.Add(trip_driver[t] != d).OnlyEnforceIf(trip_assigned_to_d.Not())
+                assigned_trips.append(trip_assigned_to_d)
+            
+            # Driver is used if at least one trip is assigned to it
+            trips_of_d = cp_model.LinearExpr.Sum(assigned_trips)
+            model.Add(trips_of_d >= 1).OnlyEnforceIf(driver_used[d])
+            model.Add(trips_of_d == 0).OnlyEnforceIf(driver_used[d].Not())
 
-    for tr in range(max_trains):
-        # Train tr is used if any trip is assigned to train tr
-        assigned_trips = []
-        for t in range(n_trips):
-            trip_assigned_to_tr = model.NewBoolVar(f'trip_{t}_assigned_to_train_{tr}')
-            assigned_tr[(t, tr)] = trip_assigned_to_tr
-            model.Add(trip_train[t] == tr).OnlyEnforceIf(trip_assigned_to_tr)
-            model.Add(trip_train[t] != tr).OnlyEnforceIf(trip_assigned_to_tr.Not())
-            assigned_trips.append(trip_assigned_to_tr)
-        
-        # Train is used if at least one trip is assigned to it
-        model.Add(sum(assigned_trips) >= 1).OnlyEnforceIf(train_used[tr])
-        model.Add(sum(assigned_trips) == 0).OnlyEnforceIf(train_used[tr].Not())    # Constraint 2: No time conflicts for trains
-    
-    # Constraint 2: No time conflicts for drivers
-    for t1 in range(n_trips):
-        for t2 in range(t1 + 1, n_trips):
-            trip1, trip2 = trips[t1], trips[t2]
-            # Check if trips overlap in time (corrected logic)
-            # Trips overlap if NOT (one ends before the other starts)
-            if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                # If trips overlap, they cannot use the same train
-                model.Add(trip_train[t1] != trip_train[t2])
+    # Constraint 2 (no time conflicts for trains) is solved by the train layer in pipeline.py
 
     # Constraint 3: No time conflicts for drivers
-    for t1 in range(n_trips):
-        for t2 in range(t1 + 1, n_trips):
-            trip1, trip2 = trips[t1], trips[t2]
-            # Check if trips overlap in time (corrected logic)
-            # Trips overlap if NOT (one ends before the other starts)
-            if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                # If trips overlap, they cannot use the same driver
-                model.Add(trip_driver[t1] != trip_driver[t2])    # Constraint 4: Driver driving time constraints (simplified)
+    profiler.phase("driver conflicts")
+    if formulation == "bool":
+        # Same conflicts on the booleans: at most one trip of a clique (or pair) per driver
+        if conflicts == "cliques":
+            groups = [clique.tolist() for clique in instance.maximal_cliques()]
+        else:
+            groups = list(zip(*(pairs.tolist() for pairs in instance.overlapping_pairs())))
+        for group in groups:
+            for d in range(max_drivers):
+                model.AddAtMostOne(assigned_dr[(t, d)] for t in group)
+    elif conflicts == "cliques":
+        # Trips of a maximal clique all overlap at one instant, so they need distinct drivers
+        for clique in instance.maximal_cliques():
+            model.AddAllDifferent([trip_driver[t] for t in clique.tolist()])
+    else:
+        # Trips overlap if NOT (one ends before the other starts)
+        for t1, t2 in zip(*(pairs.tolist() for pairs in instance.overlapping_pairs())):
+            # If trips overlap, they cannot use the same driver
+            model.Add(trip_driver[t1] != trip_driver[t2])
 
     # Constraint 4: Total Driving Time < DRIVING_TIME
+    profiler.phase("driving time")
     for d in range(max_drivers):
         # Calculate total driving time for driver d
-        total_driving_time = 0
-        for t in range(n_trips):
-            total_driving_time += assigned_dr[(t, d)] * trips[t]["drivingTime"]
-        
+        total_driving_time = cp_model.LinearExpr.WeightedSum(
+            [assigned_dr[(t, d)] for t in range(n_trips)], driving_time)
         model.Add(total_driving_time <= DRIVING_TIME)
     
     # Constraint 5: Driver working time span constraints 
 
     driver_start_time_vars = []
     driver_end_time_vars = []
+    working_spans = []
     for d in range(max_drivers):
+        profiler.phase("span")
         assigned_vars = [assigned_dr[(t, d)] for t in range(n_trips)]
-        driver_has_trips = model.NewBoolVar(f'driver_{d}_has_trips')
-        model.Add(sum(assigned_vars) >= 1).OnlyEnforceIf(driver_has_trips)
-        model.Add(sum(assigned_vars) == 0).OnlyEnforceIf(driver_has_trips.Not())
+        driver_has_trips = model.NewBoolVar(f'driver_{d}_has_trips' if names else '')
+        trips_of_d = cp_model.LinearExpr.Sum(assigned_vars)
+        model.Add(trips_of_d >= 1).OnlyEnforceIf(driver_has_trips)
+        model.Add(trips_of_d == 0).OnlyEnforceIf(driver_has_trips.Not())
 
         # Find earliest departure and latest arrival for assigned trips
-        driver_start_time = model.NewIntVar(0, 24*60*2, f'driver_{d}_start_time')
-        driver_end_time = model.NewIntVar(0, 24*60*2, f'driver_{d}_end_time')
+        driver_start_time = model.NewIntVar(0, 24*60*2, f'driver_{d}_start_time' if names else '')
+        driver_end_time = model.NewIntVar(0, 24*60*2, f'driver_{d}_end_time' if names else '')
         driver_start_time_vars.append(driver_start_time)
         model.Add(driver_start_time>=BEGIN_OF_DAY) # Just more realistic
         driver_end_time_vars.append(driver_end_time)
@@ -126,33 +145,36 @@ def solve_with_ortools_improved():
         # For each trip, if assigned, update start/end
         for t in range(n_trips):
             is_assigned = assigned_dr[(t, d)]
-            model.Add(driver_start_time <= trips[t]["departure"] - CLOCK_ON).OnlyEnforceIf(is_assigned)
-            model.Add(driver_end_time >= trips[t]["arrival"] + CLOCK_OFF).OnlyEnforceIf(is_assigned)
+            model.Add(driver_start_time <= departure[t] - CLOCK_ON).OnlyEnforceIf(is_assigned)
+            model.Add(driver_end_time >= arrival[t] + CLOCK_OFF).OnlyEnforceIf(is_assigned)
 
         # Working span
-        working_span = model.NewIntVar(0, 24*60, f'driver_{d}_working_span')
+        working_span = model.NewIntVar(0, 24*60, f'driver_{d}_working_span' if names else '')
         model.Add(driver_end_time >= driver_start_time).OnlyEnforceIf(driver_has_trips)
         model.Add(working_span == driver_end_time - driver_start_time).OnlyEnforceIf(driver_has_trips)
         model.Add(working_span == 0).OnlyEnforceIf(driver_has_trips.Not())
         model.Add(working_span <= WORKING_TIME).OnlyEnforceIf(driver_has_trips)
+        working_spans.append(working_span)
 
         # Trip intervals for assigned trips
+        profiler.phase("breaks")
         trip_intervals = []
         for t in range(n_trips):
             is_assigned = assigned_dr[(t, d)]
-            start = trips[t]["departure"]
-            duration = trips[t]["arrival"] - trips[t]["departure"]
-            interval = model.NewOptionalIntervalVar(start, duration, trips[t]["arrival"], is_assigned, f'driver_{d}_trip_{t}_interval')
+            start = departure[t]
+            duration = arrival[t] - departure[t]
+            interval = model.NewOptionalIntervalVar(start, duration, arrival[t], is_assigned,
+                                                    f'driver_{d}_trip_{t}_interval' if names else '')
             trip_intervals.append(interval)
 
         # Break interval: must be present if driver has trips, and between 3rd and 6th hour after start
-        break_start = model.NewIntVar(0, 24*60*2, f'driver_{d}_break_start')
+        break_start = model.NewIntVar(0, 24*60*2, f'driver_{d}_break_start' if names else '')
         break_interval = model.NewOptionalIntervalVar(
             break_start,
             BREAK_DURATION,
             break_start + BREAK_DURATION,
             driver_has_trips,
-            f'driver_{d}_break_interval')
+            f'driver_{d}_break_interval' if names else '')
         
         model.Add(break_start + BREAK_DURATION <= driver_end_time).OnlyEnforceIf(driver_has_trips)
         # Break must be within [start + BREAK_START, start + BREAK_END] if driver has trips
@@ -162,35 +184,135 @@ def solve_with_ortools_improved():
         model.AddNoOverlap([break_interval] + trip_intervals)
 
 
-    # Objective: Lexicographic optimization - first minimize trains, then drivers
-    # First solve for minimum trains
-    print("First pass: minimizing trains...")
-    model.Minimize(sum(train_used[tr] for tr in range(max_trains)))
-    # model.Minimize(sum(train_used[tr] for tr in range(max_trains)) + sum(driver_used[d] for d in range(max_drivers)))
-    # model.Minimize(sum(driver_used[d] for d in range(max_drivers)))
+    # Driver slots are interchangeable; optionally keep one ordering of them
+    profiler.phase("symmetry")
+    break_symmetry(model, symmetry, assigned_dr, driver_used, n_trips, max_drivers, names)
+
+    return {
+        "trip_driver": [trip_driver[t] for t in sorted(trip_driver)],
+        "assigned": [[assigned_dr[(t, d)] for d in range(max_drivers)] for t in range(n_trips)],
+        "driver_used": [driver_used[d] for d in range(max_drivers)],
+        "start": driver_start_time_vars,
+        "end": driver_end_time_vars,
+        "working_span": working_spans,
+    }
+
 
-    # Create solver and set time limit
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = 300.0  # 5 minutes time limit
-    solver.parameters.log_search_progress = True
+def solve_with_ortools_improved(instance, formulation="int", conflicts="cliques", time_limit=300.0,
+                                num_workers=0, seed=1, deterministic=False, subsolvers=None,
+                                log=True, stats=None, hint=None,
+                                symmetry="none", objective="drivers", profile=None, cache_dir=None, names=True):
+    """Driver layer: returns the driver name of every row; trains are solved separately.
+
+    `formulation` is "int" (driver index per trip, channelled to booleans) or
+    "bool" (only x[t, d] booleans with one ExactlyOne per trip). `conflicts`
+    is "cliques" (one AllDifferent per maximal clique of overlapping
+    trips) or "pairwise" (one != per overlapping pair). `num_workers=0` lets
+    CP-SAT use every core; `seed`, `deterministic` and `subsolvers` set the
+    rest of the portfolio (see portfolio.py). If `stats` is a dict it is
+    filled with build/solve times and model size for benchmarks. `hint` is the path of an earlier
+    solution.json used as a warm start. `symmetry` is one of symmetry.SYMMETRY.
+    `objective` is "drivers", or "lexicographic"/"weighted" to minimise the
+    total working span of the drivers next, in two passes or one weighted
+    pass (see lexicographic.py). `profile` is the path of a JSON report with
+    the time, variables and constraints of every build phase and the
+    presolve statistics (see profiler.py). `names=False` leaves the variables
+    unnamed, which skips formatting one name per variable.
+    `cache_dir` keeps the built model on disk (see model_cache.py), keyed by
+    the timetable, the rules, the driver slots and the build options; a
+    later run loads it instead of building.
+    """
+    build_start = time.perf_counter()
+    n_trips = instance.n_trips
     
-    # Solve the model
-    status = solver.Solve(model)
+    # Driver slots come from a feasible greedy (upper bound); the lower bound
+    # is posted below so the search stops as soon as it is reached
+    lower_bound, max_drivers = driver_bounds(instance, WEDNESDAY)
     
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        # Get the optimal number of trains
-        optimal_trains = sum(solver.Value(train_used[tr]) for tr in range(max_trains))
-        print(f"Optimal number of trains: {optimal_trains}")
-        
-        # # # Now add constraint to fix trains at optimal value and minimize drivers
-        print("Second pass: minimizing drivers with fixed trains...")
-        model.Add(sum(train_used[tr] for tr in range(max_trains)) == optimal_trains)
-        model.Minimize(sum(driver_used[d] for d in range(max_drivers)))
-        
-        solver2 = cp_model.CpSolver()
-        solver2.parameters.max_time_in_seconds = 300.0
-        solver2.parameters.log_search_progress = True
-        status = solver2.Solve(model)
+    print(f"Problem size: {n_trips} trips")
+    print(f"Maximum resources: {max_drivers} drivers")
+
+    # Create the CP-SAT model, or load it if this instance was built before
+    model = cp_model.CpModel()
+    profiler = BuildProfile(model, profile is not None)
+    path = None
+    if cache_dir is not None:
+        path = model_cache_path(instance, WEDNESDAY, {
+            "version": MODEL_VERSION,
+            "constants": (WORKING_TIME, DRIVING_TIME, CLOCK_ON, CLOCK_OFF, BREAK_START, BREAK_END,
+                          BREAK_DURATION, BEGIN_OF_DAY),
+            "drivers": max_drivers,
+            "formulation": formulation,
+            "conflicts": conflicts,
+            "symmetry": symmetry,
+            "names": names,
+        }, cache_dir)
+    if path is not None and os.path.exists(path):
+        profiler.phase("cache")
+        variables = load_model(path, model)
+    else:
+        variables = build_driver_model(model, instance, max_drivers, formulation, conflicts, symmetry, profiler,
+                                       names)
+        if path is not None:
+            profiler.phase("cache")
+            save_model(path, model, variables)
+            print(f"Saved model to {path}")
+    trip_driver = dict(enumerate(variables["trip_driver"]))
+    driver_used = dict(enumerate(variables["driver_used"]))
+    assigned_dr = {(t, d): var for t, row in enumerate(variables["assigned"]) for d, var in enumerate(row)}
+    driver_start_time_vars = variables["start"]
+    driver_end_time_vars = variables["end"]
+    working_spans = variables["working_span"]
+
+    # Warm start from an earlier solution, repaired to the current rules
+    profiler.phase("hint")
+    if hint is not None:
+        add_hints(model, hint_slots(instance, WEDNESDAY, hint, max_drivers), driver_used, assigned_dr, trip_driver)
+
+    # Objective: trains are already minimal (exact train layer), so drivers come first,
+    # optionally followed by their total working span (paid time)
+    print("Minimizing drivers...")
+    profiler.phase("objective")
+    drivers_used = cp_model.LinearExpr.Sum([driver_used[d] for d in range(max_drivers)])
+    model.Add(drivers_used >= lower_bound)
+    objectives = [("drivers", drivers_used)]
+    if objective != "drivers":
+        objectives.append(("working span", cp_model.LinearExpr.Sum(working_spans)))
+
+    # Solver parameters; the time limit (5 minutes by default) is split across passes
+    parameters = portfolio_parameters(num_workers, seed, deterministic, subsolvers)
+    parameters["log_search_progress"] = log
+    if hint is not None:
+        # Otherwise presolve may drop the hinted solution
+        parameters["keep_all_feasible_solutions_in_presolve"] = True
+    if profile is not None:
+        # The presolve statistics come from the log of the first pass
+        parameters["log_search_progress"] = True
+        parameters["log_to_stdout"] = log
+    
+    profiler.stop()
+    build_time = time.perf_counter() - build_start
+    print(f"Model built in {build_time:.2f} seconds")
+
+    # Solve the model
+    status, solver, values, passes = solve_lexicographic(
+        model, objectives, "weighted" if objective == "weighted" else "passes", time_limit, parameters=parameters,
+        log_callback=profiler.log if profile is not None else None)
+    profiler.save(profile)
+    solve_time = sum(p["time"] for p in passes)
+    if stats is not None:
+        stats.update({
+            "build_time": build_time,
+            "solve_time": solve_time,
+            "variables": len(model.Proto().variables),
+            "constraints": len(model.Proto().constraints),
+            "status": status.name,
+            "objective": values[0],
+            "bound": passes[0]["bound"] if objective != "weighted" else None,
+            "incumbent_time": passes[0]["incumbent_time"],
+            "working_span": values[1] if len(values) > 1 else None,
+            "passes": passes,
+        })
     
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         if status == cp_model.OPTIMAL:
@@ -199,51 +321,66 @@ def solve_with_ortools_improved():
             print("Feasible solution found!")
         
         # Extract solution
-        solution = []
-        used_drivers = set()
-        used_trains = set()
-        
         driver_times = []
         for d in range(max_drivers):
             driver_times.append({
                 "driver": f"D{d + 1}",
-                "start": solver2.Value(driver_start_time_vars[d]),
-                "end": solver2.Value(driver_end_time_vars[d])
+                "start": solver.Value(driver_start_time_vars[d]),
+                "end": solver.Value(driver_end_time_vars[d])
             })
             driver_times[-1]["breaks_window_start"] = driver_times[-1]["start"] + BREAK_START
             driver_times[-1]["breaks_window_end"] = driver_times[-1]["start"] + BREAK_END
             if driver_times[-1]["end"] - driver_times[-1]["start"] == 0:
                 driver_times.pop()
                 
-        for t in range(n_trips):
-            driver_id = solver2.Value(trip_driver[t])
-            train_id = solver2.Value(trip_train[t])
-            trip = trips[t]
-            solution.append({
-                "nr": trip["nr"],
-                "train": f"T{train_id + 1}",
-                "driver": f"D{driver_id + 1}",
-                "departure": trip["departure"],
-                "arrival": trip["arrival"],
-                "destination": trip["destination"],
-            })
-            used_drivers.add(driver_id)
-            used_trains.add(train_id)
+        if formulation == "bool":
+            drivers = [f"D{d + 1}" for t in range(n_trips) for d in range(max_drivers)
+                       if solver.BooleanValue(assigned_dr[(t, d)])]
+        else:
+            drivers = [f"D{solver.Value(trip_driver[t]) + 1}" for t in range(n_trips)]
 
-        print(f"Solution uses {len(used_drivers)} drivers and {len(used_trains)} trains")
-        print(f"Solve time: {solver2.WallTime():.2f} seconds")
-        return solution, driver_times
+        print(f"Solution uses {len(set(drivers))} drivers")
+        print(f"Solve time: {solve_time:.2f} seconds")
+        return drivers, driver_times
         
     else:
-        raise Exception(f"No solution found. Status: {solver.StatusName(status)}")
+        raise Exception(f"No solution found. Status: {status.name}")
 
 
 # Main execution
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the driver layer with OR-Tools CP-SAT")
+    parser.add_argument("--formulation", choices=["int", "bool"], default="int",
+                        help="int: driver index per trip plus reified booleans; bool: x[t, d] booleans only")
+    parser.add_argument("--conflicts", choices=["cliques", "pairwise"], default="cliques")
+    parser.add_argument("--hint", help="solution.json of an earlier run (CP, ILP, greedy or naive) to warm-start from")
+    parser.add_argument("--symmetry", choices=SYMMETRY, default="none",
+                        help="symmetry breaking on driver slots: used-slot ordering, or also first-trip ordering")
+    parser.add_argument("--objective", choices=OBJECTIVES, default="drivers",
+                        help="drivers only, or drivers then total working span in two passes or one weighted pass")
+    parser.add_argument("--profile", nargs="?", const="profile.json",
+                        help="write the time, size and presolve statistics of every build phase to this JSON file")
+    parser.add_argument("--no-names", action="store_true", help="build the model without variable names (faster)")
+    parser.add_argument("--cache", action="store_true",
+                        help=f"load the built model from {CACHE_DIR}/, saving it there on a miss; "
+                             "pays off only on timetables whose model takes long to build")
+    add_portfolio_arguments(parser)
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
     print("Solving train scheduling problem using OR-Tools CP-SAT")
     print("=" * 60)
     
-    solution, driver_times = solve_with_ortools_improved()
+    solution, driver_times, timings = solve_layers(Instance.load(), solve_with_ortools_improved,
+                                                   formulation=args.formulation, conflicts=args.conflicts,
+                                                   hint=args.hint, symmetry=args.symmetry, objective=args.objective,
+                                                   num_workers=args.workers, seed=args.seed,
+                                                   deterministic=args.deterministic, subsolvers=args.subsolvers,
+                                                   profile=args.profile, names=not args.no_names,
+                                                   cache_dir=CACHE_DIR if args.cache else None,
+                                                   train_layer=train_layer(args.turnaround))
+    if args.profile:
+        add_layer_timings(args.profile, timings)
     
     print(f"Optimization completed:")
     print(f"  - All {len(solution)} trips scheduled")
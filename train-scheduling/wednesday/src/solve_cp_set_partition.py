@@ -0,0 +1,133 @@
+import argparse
+import json
+import time
+from ortools.sat.python import cp_model
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds, greedy_duties
+from duties import MAX_CONNECTIONS, driver_schedule, duty_pool, load_duties
+from hints import load_drivers, repair_duties
+from portfolio import add_portfolio_arguments, configure, portfolio_parameters
+from rules import WEDNESDAY
+
+
+def solve_with_ortools_improved(instance, max_connections=MAX_CONNECTIONS, time_limit=300.0,
+                                num_workers=0, seed=1, deterministic=False, subsolvers=None,
+                                log=True, stats=None, hint=None):
+    """Driver layer over a duty pool: pick the fewest duties covering every trip.
+
+    The working span, driving time and break rules are checked when the duty
+    pool is enumerated (duties.py), so the model only holds one boolean per
+    duty and one BoolOr per trip. It is a covering, not a partition: the
+    pool is pruned to `max_connections` successors per trip and reduced by
+    dominance, so it need not hold a duty for every subset of trips. A trip
+    covered twice stays in one duty (driver_schedule), which keeps the other
+    feasible. The pool is a heuristic subset of the feasible duties, so the
+    optimum over it is an upper bound only. The greedy duties are added and
+    hinted so the search starts from the greedy upper bound; with `hint` (an
+    earlier solution.json) its duties, repaired to the rules, are used
+    instead. `num_workers`, `seed`, `deterministic` and `subsolvers` set the
+    CP-SAT portfolio (see portfolio.py).
+    """
+    build_start = time.perf_counter()
+    rules = WEDNESDAY
+    lower_bound, max_drivers = driver_bounds(instance, rules)
+
+    if hint is not None:
+        seed_duties, moved = repair_duties(instance, rules, load_drivers(instance, hint))
+        print(f"Hint from {hint}: {len(seed_duties)} drivers after the fix-up ({moved} trips moved)")
+    else:
+        seed_duties = greedy_duties(instance, rules)
+    seed_pool = duty_pool(instance, rules, seed_duties)
+    pool = seed_pool.union(load_duties(instance, rules, max_connections, dominance=True))
+    print(f"Problem size: {instance.n_trips} trips, {len(pool)} duties")
+
+    model = cp_model.CpModel()
+    duty_used = [model.NewBoolVar(f'duty_{k}') for k in range(len(pool))]
+
+    # Every trip is driven by at least one chosen duty
+    for covering in pool.duties_of_trips():
+        model.AddBoolOr([duty_used[k] for k in covering.tolist()])
+
+    # Start from the seed duties, which come first in the pool
+    for k in range(len(pool)):
+        model.AddHint(duty_used[k], k < len(seed_pool))
+
+    print("Minimizing drivers...")
+    model.Add(cp_model.LinearExpr.Sum(duty_used) >= lower_bound)
+    model.Minimize(cp_model.LinearExpr.Sum(duty_used))
+
+    solver = cp_model.CpSolver()
+    configure(solver, portfolio_parameters(num_workers, seed, deterministic, subsolvers), time_limit)
+    solver.parameters.log_search_progress = log
+    # Presolve spends most of a short time limit on the pool and removes little;
+    # without it the hinted greedy duties are the first solution
+    solver.parameters.cp_model_presolve = False
+
+    build_time = time.perf_counter() - build_start
+    print(f"Model built in {build_time:.2f} seconds")
+
+    status = solver.Solve(model)
+    if stats is not None:
+        stats.update({
+            "build_time": build_time,
+            "solve_time": solver.WallTime(),
+            "variables": len(model.Proto().variables),
+            "constraints": len(model.Proto().constraints),
+            "status": solver.StatusName(status),
+            "objective": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+            "bound": solver.BestObjectiveBound(),
+        })
+
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        if status == cp_model.OPTIMAL:
+            print("Optimal solution found (over the duty pool)!")
+        else:
+            print("Feasible solution found!")
+
+        chosen = [pool.rows(k) for k in range(len(pool)) if solver.BooleanValue(duty_used[k])]
+        drivers, driver_times = driver_schedule(instance, rules, chosen)
+
+        print(f"Solution uses {len(driver_times)} drivers (greedy {max_drivers}, lower bound {lower_bound})")
+        print(f"Solve time: {solver.WallTime():.2f} seconds")
+        return drivers, driver_times
+
+    else:
+        raise Exception(f"No solution found. Status: {solver.StatusName(status)}")
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the driver layer as set covering over a pool of feasible duties")
+    parser.add_argument("--connections", type=int, default=MAX_CONNECTIONS,
+                        help="successors kept per trip when enumerating duties (0: all)")
+    parser.add_argument("--time-limit", type=float, default=300.0)
+    parser.add_argument("--hint", help="solution.json of an earlier run to start from instead of the greedy")
+    add_portfolio_arguments(parser)
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
+    print("Solving train scheduling problem using OR-Tools CP-SAT (set covering)")
+    print("=" * 60)
+
+    solution, driver_times, _ = solve_layers(Instance.load(), solve_with_ortools_improved,
+                                             max_connections=args.connections or None,
+                                             time_limit=args.time_limit, num_workers=args.workers, seed=args.seed,
+                                             deterministic=args.deterministic, subsolvers=args.subsolvers,
+                                             hint=args.hint,
+                                             train_layer=train_layer(args.turnaround))
+
+    print(f"Optimization completed:")
+    print(f"  - All {len(solution)} trips scheduled")
+
+    # Sort by departure time and save
+    solution.sort(key=lambda x: x["departure"])
+
+    with open("solution.json", "w") as f:
+        json.dump({"trips": solution, "drivers": driver_times}, f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {len(set(s['driver'] for s in solution))} drivers and {len(set(s['train'] for s in solution))} trains")
+
+    print("\nSolution is ready for validation with checker.py")
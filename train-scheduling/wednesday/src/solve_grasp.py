@@ -0,0 +1,222 @@
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from instance import Instance
+from duties import driver_schedule, duty_shift
+from rules import RULES
+from solve_greedy import FITS, extend, fit_duties
+from train_assignment import add_train_arguments, assign_trains
+
+ALPHA = 0.3
+BATCH = 50  # constructions per task sent to a worker
+ELITES = 5
+MIN_DISTANCE = 0.1  # share of trips whose successor must differ from every other elite
+GREEDY_SEED = -1  # stands for the deterministic solve_greedy duties among the elites
+
+
+def construct(instance, rules, rng, alpha=ALPHA):
+    """One randomised greedy construction; returns duties as lists of rows.
+
+    Trips come in departure order, those departing together in random order.
+    The candidates of a trip are the duties that can take it (solve_greedy.extend),
+    scored by the idle gap before it. The restricted candidate list holds
+    those within alpha of the range above the smallest gap, and one of them
+    is drawn at random; alpha=0 is the best fit with random ties.
+    """
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
+    order = np.lexsort((rng.random(instance.n_trips), instance.departure)).tolist()
+
+    duties = []
+    states = []
+    candidates = []  # indices of the duties a later trip may still join
+    for t in order:
+        fitting = []
+        for k in candidates:
+            state = extend(rules, states[k], departure[t], arrival[t], driving_time[t])
+            if state is not None:
+                fitting.append((departure[t] - states[k][3], k, state))
+        if fitting:
+            low = min(gap for gap, _, _ in fitting)
+            high = max(gap for gap, _, _ in fitting)
+            restricted = [(k, state) for gap, k, state in fitting if gap <= low + alpha * (high - low)]
+            k, state = restricted[rng.integers(len(restricted))]
+        else:
+            state = extend(rules, None, departure[t], arrival[t], driving_time[t])
+            if state is None:
+                raise ValueError(f"Trip {instance.nr[t]} cannot be driven by any duty")
+            k = len(duties)
+            duties.append([])
+            states.append(None)
+            candidates.append(k)
+        duties[k].append(t)
+        states[k] = state
+
+        closing = departure[t] + rules.clock_off - rules.working_time
+        candidates = [k for k in candidates if max(states[k][1], closing) <= states[k][0]]
+    return duties
+
+
+def cost(instance, rules, duties):
+    """(drivers, total working span): fewer drivers first, then less paid time."""
+    return len(duties), sum(end - start for start, end in (duty_shift(instance, rules, duty) for duty in duties))
+
+
+def successors(instance, duties):
+    """Next row of every row in its duty (-1 for the last trip)."""
+    following = np.full(instance.n_trips, -1)
+    for duty in duties:
+        following[duty[:-1]] = duty[1:]
+    return following
+
+
+class Elites:
+    """The best solutions seen, kept apart from each other.
+
+    A solution enters if it beats the worst elite and, for more than
+    `min_distance` of the trips, has another successor than every better
+    elite; a close better elite keeps it out, a close worse one is replaced.
+    """
+
+    def __init__(self, instance, size=ELITES, min_distance=MIN_DISTANCE):
+        self.instance = instance
+        self.size = size
+        self.min_distance = min_distance * instance.n_trips
+        self.entries = []  # (cost, seed, duties, successors), best first
+
+    def add(self, key, seed, duties):
+        if len(self.entries) == self.size and key >= self.entries[-1][0]:
+            return False
+        following = successors(self.instance, duties)
+        close = [i for i, entry in enumerate(self.entries)
+                 if np.count_nonzero(entry[3] != following) <= self.min_distance]
+        if any(self.entries[i][0] <= key for i in close):
+            return False
+        self.entries = [entry for i, entry in enumerate(self.entries) if i not in close]
+        self.entries.append((key, seed, duties, following))
+        self.entries.sort(key=lambda entry: entry[:2])
+        del self.entries[self.size:]
+        return True
+
+    def best(self):
+        return self.entries[0] if self.entries else None
+
+
+def run_batch(instance, rules, seeds, alpha, deadline, size, min_distance):
+    """Constructions for `seeds` (stopping at `deadline`, a time.time()); returns (constructions, elites)."""
+    elites = Elites(instance, size, min_distance)
+    done = 0
+    for seed in seeds:
+        if time.time() >= deadline:
+            break
+        duties = construct(instance, rules, np.random.default_rng(seed), alpha)
+        elites.add(cost(instance, rules, duties), seed, duties)
+        done += 1
+    return done, [(key, seed, duties) for key, seed, duties, _ in elites.entries]
+
+
+def positive(text):
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def grasp(instance, rules, time_limit=10.0, iterations=None, workers=None, alpha=ALPHA, seed=0,
+          size=ELITES, min_distance=MIN_DISTANCE):
+    """Randomised constructions on a process pool until `time_limit` seconds or `iterations` constructions.
+
+    Construction i uses seed `seed + i`, so a run is reproducible for a
+    given iteration budget. Batches of BATCH seeds go to `workers`
+    processes (default: every core). The elites start with the duties of
+    solve_greedy (seed GREEDY_SEED), so there is a solution even when no
+    construction ends within the budget. Returns `(elites, constructions)`:
+    the Elites of all batches and the number of constructions made.
+    """
+    start = time.perf_counter()
+    deadline = time.time() + time_limit
+    workers = workers or os.cpu_count()
+    elites = Elites(instance, size, min_distance)
+    duties = min((fit_duties(instance, rules, fit) for fit in FITS), key=len)
+    elites.add(cost(instance, rules, duties), GREEDY_SEED, duties)
+    constructions = 0
+    next_seed = seed
+    last = seed + iterations if iterations is not None else None
+
+    def next_batch():
+        nonlocal next_seed
+        if time.time() >= deadline or (last is not None and next_seed >= last):
+            return None
+        end = next_seed + BATCH if last is None else min(next_seed + BATCH, last)
+        seeds = range(next_seed, end)
+        next_seed = end
+        return seeds
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        running = set()
+        while True:
+            while len(running) < 2 * workers and (seeds := next_batch()) is not None:
+                running.add(pool.submit(run_batch, instance, rules, seeds, alpha, deadline, size, min_distance))
+            if not running:
+                break
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done, entries = future.result()
+                constructions += done
+                for key, entry_seed, duties in entries:
+                    if elites.add(key, entry_seed, duties) and elites.best()[1] == entry_seed:
+                        print(f"{time.perf_counter() - start:8.2f}s  {key[0]} drivers, span {key[1]}  "
+                              f"(seed {entry_seed}, {constructions} constructions)")
+    return elites, constructions
+
+
+def solution_of(instance, rules, duties, trains):
+    drivers, driver_times = driver_schedule(instance, rules, duties)
+    trips = [instance.assignment(t, drivers[t], trains.name(t)) for t in range(instance.n_trips)]
+    return {"trips": trips, "drivers": driver_times}
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel randomised multi-start greedy (GRASP) for the driver layer")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--time-limit", type=float, default=10.0, help="wall-clock budget (seconds)")
+    parser.add_argument("--iterations", type=positive, help="stop after this many constructions")
+    parser.add_argument("--workers", type=int, default=0, help="processes (0: all cores)")
+    parser.add_argument("--alpha", type=float, default=ALPHA,
+                        help="restricted candidate list width: 0 best fit only, 1 any duty that can take the trip")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first construction")
+    parser.add_argument("--elites", type=int, default=ELITES, help="diverse best solutions kept")
+    parser.add_argument("--elites-output", help="write the elite solutions (solution.json format) to this JSON file")
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
+    instance = Instance.load(args.data)
+    rules = RULES[args.rules]
+    elites, constructions = grasp(instance, rules, args.time_limit, args.iterations, args.workers or None,
+                                  args.alpha, args.seed, args.elites)
+    (drivers, span), seed, duties, _ = elites.best()
+    source = "the greedy" if seed == GREEDY_SEED else f"seed {seed}"
+    print(f"GRASP: {constructions} constructions, best {drivers} drivers (span {span}, {source})")
+
+    trains = assign_trains(instance, args.turnaround)
+    with open("solution.json", "w") as f:
+        json.dump(solution_of(instance, rules, duties, trains), f, indent=4)
+    if args.elites_output:
+        with open(args.elites_output, "w") as f:
+            json.dump([{"drivers": key[0], "span": key[1], "seed": entry_seed,
+                        "solution": solution_of(instance, rules, entry_duties, trains)}
+                       for key, entry_seed, entry_duties, _ in elites.entries], f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {drivers} drivers and {trains.n_trains} trains")
+    print("\nSolution is ready for validation with checker.py")
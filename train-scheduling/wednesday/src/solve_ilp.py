@@ -1,7 +1,16 @@
+import argparse
 import json
 import gurobipy as gp
 from gurobipy import GRB
 from utils import load_wsl_lic
+from instance import Instance
+from pipeline import solve_layers
+from train_assignment import add_train_arguments, train_layer
+from bounds import driver_bounds
+from hints import hint_slots, set_start
+from symmetry import SYMMETRY, break_symmetry_gurobi
+from profiler import BuildProfile, add_layer_timings
+from rules import WEDNESDAY
 
 # Tải thông tin license cho Gurobi, nếu cần
 LICENSE_DICT = load_wsl_lic('./gurobi.lic')
@@ -16,13 +25,21 @@ env.setParam('TimeLimit', 300)
 env.start()
 
 
-def solve_with_gurobi():
-    """Giải bài toán lập lịch tàu hỏa sử dụng Gurobi."""
+def solve_with_gurobi(instance, conflicts="cliques", hint=None, symmetry="none", profile=None):
+    """Giải bài toán lập lịch tàu hỏa sử dụng Gurobi.
+
+    `conflicts` là "cliques" (một hàng cho mỗi clique cực đại và mỗi tài xế)
+    hoặc "pairwise" (một hàng cho mỗi cặp chuyến chồng chéo và mỗi tài xế).
+    `hint` là đường dẫn tới solution.json của lần chạy trước, dùng làm điểm
+    khởi đầu (MIP start). `symmetry` là một giá trị trong symmetry.SYMMETRY.
+    `profile` là đường dẫn tới báo cáo JSON ghi thời gian, số biến và số ràng
+    buộc của từng giai đoạn dựng mô hình cùng thống kê presolve (xem profiler.py).
+    """
     
-    # Tải dữ liệu các chuyến đi
-    with open("data/monfri.json", "r") as f:
-        data = json.load(f)
-    trips = data["trips"]
+    # Dữ liệu các chuyến đi dưới dạng cột (đã sắp xếp theo giờ khởi hành)
+    departure = instance.departure.tolist()
+    arrival = instance.arrival.tolist()
+    driving_time = instance.driving_time.tolist()
     
     # Các hằng số
     WORKING_TIME = 9 * 60  # 9 giờ tính bằng phút
@@ -32,38 +49,43 @@ def solve_with_gurobi():
     BREAK_START = 3 * 60
     BREAK_END = 6 * 60
     BREAK_DURATION = 60
-    n_trips = len(trips)
+    n_trips = instance.n_trips
     
-    # Giới hạn trên hợp lý cho số tài xế và tàu
-    max_drivers = min(n_trips, 50)
-    max_trains = min(n_trips, 50)
+    # Số slot tài xế lấy từ cận trên (lời giải tham lam khả thi); cận dưới được
+    # thêm thành ràng buộc để Gurobi dừng ngay khi đạt tới
+    lower_bound, max_drivers = driver_bounds(instance, WEDNESDAY)
     
     # Hằng số Big-M để tuyến tính hóa các ràng buộc điều kiện
     # Phải đủ lớn để không ảnh hưởng đến các ràng buộc khi chúng bị "tắt"
     BIG_M = 2 * 24 * 60  # 2 ngày tính bằng phút
 
     print(f"Quy mô bài toán: {n_trips} chuyến đi")
-    print(f"Tài nguyên tối đa: {max_drivers} tài xế, {max_trains} tàu")
+    print(f"Tài nguyên tối đa: {max_drivers} tài xế")
+
+    # Tàu chỉ cần các chuyến không chồng chéo nên được gán chính xác bằng
+    # thuật toán quét (train layer, chạy song song trong pipeline.py);
+    # ILP chỉ còn phải quyết định tài xế
     
     # Tạo mô hình tối ưu hóa
     model = gp.Model("train_scheduling_ilp", env=env)
+    profiler = BuildProfile(model, profile is not None)
     
     # --- BIẾN QUYẾT ĐỊNH ---
     
     # x[t,d] = 1 nếu chuyến đi t được giao cho tài xế d
+    profiler.phase("usage linking")
     x = model.addVars(n_trips, max_drivers, vtype=GRB.BINARY, name="x")
-    # y[t,tr] = 1 nếu chuyến đi t được giao cho tàu tr
-    y = model.addVars(n_trips, max_trains, vtype=GRB.BINARY, name="y")
     
     # Biến nhị phân cho việc sử dụng tài nguyên
     driver_used = model.addVars(max_drivers, vtype=GRB.BINARY, name="driver_used")
-    train_used = model.addVars(max_trains, vtype=GRB.BINARY, name="train_used")
     
     # Biến cho ràng buộc thời gian làm việc
+    profiler.phase("span")
     driver_start_time = model.addVars(max_drivers, vtype=GRB.CONTINUOUS, ub=BIG_M, name="driver_start_time")
     driver_end_time = model.addVars(max_drivers, vtype=GRB.CONTINUOUS, ub=BIG_M, name="driver_end_time")
     
     # Biến cho ràng buộc thời gian nghỉ
+    profiler.phase("breaks")
     break_start_time = model.addVars(max_drivers, vtype=GRB.CONTINUOUS, ub=BIG_M, name="break_start_time")
     # trip_before_break[d,t]=1 nếu chuyến đi t của tài xế d kết thúc trước giờ nghỉ
     trip_before_break = model.addVars(max_drivers, n_trips, vtype=GRB.BINARY, name="trip_before_break")
@@ -72,48 +94,49 @@ def solve_with_gurobi():
     
     # --- RÀNG BUỘC ---
     
-    # Ràng buộc 1: Mỗi chuyến đi phải được giao cho đúng một tài xế và một tàu
+    # Ràng buộc 1: Mỗi chuyến đi phải được giao cho đúng một tài xế
+    profiler.phase("usage linking")
     model.addConstrs((x.sum(t, '*') == 1 for t in range(n_trips)), name="trip_driver_assignment")
-    model.addConstrs((y.sum(t, '*') == 1 for t in range(n_trips)), name="trip_train_assignment")
 
     # Ràng buộc 2: Liên kết biến sử dụng tài nguyên
     for d in range(max_drivers):
         model.addConstr(driver_used[d] * n_trips >= x.sum('*', d), name=f"driver_usage_link_upper_{d}")
         model.addConstr(driver_used[d] <= x.sum('*', d), name=f"driver_usage_link_lower_{d}")
-        
-    for tr in range(max_trains):
-        model.addConstr(train_used[tr] * n_trips >= y.sum('*', tr), name=f"train_usage_link_upper_{tr}")
-        model.addConstr(train_used[tr] <= y.sum('*', tr), name=f"train_usage_link_lower_{tr}")
-
-    # Ràng buộc 3: Không xung đột thời gian cho tàu
-    for tr in range(max_trains):
-        for t1 in range(n_trips):
-            for t2 in range(t1 + 1, n_trips):
-                trip1, trip2 = trips[t1], trips[t2]
-                if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                    model.addConstr(y[t1, tr] + y[t2, tr] <= 1, name=f"train_conflict_{tr}_{t1}_{t2}")
+
+    # Ràng buộc 3 (không xung đột thời gian cho tàu) đã được giải bởi lớp tàu trong pipeline.py
 
     # Ràng buộc 4: Không xung đột thời gian cho tài xế
-    for d in range(max_drivers):
-        for t1 in range(n_trips):
-            for t2 in range(t1 + 1, n_trips):
-                trip1, trip2 = trips[t1], trips[t2]
-                if not (trip1["arrival"] <= trip2["departure"] or trip2["arrival"] <= trip1["departure"]):
-                    model.addConstr(x[t1, d] + x[t2, d] <= 1, name=f"driver_conflict_{d}_{t1}_{t2}")
+    profiler.phase("driver conflicts")
+    if conflicts == "cliques":
+        # Các chuyến trong một clique cực đại cùng chạy tại một thời điểm: tài xế d
+        # nhận tối đa một chuyến trong đó và chỉ khi d được sử dụng
+        cliques = instance.maximal_cliques()
+        for k, clique in enumerate(cliques):
+            for d in range(max_drivers):
+                model.addConstr(gp.quicksum(x[t, d] for t in clique.tolist()) <= driver_used[d], name=f"driver_clique_{d}_{k}")
+        conflict_rows = len(cliques) * max_drivers
+    else:
+        # Các cặp chuyến đi chồng chéo thời gian
+        overlapping = list(zip(*(pairs.tolist() for pairs in instance.overlapping_pairs())))
+        for d in range(max_drivers):
+            for t1, t2 in overlapping:
+                model.addConstr(x[t1, d] + x[t2, d] <= 1, name=f"driver_conflict_{d}_{t1}_{t2}")
+        conflict_rows = len(overlapping) * max_drivers
 
     # Ràng buộc 5: Thời gian lái xe của tài xế
+    profiler.phase("driving time")
     model.addConstrs(
-        (gp.quicksum(x[t, d] * trips[t]["drivingTime"] for t in range(n_trips)) <= DRIVING_TIME
+        (gp.quicksum(x[t, d] * driving_time[t] for t in range(n_trips)) <= DRIVING_TIME
          for d in range(max_drivers)), name="driving_time"
     )
 
     # Ràng buộc 6: Thời gian làm việc của tài xế (bao gồm CLOCK_ON, CLOCK_OFF)
+    profiler.phase("span")
     for d in range(max_drivers):
         for t in range(n_trips):
-            trip = trips[t]
             # Nếu chuyến t được gán cho tài xế d, cập nhật thời gian bắt đầu/kết thúc
-            model.addConstr(driver_start_time[d] <= (trip["departure"] - CLOCK_ON) + BIG_M * (1 - x[t, d]), name=f"start_time_update_{d}_{t}")
-            model.addConstr(driver_end_time[d] >= (trip["arrival"] + CLOCK_OFF) - BIG_M * (1 - x[t, d]), name=f"end_time_update_{d}_{t}")
+            model.addConstr(driver_start_time[d] <= (departure[t] - CLOCK_ON) + BIG_M * (1 - x[t, d]), name=f"start_time_update_{d}_{t}")
+            model.addConstr(driver_end_time[d] >= (arrival[t] + CLOCK_OFF) - BIG_M * (1 - x[t, d]), name=f"end_time_update_{d}_{t}")
         
         # Tổng thời gian làm việc phải <= WORKING_TIME, chỉ áp dụng nếu tài xế được sử dụng
         model.addConstr(driver_end_time[d] - driver_start_time[d] <= WORKING_TIME + BIG_M * (1 - driver_used[d]), name=f"working_span_{d}")
@@ -122,6 +145,7 @@ def solve_with_gurobi():
 
 
     # Ràng buộc 7: Thời gian nghỉ bắt buộc của tài xế
+    profiler.phase("breaks")
     for d in range(max_drivers):
         # Giờ nghỉ phải nằm trong khoảng [3h, 6h] sau khi bắt đầu ca làm việc
         model.addConstr(break_start_time[d] >= driver_start_time[d] + BREAK_START - BIG_M * (1 - driver_used[d]), name=f"break_window_start_{d}")
@@ -129,28 +153,43 @@ def solve_with_gurobi():
         model.addConstr(break_start_time[d]  + BREAK_DURATION <= driver_end_time[d] + BIG_M * (1 - driver_used[d]), name=f"break_before_end_{d}")
         
         for t in range(n_trips):
-            trip = trips[t]
             # Ràng buộc không chồng chéo giữa giờ nghỉ và các chuyến đi
             # HOẶC: chuyến đi kết thúc trước giờ nghỉ
             model.addConstr(
-                trip["arrival"] <= break_start_time[d] + BIG_M * (1 - trip_before_break[d, t]) + BIG_M * (1 - x[t, d]),
+                arrival[t] <= break_start_time[d] + BIG_M * (1 - trip_before_break[d, t]) + BIG_M * (1 - x[t, d]),
                 name=f"break_no_overlap_A_{d}_{t}"
             )
             # HOẶC: giờ nghỉ kết thúc trước khi chuyến đi bắt đầu
             model.addConstr(
-                break_start_time[d] + BREAK_DURATION <= trip["departure"] + BIG_M * trip_before_break[d, t] + BIG_M * (1 - x[t, d]),
+                break_start_time[d] + BREAK_DURATION <= departure[t] + BIG_M * trip_before_break[d, t] + BIG_M * (1 - x[t, d]),
                 name=f"break_no_overlap_B_{d}_{t}"
             )
 
-    # --- MỤC TIÊU (TỐI ƯU HÓA ĐA MỤC TIÊU) ---
+    # --- MỤC TIÊU ---
     
-    # Ưu tiên 1 (cao nhất): Tối thiểu hóa số lượng tàu
-    model.setObjectiveN(train_used.sum(), index=0, priority=2, name='minimize_trains')
-    # Ưu tiên 2 (thấp hơn): Tối thiểu hóa số lượng tài xế
-    model.setObjectiveN(driver_used.sum(), index=1, priority=1, name='minimize_drivers')
+    # Số tàu đã tối ưu (lớp tàu), chỉ còn tối thiểu hóa số lượng tài xế
+    profiler.phase("objective")
+    model.addConstr(driver_used.sum() >= lower_bound, name="driver_lower_bound")
+    model.setObjective(driver_used.sum(), GRB.MINIMIZE)
+
+    # Các slot tài xế hoán đổi được cho nhau; tùy chọn giữ lại một thứ tự duy nhất
+    profiler.phase("symmetry")
+    break_symmetry_gurobi(model, symmetry, x, driver_used, n_trips, max_drivers)
+
+    # Khởi đầu từ lời giải trước, đã sửa cho khả thi theo luật hiện tại
+    profiler.phase("hint")
+    if hint is not None:
+        set_start(hint_slots(instance, WEDNESDAY, hint, max_drivers), x, driver_used)
     
+    model.update()
+    # Thống kê presolve: Gurobi presolve riêng một lần (Model.presolve)
+    profiler.presolve_gurobi()
+    profiler.save(profile)
+    print(f"Kích thước mô hình: {model.NumConstrs} hàng ({conflict_rows} hàng xung đột {conflicts}), {model.NumVars} cột")
+
     print("Bắt đầu tối ưu hóa...")
     model.optimize()
+    print(f"Thời gian giải: {model.Runtime:.2f} giây")
     
     # --- XỬ LÝ KẾT QUẢ ---
     
@@ -161,9 +200,8 @@ def solve_with_gurobi():
             print("Đã hết thời gian, sử dụng lời giải tốt nhất tìm được.")
         
         # Trích xuất lời giải
-        solution = []
         driver_times = []
-        trip_assignments = {}
+        drivers = [None] * n_trips
 
         # Trích xuất thời gian làm việc của tài xế
         for d in range(max_drivers):
@@ -182,39 +220,39 @@ def solve_with_gurobi():
         for t in range(n_trips):
             for d in range(max_drivers):
                 if x[t, d].X > 0.5: # Biến nhị phân là 1
-                    trip_assignments[t] = {"driver": f"D{d + 1}"}
+                    drivers[t] = f"D{d + 1}"
                     break
-            for tr in range(max_trains):
-                if y[t, tr].X > 0.5:
-                    trip_assignments[t]["train"] = f"T{tr + 1}"
-                    break
-        
-        for t, trip in enumerate(trips):
-            solution.append({
-                "nr": trip["nr"],
-                "train": trip_assignments[t]["train"],
-                "driver": trip_assignments[t]["driver"],
-                "departure": trip["departure"],
-                "arrival": trip["arrival"],
-                "destination": trip["destination"]
-            })
             
         final_drivers = int(driver_used.sum().getValue())
-        final_trains = int(train_used.sum().getValue())
 
-        print(f"Lời giải sử dụng {final_drivers} tài xế và {final_trains} tàu")
-        return solution, driver_times
+        print(f"Lời giải sử dụng {final_drivers} tài xế")
+        return drivers, driver_times
         
     else:
         raise Exception(f"Không tìm thấy lời giải. Trạng thái: {model.status}")
         
 # Hàm thực thi chính
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Giải lớp tài xế bằng Gurobi (ILP)")
+    parser.add_argument("--conflicts", choices=["cliques", "pairwise"], default="cliques",
+                        help="ràng buộc chồng chéo: theo clique cực đại (mặc định) hoặc theo từng cặp")
+    parser.add_argument("--hint", help="solution.json của lần chạy trước (CP, ILP, greedy hoặc naive) để khởi đầu")
+    parser.add_argument("--symmetry", choices=SYMMETRY, default="none",
+                        help="phá đối xứng giữa các slot tài xế: theo thứ tự slot được dùng, hoặc thêm thứ tự chuyến đầu tiên")
+    parser.add_argument("--profile", nargs="?", const="profile.json",
+                        help="ghi thời gian, kích thước và thống kê presolve của từng giai đoạn dựng mô hình vào tệp JSON này")
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
     print("Giải bài toán lập lịch tàu bằng Gurobi (ILP)")
     print("=" * 60)
     
     try:
-        solution, driver_times = solve_with_gurobi()
+        solution, driver_times, timings = solve_layers(Instance.load(), solve_with_gurobi, conflicts=args.conflicts,
+                                                       hint=args.hint, symmetry=args.symmetry, profile=args.profile,
+                                                       train_layer=train_layer(args.turnaround))
+        if args.profile:
+            add_layer_timings(args.profile, timings)
         
         print(f"Tối ưu hóa hoàn tất:")
         print(f"  - Đã lập lịch cho tất cả {len(solution)} chuyến đi")
@@ -0,0 +1,178 @@
+import argparse
+import json
+import time
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from instance import Instance
+from bounds import lower_bounds
+from duties import driver_schedule, duty_pool, duty_shift, enumerate_duties
+from hints import load_drivers, repair_duties
+from portfolio import add_portfolio_arguments, configure, portfolio_parameters
+from rules import RULES
+
+NEIGHBOURHOODS = ["window", "destination", "shortest"]
+FREED_DRIVERS = 5
+SUB_CONNECTIONS = 6  # successors kept per trip when enumerating duties of a neighbourhood
+
+
+def choose_drivers(instance, rules, duties, neighbourhood, k, rng, seeds=None):
+    """Indices of the k duties a neighbourhood frees.
+
+    "window": one of the 2k duties with the fewest trip minutes (or the
+    duties `seeds`), then one at a time the duty whose trips least raise the
+    peak of simultaneous freed trips (nearest clock-on first). A low peak leaves room to chain the
+    freed trips into fewer duties; at the peak k nothing can be saved.
+    "destination": the duties with the most trips to a random destination.
+    "shortest": k duties drawn from the 2k with the fewest trip minutes.
+    """
+    k = min(k, len(duties))
+    work = np.array([instance.duration[duty].sum() for duty in duties])
+    shortest = np.lexsort((rng.random(len(duties)), work))[:2 * k]
+    if neighbourhood == "window":
+        starts = np.array([duty_shift(instance, rules, duty)[0] for duty in duties])
+        busy = np.zeros((len(duties), int(instance.arrival.max()) + 1), dtype=np.int64)
+        for i, duty in enumerate(duties):
+            for t in duty:
+                busy[i, instance.departure[t]:instance.arrival[t]] = 1
+        order = list(seeds) if seeds else [rng.choice(shortest)]
+        freed = busy[order].sum(axis=0)
+        while len(order) < k:
+            peak = (busy + freed).max(axis=1)
+            peak[order] = np.iinfo(np.int64).max
+            best = np.lexsort((rng.random(len(duties)), np.abs(starts - starts[order[0]]), peak))[0]
+            order.append(best)
+            freed += busy[best]
+        order = np.array(order)
+    elif neighbourhood == "destination":
+        destination = rng.integers(len(instance.destinations))
+        trips_to = np.array([np.count_nonzero(instance.destination[duty] == destination) for duty in duties])
+        order = np.lexsort((rng.random(len(duties)), -trips_to))
+    else:
+        order = rng.permutation(shortest)
+    return sorted(order[:k].tolist())
+
+
+def reoptimise(instance, rules, duties, max_connections=SUB_CONNECTIONS, time_limit=10.0, parameters=None):
+    """Fewest duties covering the trips of `duties`, or None if none is found or needed.
+
+    The trips become an instance of their own. If its lower bound already
+    equals len(duties) nothing is solved. Otherwise its duties are enumerated
+    (with dominance, so the model is a covering) and the current duties are
+    added and hinted. Among covers with the fewest duties, the one with the
+    largest sum of squared duty lengths wins: it leaves the slack in few
+    short duties, which later neighbourhoods can empty. Trips covered twice
+    stay in the first duty only, which keeps both feasible. Returns lists of
+    rows of `instance`.
+    """
+    rows = sorted(t for duty in duties for t in duty)
+    position = {t: i for i, t in enumerate(rows)}
+    sub = Instance([instance.trip(t) for t in rows])
+    lower_bound = max(lower_bounds(sub, rules).values())
+    if lower_bound >= len(duties):
+        return None
+    current = duty_pool(sub, rules, [[position[t] for t in duty] for duty in duties])
+    pool = current.union(enumerate_duties(sub, rules, max_connections, dominance=True))
+
+    model = cp_model.CpModel()
+    duty_used = [model.NewBoolVar(f"duty_{k}") for k in range(len(pool))]
+    for covering in pool.duties_of_trips():
+        model.AddBoolOr([duty_used[k] for k in covering.tolist()])
+    for k in range(len(pool)):
+        model.AddHint(duty_used[k], k < len(current))
+    model.Add(cp_model.LinearExpr.Sum(duty_used) >= lower_bound)
+    lengths = pool.matrix().sum(axis=1)
+    model.Minimize(cp_model.LinearExpr.WeightedSum(duty_used, (len(rows) ** 2 + 1 - lengths ** 2).tolist()))
+
+    solver = cp_model.CpSolver()
+    configure(solver, parameters or {}, time_limit)
+    status = solver.Solve(model)
+    if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+        return None
+
+    covered = set()
+    result = []
+    for k in range(len(pool)):
+        if solver.BooleanValue(duty_used[k]):
+            duty = [rows[i] for i in pool.rows(k).tolist() if rows[i] not in covered]
+            covered.update(duty)
+            if duty:
+                result.append(duty)
+    return result
+
+
+def improve(instance, rules, duties, time_limit=60.0, neighbourhoods=NEIGHBOURHOODS, k=FREED_DRIVERS,
+            max_connections=SUB_CONNECTIONS, sub_time_limit=10.0, seed=0, parameters=None):
+    """Large-neighbourhood search on a list of duties (lists of rows).
+
+    Each iteration frees the duties of k drivers, chosen by the neighbourhoods
+    in turn, re-solves their trips with every other duty fixed, and keeps
+    the result when it needs no more drivers (fewer is an improvement, the
+    same number moves the search elsewhere). Stops after `time_limit` seconds.
+    Returns `(duties, history)`, history being (seconds, drivers) at the start
+    and after each improvement.
+    """
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    history = [(0.0, len(duties))]
+    iteration = 0
+    print(f"LNS from {len(duties)} drivers, freeing {k} per iteration")
+    while time.perf_counter() - start < time_limit:
+        neighbourhood = neighbourhoods[iteration % len(neighbourhoods)]
+        iteration += 1
+        chosen = choose_drivers(instance, rules, duties, neighbourhood, k, rng)
+        budget = min(sub_time_limit, time_limit - (time.perf_counter() - start))
+        result = reoptimise(instance, rules, [duties[i] for i in chosen], max_connections, budget, parameters)
+        if result is None or len(result) > len(chosen):
+            continue
+        duties = [duty for i, duty in enumerate(duties) if i not in chosen] + result
+        if len(result) < len(chosen):
+            elapsed = time.perf_counter() - start
+            history.append((elapsed, len(duties)))
+            print(f"{elapsed:8.2f}s  {len(duties)} drivers  (iteration {iteration}, {neighbourhood})")
+    print(f"LNS: {iteration} iterations in {time.perf_counter() - start:.2f} seconds, {len(duties)} drivers")
+    return duties, history
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Improve the drivers of a solution.json by large-neighbourhood search")
+    parser.add_argument("--solution", default="solution.json", help="solution to start from (any solver's output)")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--time-limit", type=float, default=300.0, help="wall-clock budget (seconds)")
+    parser.add_argument("--sub-time-limit", type=float, default=10.0, help="CP-SAT limit per neighbourhood")
+    parser.add_argument("--drivers", type=int, default=FREED_DRIVERS, help="drivers freed per iteration")
+    parser.add_argument("--neighbourhoods", nargs="+", choices=NEIGHBOURHOODS, default=NEIGHBOURHOODS)
+    parser.add_argument("--connections", type=int, default=SUB_CONNECTIONS,
+                        help="successors kept per trip when enumerating duties of a neighbourhood (0: all)")
+    parser.add_argument("--history", help="write (seconds, drivers) of every improvement to this JSON file")
+    add_portfolio_arguments(parser)
+    args = parser.parse_args()
+
+    instance = Instance.load(args.data)
+    rules = RULES[args.rules]
+    with open(args.solution, "r") as f:
+        data = json.load(f)
+    trains = {trip["nr"]: trip["train"] for trip in (data["trips"] if isinstance(data, dict) else data)}
+
+    # The start may come from older rules; repair it first
+    duties, moved = repair_duties(instance, rules, load_drivers(instance, args.solution))
+    print(f"Start from {args.solution}: {len(duties)} drivers after the fix-up ({moved} trips moved)")
+
+    parameters = portfolio_parameters(args.workers, args.seed, args.deterministic, args.subsolvers)
+    duties, history = improve(instance, rules, duties, args.time_limit, args.neighbourhoods, args.drivers,
+                              args.connections or None, args.sub_time_limit, args.seed, parameters)
+
+    drivers, driver_times = driver_schedule(instance, rules, duties)
+    solution = [instance.assignment(t, drivers[t], trains[int(instance.nr[t])]) for t in range(instance.n_trips)]
+    with open("solution.json", "w") as f:
+        json.dump({"trips": solution, "drivers": driver_times}, f, indent=4)
+    if args.history:
+        with open(args.history, "w") as f:
+            json.dump([{"time": seconds, "drivers": count} for seconds, count in history], f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {len(driver_times)} drivers and {len(set(trains.values()))} trains")
+    print("\nSolution is ready for validation with checker.py")
@@ -0,0 +1,174 @@
+import argparse
+import json
+import math
+import random
+import time
+from bisect import bisect_left
+
+from instance import Instance
+from duties import driver_schedule
+from hints import load_drivers, repair_duties
+from local_search import MOVES, Schedule
+from rules import RULES
+from train_assignment import add_train_arguments, assign_trains
+
+TEMPERATURE = 30.0  # minutes of idle time a worsening move may cost at the start
+FINAL_TEMPERATURE = 0.5
+TENURE = 50  # moves during which a trip may not go back to the resource it left
+COOLING_STEP = 1000  # moves between temperature updates
+
+
+def anneal(schedule, time_limit=10.0, iterations=None, moves=MOVES, temperature=TEMPERATURE,
+           final_temperature=FINAL_TEMPERATURE, tenure=TENURE, seed=0):
+    """Simulated annealing with a tabu list on a Schedule, in place; minimises (resources, idle).
+
+    Every iteration draws a move and a trip: half of the time from the
+    smaller of two random resources, which steers trips out of short
+    duties until one empties. Moves that empty a resource are always
+    taken; the others are accepted on their idle change with the
+    Metropolis rule, the temperature falling geometrically from
+    `temperature` to `final_temperature` over the budget. A trip may not
+    return to the resource it left during the next `tenure` moves, unless
+    that empties a resource. Stops after `time_limit` seconds or
+    `iterations` moves; a budget of 0 returns the start. Both temperatures
+    must be positive. Returns `(best, stats)`: the sequences of the best
+    schedule seen and (moves, accepted, seconds).
+    """
+    if temperature <= 0 or final_temperature <= 0:
+        raise ValueError("Temperatures must be positive")
+    rng = random.Random(seed)
+    n_trips = len(schedule.owner)
+    tabu = {}
+    best_cost = schedule.cost()
+    best = schedule.sequences()
+    start = time.perf_counter()
+    iterations = iterations if iterations is not None else math.inf
+    if time_limit <= 0 or iterations <= 0:
+        return best, (0, 0, 0.0)
+    current_temperature = temperature
+    accepted = 0
+    iteration = 0
+    while iteration < iterations:
+        if iteration % COOLING_STEP == 0:
+            progress = max((time.perf_counter() - start) / time_limit, iteration / iterations)
+            if progress >= 1:
+                break
+            current_temperature = temperature * (final_temperature / temperature) ** progress
+        iteration += 1
+
+        move = moves[iteration % len(moves)]
+        active = schedule.active
+        if rng.random() < 0.5:
+            a, c = active[rng.randrange(len(active))], active[rng.randrange(len(active))]
+            rows = schedule.rows[a] if len(schedule.rows[a]) <= len(schedule.rows[c]) else schedule.rows[c]
+            t = rows[rng.randrange(len(rows))]
+        else:
+            t = rng.randrange(n_trips)
+        b = active[rng.randrange(len(active))]
+        if move == "swap":
+            # The trip of b departing next to t
+            rows = schedule.rows[b]
+            other = rows[min(bisect_left(rows, t), len(rows) - 1) - rng.randrange(2)]
+            delta = schedule.swap(t, other)
+        else:
+            other = b
+            delta = schedule.relocate(t, b) if move == "relocate" else schedule.chain(t, b)
+        if delta is None:
+            continue
+
+        removed, idle = delta
+        if not removed:
+            if tabu.get((t, b), 0) > iteration:
+                continue
+            if idle > 0 and rng.random() >= math.exp(-idle / current_temperature):
+                continue
+        a = schedule.owner[t]
+        schedule.apply(move, t, other, delta)
+        tabu[(t, a)] = iteration + tenure
+        accepted += 1
+        cost = schedule.cost()
+        if cost < best_cost:
+            best_cost = cost
+            best = schedule.sequences()
+            if removed:
+                print(f"{time.perf_counter() - start:8.2f}s  {cost[0]} resources, idle {cost[1]}  "
+                      f"(move {iteration}, {move})")
+    return best, (iteration, accepted, time.perf_counter() - start)
+
+
+def improve(instance, rules, sequences, label, **kwargs):
+    """Anneal `sequences` (lists of rows) under `rules` (None for trains); returns the best sequences."""
+    schedule = Schedule(instance, sequences, rules)
+    print(f"{label}: {schedule.n_resources} from the start solution, idle {schedule.idle}")
+    best, (moves, accepted, seconds) = anneal(schedule, **kwargs)
+    final = Schedule(instance, best, rules)
+    rate = f"{moves / seconds:,.0f}/s" if seconds else "no time"
+    print(f"{label}: {final.n_resources}, idle {final.idle}; {moves} moves ({rate}), {accepted} accepted")
+    return best
+
+
+def positive(kind):
+    """argparse type: a number of `kind` above 0."""
+    def parse(text):
+        value = kind(text)
+        if value <= 0:
+            raise argparse.ArgumentTypeError(f"must be positive, got {value}")
+        return value
+    return parse
+
+
+# Main execution
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Improve a solution.json by simulated annealing with relocate, "
+                                                 "swap and chain-exchange moves")
+    parser.add_argument("--solution", default="solution.json", help="solution to start from (any solver's output)")
+    parser.add_argument("--data", default="data/monfri.json")
+    parser.add_argument("--rules", choices=list(RULES), default="wednesday")
+    parser.add_argument("--time-limit", type=positive(float), default=10.0, help="wall-clock budget per layer (seconds)")
+    parser.add_argument("--iterations", type=positive(int), help="moves per layer")
+    parser.add_argument("--moves", nargs="+", choices=MOVES, default=MOVES)
+    parser.add_argument("--layers", nargs="+", choices=["drivers", "trains"], default=["drivers", "trains"])
+    parser.add_argument("--temperature", type=positive(float), default=TEMPERATURE)
+    parser.add_argument("--final-temperature", type=positive(float), default=FINAL_TEMPERATURE)
+    parser.add_argument("--tenure", type=int, default=TENURE)
+    parser.add_argument("--seed", type=int, default=0)
+    add_train_arguments(parser)
+    args = parser.parse_args()
+
+    instance = Instance.load(args.data)
+    rules = RULES[args.rules]
+    with open(args.solution, "r") as f:
+        data = json.load(f)
+    start_trains = {trip["nr"]: trip["train"] for trip in (data["trips"] if isinstance(data, dict) else data)}
+    options = dict(time_limit=args.time_limit, iterations=args.iterations, moves=args.moves,
+                   temperature=args.temperature, final_temperature=args.final_temperature, tenure=args.tenure,
+                   seed=args.seed)
+
+    # The start may come from older rules; repair it first
+    duties, moved = repair_duties(instance, rules, load_drivers(instance, args.solution))
+    if moved:
+        print(f"{moved} trips moved to repair the start solution")
+    if "drivers" in args.layers:
+        duties = improve(instance, rules, duties, "Drivers", **options)
+
+    rotations = {}
+    for t in range(instance.n_trips):
+        rotations.setdefault(start_trains.get(int(instance.nr[t])), []).append(t)
+    if None in rotations or any(instance.arrival[a] > instance.departure[b]
+                                for rows in rotations.values() for a, b in zip(rows, rows[1:])):
+        print("The trains of the start solution miss trips or overlap; starting from the minimum-fleet assignment")
+        trains = assign_trains(instance, args.turnaround)
+        rotations = {k: [t for t in range(instance.n_trips) if trains.train[t] == k] for k in range(trains.n_trains)}
+    rotations = list(rotations.values())
+    if "trains" in args.layers:
+        rotations = improve(instance, None, rotations, "Trains", **options)
+    train = {t: f"T{k + 1}" for k, rows in enumerate(rotations) for t in rows}
+
+    drivers, driver_times = driver_schedule(instance, rules, duties)
+    solution = [instance.assignment(t, drivers[t], train[t]) for t in range(instance.n_trips)]
+    with open("solution.json", "w") as f:
+        json.dump({"trips": solution, "drivers": driver_times}, f, indent=4)
+
+    print(f"\nSolution saved to solution.json")
+    print(f"Solution uses {len(driver_times)} drivers and {len(rotations)} trains")
+    print("\nSolution is ready for validation with checker.py")